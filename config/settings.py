@@ -106,6 +106,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'provenance.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -218,9 +219,24 @@ import os
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Background jobs (see provenance/jobs.py and `manage.py run_jobs`)
+# Artifacts are kept outside MEDIA_ROOT because media is served without auth.
+JOB_FILES_ROOT = os.environ.get('JOB_FILES_ROOT', os.path.join(BASE_DIR, 'job_files'))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '2'))
+# Seconds a running job may go without a heartbeat (progress report) before
+# run_jobs assumes its worker died and marks it failed.
+JOB_LEASE = float(os.environ.get('JOB_LEASE', str(2 * 60 * 60)))
+
+# Log requests that run more queries than their endpoint's budget
+# (see provenance/query_budget.py).
+QUERY_BUDGET_WARNINGS = os.environ.get('QUERY_BUDGET_WARNINGS', 'False') == 'True'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Upload limits
+# Large files (database dumps, image archives) go through the chunked upload
+# API (/api/uploads/), so these only need to fit a single chunk.
 DATA_UPLOAD_MAX_MEMORY_SIZE = 20971520  # 20MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 20971520  # 20MB
+UPLOAD_CHUNK_SIZE = 8388608  # 8MB, must stay below nginx client_max_body_size
 
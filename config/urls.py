@@ -19,17 +19,26 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 
-from provenance import api, auth_api, admin_views
+from provenance import api, auth_api, admin_views, jobs_api, uploads_api
 
 urlpatterns = [
     path('admin/sync-db/', admin_views.db_sync_management, name='admin_sync_db'),
     path('admin/download-db/', admin_views.download_db_dump, name='admin_download_db'),
     path('admin/upload-db/', admin_views.upload_db_dump, name='admin_upload_db'),
     path('admin/', admin.site.urls),
-    path('api/artworks/', api.artwork_list),
-    path('api/artworks/<int:pk>/', api.artwork_detail),
-    path('api/persons/', api.person_list),
+    path('api/artworks/', api.artwork_list, name='artwork-list'),
+    path('api/artworks/<int:pk>/', api.artwork_detail, name='artwork-detail'),
+    path('api/artworks/batch/', api.artwork_batch, name='artwork-batch'),
+    path('api/artworks/browse/', api.artwork_browse, name='artwork-browse'),
+    path('api/artworks/<int:pk>/similar/', api.artwork_similar, name='artwork-similar'),
+    path('api/artworks/possible-matches/', api.find_possible_matches, name='find-possible-matches'),
+    path('api/artworks/<int:pk>/suggestions/', api.artwork_suggestions, name='artwork-suggestions'),
+    path('api/artworks/<int:pk>/similar-histories/', api.artwork_similar_histories,
+         name='artwork-similar-histories'),
+    path('api/artworks/history-matches/', api.align_histories, name='align-histories'),
+    path('api/persons/', api.person_list, name='person-list'),
     path('api/persons/<int:pk>/', api.person_detail, name='person-detail'),
+    path('api/persons/batch/', api.person_batch, name='person-batch'),
     path('api/event-types/', api.event_type_list, name='event-type-list'),
     path('api/art-types/', api.art_type_list, name='art-type-list'),
     path('api/mediums/', api.medium_list, name='medium-list'),
@@ -39,6 +48,25 @@ urlpatterns = [
     path('api/sources/', api.source_list, name='source-list'),
     path('api/events/report/', api.event_report, name='event-report'),
     path('api/events/report/export/', api.export_event_report_excel, name='export-event-report'),
+    path('api/holdings/', api.holding_list, name='holding-list'),
+    path('api/holdings/gaps/', api.holding_gaps, name='holding-gaps'),
+    path('api/holdings/gaps/export/', api.export_holding_gaps, name='export-holding-gaps'),
+    path('api/analytics/', api.analytics_query, name='analytics'),
+    path('api/network/export/', api.export_network, name='network-export'),
+    path('api/network/centrality/', api.centrality_list, name='centrality-list'),
+    path('api/network/centrality/refresh/', api.centrality_refresh, name='centrality-refresh'),
+    path('api/network/centrality/<str:actor_type>/<int:pk>/', api.centrality_detail, name='centrality-detail'),
+
+    # Background jobs
+    path('api/jobs/', jobs_api.job_list, name='job-list'),
+    path('api/jobs/<uuid:pk>/', jobs_api.job_detail, name='job-detail'),
+    path('api/jobs/<uuid:pk>/download/', jobs_api.job_download, name='job-download'),
+
+    # Chunked uploads (database dumps, image archives)
+    path('api/uploads/', uploads_api.upload_create, name='upload-create'),
+    path('api/uploads/<uuid:pk>/', uploads_api.upload_detail, name='upload-detail'),
+    path('api/uploads/<uuid:pk>/chunks/<int:index>/', uploads_api.upload_chunk, name='upload-chunk'),
+    path('api/uploads/<uuid:pk>/complete/', uploads_api.upload_complete, name='upload-complete'),
     
     # Auth API
     path('api/auth/csrf/', auth_api.get_csrf_token),
@@ -46,7 +46,7 @@ Write-Host "Running Database Migrations..." -ForegroundColor Blue
 & $VENV_PYTHON manage.py migrate
 
 # 4. Start Services
-Write-Host "Launching Backend and Frontend..." -ForegroundColor Blue
+Write-Host "Launching Backend, Job Worker and Frontend..." -ForegroundColor Blue
 
 # Start Backend in a new job or background process
 Write-Host "Backend starting at http://localhost:8000" -ForegroundColor Green
@@ -56,6 +56,14 @@ $backendJob = Start-Job -ScriptBlock {
     & $python manage.py runserver
 } -ArgumentList $VENV_PYTHON, $PSScriptRoot
 
+# Start Job Worker (exports, database sync, image imports)
+Write-Host "Job worker starting" -ForegroundColor Green
+$workerJob = Start-Job -ScriptBlock {
+    param($python, $cwd)
+    Set-Location $cwd
+    & $python manage.py run_jobs
+} -ArgumentList $VENV_PYTHON, $PSScriptRoot
+
 # Start Frontend in a new job or background process
 Write-Host "Frontend starting at http://localhost:5173" -ForegroundColor Green
 $frontendJob = Start-Job -ScriptBlock {
@@ -70,7 +78,7 @@ Write-Host "Press Ctrl+C to stop all services..." -ForegroundColor Cyan
 # Handle cleanup
 try {
     # Wait for the jobs or until the user interrupts
-    Wait-Job -Job $backendJob, $frontendJob
+    Wait-Job -Job $backendJob, $workerJob, $frontendJob
 } catch {
     # Catch interrupt if Wait-Job is terminatable, or just handle in finally
 } finally {
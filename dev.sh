@@ -28,12 +28,13 @@ echo -e "${BLUE}Running Database Migrations...${NC}"
 $VENV_PYTHON manage.py migrate
 
 # 4. Start Services
-echo -e "${BLUE}Launching Backend and Frontend...${NC}"
+echo -e "${BLUE}Launching Backend, Job Worker and Frontend...${NC}"
 
 # Function to handle cleanup on exit
 cleanup() {
     echo -e "\n${BLUE}Shutting down services...${NC}"
     kill $BACKEND_PID
+    kill $WORKER_PID
     kill $FRONTEND_PID
     # Optional: stop the db container too? 
     # docker compose stop $DB_SERVICE
@@ -48,6 +49,11 @@ echo -e "${GREEN}Backend starting at http://localhost:8000${NC}"
 $VENV_PYTHON manage.py runserver &
 BACKEND_PID=$!
 
+# Start Job Worker (exports, database sync, image imports)
+echo -e "${GREEN}Job worker starting${NC}"
+$VENV_PYTHON manage.py run_jobs &
+WORKER_PID=$!
+
 # Start Frontend
 echo -e "${GREEN}Frontend starting at http://localhost:5173${NC}"
 cd $FRONTEND_DIR && npm run dev &
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { Link, useSearchParams } from 'react-router-dom';
-import { getArtworks, getArtTypes, getMediums, Artwork, ArtType, Medium } from '../services/api';
+import { browseArtworks, getArtTypes, getMediums, Artwork, ArtType, Medium, ArtworkBrowsePage } from '../services/api';
 import { Search, Filter, X } from 'lucide-react';
 
 import { getDeterministicColor } from '../utils/colorUtils';
@@ -19,6 +19,12 @@ const ArtworkList: React.FC = () => {
     );
 
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [query, setQuery] = useState(searchTerm);
+    const [page, setPage] = useState(1);
+    const [numPages, setNumPages] = useState(1);
+    const [totalCount, setTotalCount] = useState(0);
+    const [facets, setFacets] = useState<ArtworkBrowsePage['facets']>();
     const [artTypes, setArtTypes] = useState<ArtType[]>([]);
     const [mediums, setMediums] = useState<Medium[]>([]);
     const [showFilters, setShowFilters] = useState(selectedArtType !== '' || selectedMedium !== '');
@@ -36,38 +42,64 @@ const ArtworkList: React.FC = () => {
         fetchCategories();
     }, []);
 
+    // Search on the server once typing pauses.
     useEffect(() => {
+        const timeout = setTimeout(() => setQuery(searchTerm.trim()), 300);
+        return () => clearTimeout(timeout);
+    }, [searchTerm]);
+
+    // A new filter combination starts again at the first page.
+    useEffect(() => {
+        setPage(1);
+    }, [selectedArtType, selectedMedium, query]);
+
+    useEffect(() => {
+        // Ignore responses for a page/filter combination that is no longer current.
+        let cancelled = false;
         const fetchArtworks = async () => {
-            setLoading(true);
+            if (page === 1) setLoading(true);
+            else setLoadingMore(true);
             try {
-                const params: any = {};
+                // Only the columns the grid renders; facets are only needed with the first page.
+                const params: any = {
+                    fields: 'id,name,image,medium,creation_date,event_count',
+                    page,
+                    facets: page === 1 ? 1 : 0,
+                };
                 if (selectedArtType) params.art_type = selectedArtType;
                 if (selectedMedium) params.medium = selectedMedium;
-                // Note: The backend artwork_list currently doesn't handle 'q' for searching, 
-                // but it's good practice to pass it if we want server-side search later.
-                // For now, we still do local search on the results.
+                if (query) params.q = query;
 
-                const data = await getArtworks(params);
-                setArtworks(data.results || []);
+                const data = await browseArtworks(params);
+                if (cancelled) return;
+                setArtworks(prev => (page === 1 ? data.results : [...prev, ...data.results]));
+                setNumPages(data.num_pages);
+                setTotalCount(data.count);
+                if (data.facets) setFacets(data.facets);
             } catch (error) {
                 console.error("Failed to fetch artworks", error);
             } finally {
                 setLoading(false);
+                setLoadingMore(false);
             }
         };
         fetchArtworks();
 
         // Update URL params
         const newParams: any = {};
-        if (searchTerm) newParams.q = searchTerm;
+        if (query) newParams.q = query;
         if (selectedArtType) newParams.art_type = selectedArtType.toString();
         if (selectedMedium) newParams.medium = selectedMedium.toString();
         setSearchParams(newParams, { replace: true });
-    }, [selectedArtType, selectedMedium, searchTerm, setSearchParams]);
+        return () => {
+            cancelled = true;
+        };
+    }, [selectedArtType, selectedMedium, query, page, setSearchParams]);
 
-    const filteredArtworks = artworks.filter(art =>
-        art.name.toLowerCase().includes(searchTerm.toLowerCase())
-    );
+    const facetCount = (facet: 'medium' | 'art_type', id: number) => {
+        const value = facets?.[facet].find(f => f.id === id);
+        return value ? ` (${value.count})` : '';
+    };
 
     const resetFilters = () => {
         setSelectedArtType('');
@@ -119,7 +151,7 @@ const ArtworkList: React.FC = () => {
                         >
                             <option value="">All Art Types</option>
                             {artTypes.map(type => (
-                                <option key={type.id} value={type.id}>{type.name}</option>
+                                <option key={type.id} value={type.id}>{type.name}{facetCount('art_type', type.id)}</option>
                             ))}
                         </select>
                     </div>
@@ -134,7 +166,7 @@ const ArtworkList: React.FC = () => {
                             {mediums
                                 .filter(m => !selectedArtType || m.art_type_id === selectedArtType)
                                 .map(medium => (
-                                    <option key={medium.id} value={medium.id}>{medium.name}</option>
+                                    <option key={medium.id} value={medium.id}>{medium.name}{facetCount('medium', medium.id)}</option>
                                 ))
                             }
                         </select>
@@ -154,7 +186,7 @@ const ArtworkList: React.FC = () => {
                 </div>
             ) : (
                 <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
-                    {filteredArtworks.map((art) => (
+                    {artworks.map((art) => (
                         <Link key={art.id} to={`/artworks/${art.id}`} className="group">
                             <div className="bg-white border border-gray-200 rounded-xl overflow-hidden shadow-sm hover:shadow-md transition-shadow duration-200">
                                 <div className="aspect-square bg-gray-100 relative overflow-hidden">
@@ -193,6 +225,20 @@ const ArtworkList: React.FC = () => {
                 </div>
             )
             }
+            {!loading && (
+                <div className="flex flex-col items-center gap-3 text-xs text-gray-500">
+                    <span>Showing {artworks.length} of {totalCount} artworks</span>
+                    {page < numPages && (
+                        <button
+                            onClick={() => setPage(page + 1)}
+                            disabled={loadingMore}
+                            className="px-4 py-2 border border-gray-300 rounded-lg text-sm text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-60"
+                        >
+                            {loadingMore ? 'Loading…' : 'Load more'}
+                        </button>
+                    )}
+                </div>
+            )}
         </div>
     );
 };
@@ -1,40 +1,115 @@
 import React, { useEffect, useState } from 'react';
-import { getEventReport, EventReportRow } from '../services/api';
-import { Table, Search, AlertCircle, Download } from 'lucide-react';
+import { getEventReport, EventReportRow, EventReportFacets, EventReportParams, startEventReportExport, waitForJob } from '../services/api';
+import { Table, Search, AlertCircle, Download, X } from 'lucide-react';
+
+// Facet dropdowns, in display order. `decade` maps to a year range.
+const FACET_FILTERS: { key: keyof EventReportFacets; label: string }[] = [
+    { key: 'event_type', label: 'Event Type' },
+    { key: 'certainty', label: 'Certainty' },
+    { key: 'decade', label: 'Decade' },
+    { key: 'person', label: 'Person' },
+    { key: 'institution', label: 'Institution' },
+    { key: 'auction', label: 'Auction' },
+    { key: 'exhibition', label: 'Exhibition' },
+    { key: 'source', label: 'Source' },
+    { key: 'group', label: 'Group' },
+];
+
+// Table columns that can be sorted on the server, keyed by report field.
+const SORT_COLUMNS: Partial<Record<keyof EventReportRow, string>> = {
+    artwork_id: 'artwork_id',
+    artwork_name: 'artwork',
+    event_type_name: 'event_type',
+    date: 'date',
+    person: 'person',
+    institution: 'institution',
+    certainty: 'certainty',
+};
 
 const EventReport: React.FC = () => {
     const [events, setEvents] = useState<EventReportRow[]>([]);
+    const [facets, setFacets] = useState<EventReportFacets | null>(null);
     const [loading, setLoading] = useState(true);
+    const [refreshing, setRefreshing] = useState(false);
     const [error, setError] = useState<string | null>(null);
     const [searchTerm, setSearchTerm] = useState('');
+    const [query, setQuery] = useState('');
+    const [selected, setSelected] = useState<Partial<Record<keyof EventReportFacets, string>>>({});
+    const [sort, setSort] = useState('artwork');
+    const [exportProgress, setExportProgress] = useState<number | null>(null);
+
+    // Search on the server once typing pauses.
+    useEffect(() => {
+        const timeout = setTimeout(() => setQuery(searchTerm.trim()), 300);
+        return () => clearTimeout(timeout);
+    }, [searchTerm]);
 
     useEffect(() => {
         const fetchEvents = async () => {
+            setRefreshing(true);
             try {
-                const data = await getEventReport();
+                const { decade, ...filters } = selected;
+                const params: EventReportParams = { ...filters, sort };
+                if (query) params.q = query;
+                if (decade) {
+                    params.year_from = Number(decade);
+                    params.year_to = Number(decade) + 9;
+                }
+                const data = await getEventReport(params);
                 setEvents(data.results || []);
+                setFacets(data.facets || null);
                 setError(null);
             } catch (err) {
                 console.error("Failed to fetch event report", err);
                 setError("Failed to load the event report. Please try again later.");
             } finally {
                 setLoading(false);
+                setRefreshing(false);
             }
         };
         fetchEvents();
-    }, []);
+    }, [query, selected, sort]);
 
-    const filteredEvents = events.filter(event => {
-        const searchLower = searchTerm.toLowerCase();
-        return (
-            event.artwork_name.toLowerCase().includes(searchLower) ||
-            event.event_type_name.toLowerCase().includes(searchLower) ||
-            (event.person && event.person.toLowerCase().includes(searchLower)) ||
-            (event.institution && event.institution.toLowerCase().includes(searchLower)) ||
-            (event.auction && event.auction.toLowerCase().includes(searchLower)) ||
-            (event.exhibition && event.exhibition.toLowerCase().includes(searchLower))
-        );
-    });
+    const setFilter = (key: keyof EventReportFacets, value: string) => {
+        setSelected(prev => {
+            const next = { ...prev };
+            if (value) next[key] = value;
+            else delete next[key];
+            return next;
+        });
+    };
+
+    const toggleSort = (column: keyof EventReportRow) => {
+        const key = SORT_COLUMNS[column];
+        if (!key) return;
+        setSort(prev => (prev === key ? `-${key}` : key));
+    };
+
+    const sortIndicator = (column: keyof EventReportRow) => {
+        const key = SORT_COLUMNS[column];
+        if (!key) return '';
+        if (sort === key) return ' ▲';
+        if (sort === `-${key}`) return ' ▼';
+        return '';
+    };
+
+    const handleExport = async () => {
+        setExportProgress(0);
+        try {
+            const queued = await startEventReportExport();
+            const job = await waitForJob(queued.id, (j) => setExportProgress(j.progress));
+            if (job.status === 'succeeded' && job.download_url) {
+                window.location.href = job.download_url;
+            } else {
+                alert(`Export failed: ${job.error || 'unknown error'}`);
+            }
+        } catch (err) {
+            console.error("Failed to export event report", err);
+            alert("Export failed. Please try again later.");
+        } finally {
+            setExportProgress(null);
+        }
+    };
 
     if (loading) {
         return (
@@ -73,37 +148,66 @@ const EventReport: React.FC = () => {
                         />
                     </div>
                     <button
-                        onClick={() => window.open('/api/events/report/export/', '_blank')}
-                        className="flex items-center justify-center gap-2 px-4 py-2 bg-indigo-600 hover:bg-indigo-700 text-white text-sm font-medium rounded-lg transition-colors shadow-sm whitespace-nowrap"
+                        onClick={handleExport}
+                        disabled={exportProgress !== null}
+                        className="flex items-center justify-center gap-2 px-4 py-2 bg-indigo-600 hover:bg-indigo-700 disabled:opacity-60 text-white text-sm font-medium rounded-lg transition-colors shadow-sm whitespace-nowrap"
                         title="Download as Excel"
                     >
                         <Download className="w-4 h-4" />
-                        Export Excel
+                        {exportProgress !== null ? `Exporting… ${exportProgress}%` : 'Export Excel'}
                     </button>
                 </div>
             </div>
 
-            <div className="bg-white border text-sm border-gray-200 rounded-xl shadow-sm overflow-hidden flex-1 flex flex-col min-h-0">
+            {facets && (
+                <div className="flex flex-wrap gap-2 shrink-0">
+                    {FACET_FILTERS.map(({ key, label }) => (
+                        <select
+                            key={key}
+                            value={selected[key] || ''}
+                            onChange={(e) => setFilter(key, e.target.value)}
+                            className="px-3 py-1.5 border border-gray-300 rounded-lg text-xs bg-white focus:ring-2 focus:ring-indigo-500 outline-none max-w-[14rem]"
+                        >
+                            <option value="">{label}: All</option>
+                            {facets[key].map(value => (
+                                <option key={value.id} value={String(value.id)}>
+                                    {value.name} ({value.count})
+                                </option>
+                            ))}
+                        </select>
+                    ))}
+                    {Object.keys(selected).length > 0 && (
+                        <button
+                            onClick={() => setSelected({})}
+                            className="flex items-center gap-1 px-3 py-1.5 text-xs text-gray-600 hover:text-indigo-600"
+                        >
+                            <X className="w-3 h-3" /> Clear filters
+                        </button>
+                    )}
+                </div>
+            )}
+
+            <div className={`bg-white border text-sm border-gray-200 rounded-xl shadow-sm overflow-hidden flex-1 flex flex-col min-h-0 ${refreshing ? 'opacity-60' : ''}`}>
                 <div className="overflow-auto flex-1 h-[calc(100vh-250px)]">
                     <table className="min-w-full divide-y divide-gray-200 border-collapse table-fixed">
                         <thead className="bg-gray-50 uppercase text-[10px] text-gray-500 sticky top-0 z-10 shadow-sm">
                             <tr>
-                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-20">Art ID</th>
-                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-48">Artwork Name</th>
+                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-20 cursor-pointer select-none" onClick={() => toggleSort('artwork_id')}>Art ID{sortIndicator('artwork_id')}</th>
+                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-48 cursor-pointer select-none" onClick={() => toggleSort('artwork_name')}>Artwork Name{sortIndicator('artwork_name')}</th>
                                 <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-16">Seq #</th>
                                 <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-16">Type ID</th>
-                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32">Event Type</th>
-                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32">Date</th>
-                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32">Person</th>
-                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32">Institution</th>
+                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32 cursor-pointer select-none" onClick={() => toggleSort('event_type_name')}>Event Type{sortIndicator('event_type_name')}</th>
+                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32 cursor-pointer select-none" onClick={() => toggleSort('date')}>Date{sortIndicator('date')}</th>
+                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32 cursor-pointer select-none" onClick={() => toggleSort('person')}>Person{sortIndicator('person')}</th>
+                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32 cursor-pointer select-none" onClick={() => toggleSort('institution')}>Institution{sortIndicator('institution')}</th>
                                 <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32">Auction</th>
                                 <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-32">Exhibition</th>
-                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-24">Certainty</th>
+                                <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-24 cursor-pointer select-none" onClick={() => toggleSort('certainty')}>Certainty{sortIndicator('certainty')}</th>
                                 <th scope="col" className="px-3 py-3 font-medium whitespace-nowrap text-left border-x border-gray-200 w-48">Sources</th>
                             </tr>
                         </thead>
                         <tbody className="bg-white divide-y divide-gray-200">
-                            {filteredEvents.map((event) => (
+                            {events.map((event) => (
                                 <tr key={event.id} className="hover:bg-indigo-50/50 transition-colors odd:bg-gray-50/30">
                                     <td className="px-3 py-2 whitespace-nowrap text-gray-500 border-x border-gray-100 truncate">{event.artwork_id}</td>
                                     <td className="px-3 py-2 whitespace-nowrap text-gray-900 font-medium border-x border-gray-100 truncate" title={event.artwork_name}>{event.artwork_name}</td>
@@ -122,13 +226,13 @@ const EventReport: React.FC = () => {
                         </tbody>
                     </table>
                 </div>
-                {filteredEvents.length === 0 && (
+                {events.length === 0 && (
                     <div className="text-center py-8 text-gray-500 border-t border-gray-200 shrink-0">
                         No events found matching your search.
                     </div>
                 )}
                 <div className="bg-gray-50 border-t border-gray-200 px-4 py-3 text-xs text-gray-500 text-right shrink-0">
-                    Showing {filteredEvents.length} {filteredEvents.length === 1 ? 'event' : 'events'}
+                    Showing {events.length} {events.length === 1 ? 'event' : 'events'}
                 </div>
             </div>
         </div>
@@ -38,6 +38,7 @@ export interface Artwork {
   event_count?: number;
   notes?: string;
   provenance?: ProvenanceEvent[];
+  images?: ImageInfo[];
 }
 
 export interface ArtType {
@@ -160,13 +161,56 @@ export interface User {
   is_staff: boolean;
 }
 
-export const getArtworks = async (params?: { medium?: number; art_type?: number }) => {
+export interface ImageInfo {
+  id: number;
+  url: string;
+  caption: string;
+}
+
+// `fields` limits the returned keys (comma separated); `include` embeds
+// related data ('provenance', 'images') in the same response.
+export const getArtworks = async (params?: { medium?: number; art_type?: number; q?: string; fields?: string; include?: string }) => {
   const response = await api.get<{ results: Artwork[] }>('/artworks/', { params });
   return response.data;
 };
 
-export const getArtworkDetail = async (id: number) => {
-  const response = await api.get<Artwork>(`/artworks/${id}/`);
+export interface ArtworkBrowseParams {
+  q?: string;
+  medium?: string;
+  art_type?: string;
+  group?: string;
+  event_type?: string;
+  certainty?: string;
+  person?: string;
+  institution?: string;
+  auction?: string;
+  exhibition?: string;
+  year_from?: number;
+  year_to?: number;
+  page?: number;
+  page_size?: number;
+  fields?: string;
+  include?: string;
+  facets?: 0 | 1;
+}
+
+export interface ArtworkBrowsePage {
+  count: number;
+  num_pages: number;
+  page: number;
+  page_size: number;
+  results: Artwork[];
+  facets?: Record<'medium' | 'art_type' | 'group' | 'event_type' | 'certainty' | 'decade', FacetValue[]>;
+}
+
+// Faceted, paginated browsing; filters take comma separated ids.
+export const browseArtworks = async (params?: ArtworkBrowseParams) => {
+  const response = await api.get<ArtworkBrowsePage>('/artworks/browse/', { params });
+  return response.data;
+};
+
+export const getArtworkDetail = async (id: number, params?: { fields?: string; include?: string }) => {
+  const response = await api.get<Artwork>(`/artworks/${id}/`, { params });
   return response.data;
 };
 
@@ -215,6 +259,21 @@ export const getPersonDetail = async (id: number) => {
   return response.data;
 };
 
+// Many detail payloads in one request (at most 500 ids), in the order of `ids`.
+export const getArtworksBatch = async (ids: number[], params?: { fields?: string; include?: string }) => {
+  const response = await api.get<{ results: Artwork[]; missing: number[] }>('/artworks/batch/', {
+    params: { ...params, ids: ids.join(',') },
+  });
+  return response.data;
+};
+
+export const getPersonsBatch = async (ids: number[], params?: { fields?: string; include?: string }) => {
+  const response = await api.get<{ results: PersonDetail[]; missing: number[] }>('/persons/batch/', {
+    params: { ...params, ids: ids.join(',') },
+  });
+  return response.data;
+};
+
 export const login = async (credentials: any) => {
   const response = await api.post<User>('/auth/login/', credentials);
   return response.data;
@@ -249,7 +308,73 @@ export interface EventReportRow {
   sources: string;
 }
 
-export const getEventReport = async () => {
-  const response = await api.get<{ results: EventReportRow[] }>('/events/report/');
+export interface FacetValue {
+  id: number | string;
+  name: string;
+  count: number;
+}
+
+export type EventReportFacets = Record<
+  'event_type' | 'certainty' | 'person' | 'institution' | 'auction' | 'exhibition' | 'source' | 'group' | 'decade',
+  FacetValue[]
+>;
+
+// Filters take comma separated ids (certainty values for `certainty`).
+export interface EventReportParams {
+  q?: string;
+  event_type?: string;
+  certainty?: string;
+  person?: string;
+  institution?: string;
+  auction?: string;
+  exhibition?: string;
+  source?: string;
+  group?: string;
+  year_from?: number;
+  year_to?: number;
+  // artwork, artwork_id, date, event_type, person, institution, certainty; prefix with '-' to reverse
+  sort?: string;
+  facets?: 0 | 1;
+}
+
+export const getEventReport = async (params?: EventReportParams) => {
+  const response = await api.get<{ results: EventReportRow[]; facets?: EventReportFacets }>('/events/report/', { params });
+  return response.data;
+};
+
+export interface Job {
+  id: string;
+  kind: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  progress: number;
+  message: string;
+  error: string;
+  result: Record<string, unknown>;
+  download_url: string | null;
+  status_url: string;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
+export const getJob = async (id: string) => {
+  const response = await api.get<Job>(`/jobs/${id}/`);
+  return response.data;
+};
+
+// Polls a background job until it has finished (succeeded or failed).
+export const waitForJob = async (id: string, onProgress?: (job: Job) => void, intervalMs = 1500) => {
+  for (;;) {
+    const job = await getJob(id);
+    onProgress?.(job);
+    if (job.status === 'succeeded' || job.status === 'failed') {
+      return job;
+    }
+    await new Promise(resolve => setTimeout(resolve, intervalMs));
+  }
+};
+
+export const startEventReportExport = async () => {
+  const response = await api.post<Job>('/events/report/export/');
   return response.data;
 };
@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
 from django.db import models
+from django.db.models import Prefetch
 from django.forms import Textarea, TextInput
+from django.forms.models import BaseInlineFormSet
 from django import forms
 from django.contrib.contenttypes.admin import GenericTabularInline
 from .models import (
@@ -9,6 +12,13 @@ from .models import (
     Image, Medium, Auction, AuctionPerson, Exhibition, EventType,
     ProvenanceEventSource
 )
+from django.contrib.admin.widgets import AutocompleteSelect
+from .admin_filters import AutocompleteFilter
+from .admin_widgets import CachedAutocompleteSelect
+from .holdings import deferred_rebuild, rebuild_holdings
+from .paginators import EstimatedCountPaginator
+from .persons import merge_persons
+from .search import search_events
 
 class ImageInline(GenericTabularInline):
     model = Image
@@ -18,7 +28,8 @@ class ProvenanceEventInlineForm(forms.ModelForm):
     source = forms.ModelChoiceField(
         queryset=Source.objects.all(),
         required=False,
-        label="Source (Primary)"
+        label="Source (Primary)",
+        widget=CachedAutocompleteSelect(ProvenanceEvent._meta.get_field('sources'), admin.site),
     )
     source_notes = forms.CharField(
         max_length=100,
@@ -34,7 +45,9 @@ class ProvenanceEventInlineForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.instance and self.instance.pk:
-            first_source = self.instance.provenanceeventsource_set.first()
+            # Uses the sources prefetched by ProvenanceEventInline.get_queryset
+            event_sources = list(self.instance.provenanceeventsource_set.all())
+            first_source = event_sources[0] if event_sources else None
             if first_source:
                 self.initial['source'] = first_source.source_id
                 self.initial['source_notes'] = first_source.notes
@@ -75,10 +88,56 @@ class ProvenanceEventInlineForm(forms.ModelForm):
 
         return instance
 
+class ProvenanceEventFormSet(BaseInlineFormSet):
+    """
+    Shows one page of events at a time (`?events_page=N` on the artwork change
+    view) and lets the autocomplete widgets of all forms share one label cache,
+    pre-filled from the select_related/prefetched events.
+    """
+    per_page = 50
+    page_number = 1
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.choice_cache = {}
+        for event in self.get_queryset():
+            for name in ProvenanceEventInline.autocomplete_fields:
+                related = getattr(event, name)
+                if related is not None:
+                    self._cache_label(related)
+            event_sources = list(event.provenanceeventsource_set.all())
+            if event_sources:
+                self._cache_label(event_sources[0].source)
+
+    def _cache_label(self, obj):
+        self.choice_cache.setdefault(obj._meta.label, {})[str(obj.pk)] = str(obj)
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset().order_by('sequence_number', 'pk')
+            self.page_obj = Paginator(queryset, self.per_page).get_page(self.page_number)
+            self._queryset = list(self.page_obj.object_list)
+            for event in self._queryset:
+                # str(event) in the inline header needs the artwork
+                event.artwork = self.instance
+        return self._queryset
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for field in form.fields.values():
+            # Admin wraps FK widgets in RelatedFieldWidgetWrapper
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, CachedAutocompleteSelect):
+                widget.choice_cache = self.choice_cache
+        return form
+
 class ProvenanceEventInline(admin.StackedInline):
     model = ProvenanceEvent
     extra = 0
     form = ProvenanceEventInlineForm
+    formset = ProvenanceEventFormSet
+    template = 'admin/provenance/edit_inline/paginated_stacked.html'
+    autocomplete_fields = ('event_type', 'person', 'institution', 'auction', 'exhibition')
     fieldsets = (
         (None, {
             'fields': (
@@ -95,13 +154,37 @@ class ProvenanceEventInline(admin.StackedInline):
         models.CharField: {'widget': TextInput(attrs={'size': '40'})},
     }
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('event_type', 'person', 'institution', 'auction', 'exhibition')
+        return super().get_queryset(request).select_related(
+            'event_type', 'person', 'institution', 'auction', 'exhibition'
+        ).prefetch_related(
+            Prefetch(
+                'provenanceeventsource_set',
+                queryset=ProvenanceEventSource.objects.select_related('source').order_by('pk'),
+            )
+        )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = CachedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.page_number = request.GET.get('events_page', 1)
+        return formset
 
 @admin.register(Person)
 class PersonAdmin(admin.ModelAdmin):
     list_display = ('family_name', 'first_name', 'birth_date', 'death_date')
     search_fields = ('family_name', 'first_name')
     inlines = [ImageInline]
+    actions = ['merge_selected']
+
+    @admin.action(description="Merge selected persons into the oldest one")
+    def merge_selected(self, request, queryset):
+        pks = sorted(queryset.values_list('pk', flat=True))
+        merged = merge_persons((pks[0], pk) for pk in pks[1:])
+        self.message_user(request, f"Merged {merged} persons into #{pks[0]}.")
 
 @admin.register(InstitutionType)
 class InstitutionTypeAdmin(admin.ModelAdmin):
@@ -109,7 +192,7 @@ class InstitutionTypeAdmin(admin.ModelAdmin):
 
 @admin.register(EventType)
 class EventTypeAdmin(admin.ModelAdmin):
-    pass
+    search_fields = ('name',)
 
 @admin.register(Institution)
 class InstitutionAdmin(admin.ModelAdmin):
@@ -153,6 +236,11 @@ class ArtworkAdmin(admin.ModelAdmin):
     filter_horizontal = ('groups',)
     inlines = [ProvenanceEventInline, ImageInline]
 
+    def save_related(self, request, form, formsets, change):
+        # Every saved inline event would rebuild the artwork's holding intervals; rebuild them once.
+        with deferred_rebuild():
+            super().save_related(request, form, formsets, change)
+
 @admin.register(Source)
 class SourceAdmin(admin.ModelAdmin):
     list_display = ('source', 'type')
@@ -172,10 +260,40 @@ class ProvenanceEventSourceInline(admin.StackedInline):
 @admin.register(ProvenanceEvent)
 class ProvenanceEventAdmin(admin.ModelAdmin):
     list_display = ('artwork', 'sequence_number', 'event_type', 'date', 'person', 'institution', 'auction', 'exhibition')
-    list_filter = ('event_type', 'certainty', 'auction', 'exhibition', 'sources')
+    list_select_related = ('artwork', 'event_type', 'person', 'institution', 'auction', 'exhibition')
+    list_filter = (
+        'event_type',
+        'certainty',
+        ('auction', AutocompleteFilter),
+        ('exhibition', AutocompleteFilter),
+        ('sources', AutocompleteFilter),
+    )
     ordering = ('artwork', 'sequence_number')
+    # Kept for the search box; the actual lookup is done by get_search_results
     search_fields = ('artwork__name', 'person__family_name', 'person__first_name', 'institution__name', 'notes')
     inlines = [ProvenanceEventSourceInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    @property
+    def media(self):
+        # select2 assets for the AutocompleteFilter boxes on the changelist
+        return (
+            super().media
+            + AutocompleteSelect(ProvenanceEvent._meta.get_field('auction'), self.admin_site).media
+            + forms.Media(js=['provenance/js/autocomplete_filter.js'])
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Same indexed search as the public API (provenance/search.py)
+        return search_events(queryset, search_term), False
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip ProvenanceEvent.delete(); fix up the holding intervals.
+        artwork_ids = set(queryset.values_list('artwork_id', flat=True))
+        super().delete_queryset(request, queryset)
+        rebuild_holdings(artwork_ids)
 
 @admin.register(ArtworkGroup)
 class ArtworkGroupAdmin(admin.ModelAdmin):
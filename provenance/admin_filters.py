@@ -0,0 +1,70 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.utils import get_last_value_from_parameters, get_model_from_relation
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    List filter for high-cardinality relations (sources, auctions, ...).
+
+    The stock RelatedFieldListFilter renders one link per related row; this
+    one renders a single select2 box that searches through the related model
+    admin's autocomplete view, so only the currently selected value is loaded.
+    The related model admin needs `search_fields`.
+
+    Usage: `list_filter = (('auction', AutocompleteFilter), ...)`
+    """
+    template = 'admin/provenance/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.other_model = get_model_from_relation(field)
+        self.lookup_kwarg = '%s__%s__exact' % (field_path, field.target_field.name)
+        self.lookup_val = get_last_value_from_parameters(params, self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.title = getattr(field, 'verbose_name', self.other_model._meta.verbose_name)
+        # The form field only provides the widget with its choices/queryset.
+        self.form_field = forms.ModelChoiceField(
+            queryset=self.other_model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+        )
+        self.widget = self.form_field.widget
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        # Facet counts would mean one COUNT per related row, which is exactly
+        # what this filter avoids.
+        return {}
+
+    def selected_label(self):
+        if not self.lookup_val:
+            return ''
+        obj = self.other_model._default_manager.filter(pk=self.lookup_val).first()
+        return str(obj) if obj else ''
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'All',
+        }
+        if self.lookup_val is not None:
+            yield {
+                'selected': True,
+                'query_string': changelist.get_query_string({self.lookup_kwarg: self.lookup_val}),
+                'display': self.selected_label(),
+            }
+
+    def select_html(self):
+        return self.widget.render(
+            f'autocomplete-filter-{self.field_path}',
+            self.lookup_val,
+            attrs={
+                'class': 'autocomplete-filter',
+                'data-param': self.lookup_kwarg,
+                'style': 'width: 100%',
+            },
+        )
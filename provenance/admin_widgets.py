@@ -0,0 +1,48 @@
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class CachedAutocompleteSelect(AutocompleteSelect):
+    """
+    Autocomplete select that resolves the label of its selected value from a
+    cache shared by all forms of a formset. The stock widget runs one query
+    per rendered widget to look up the selected option, which adds up to
+    hundreds of queries on an artwork with many inline events.
+
+    `choice_cache` maps the remote model label to `{str(pk): label}`; it is
+    set by the formset (see ProvenanceEventFormSet) and pre-filled from the
+    select_related/prefetched instances. Values missing from the cache are
+    fetched in one query and added to it.
+    """
+    choice_cache = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.choice_cache is None:
+            return super().optgroups(name, value, attr)
+
+        default = (None, [], 0)
+        groups = [default]
+        selected_choices = [
+            str(v) for v in value if str(v) not in self.choices.field.empty_values
+        ]
+        if not self.is_required and not self.allow_multiple_selected:
+            default[1].append(self.create_option(name, "", "", False, 0))
+
+        remote_model_opts = self.field.remote_field.model._meta
+        cache = self.choice_cache.setdefault(remote_model_opts.label, {})
+        missing = [v for v in selected_choices if v not in cache]
+        if missing:
+            to_field_name = getattr(
+                self.field.remote_field, "field_name", remote_model_opts.pk.attname
+            )
+            to_field_name = remote_model_opts.get_field(to_field_name).attname
+            for obj in self.choices.queryset.using(self.db).filter(
+                **{"%s__in" % to_field_name: missing}
+            ):
+                cache[str(getattr(obj, to_field_name))] = self.choices.field.label_from_instance(obj)
+
+        for option_value in selected_choices:
+            if option_value in cache:
+                default[1].append(
+                    self.create_option(name, option_value, cache[option_value], True, len(default[1]))
+                )
+        return groups
@@ -0,0 +1,353 @@
+"""
+In-memory columnar analytics over the provenance corpus (`/api/analytics/`).
+
+The events are loaded once per process into integer-coded NumPy columns
+(ids as they are, 0 for none; certainty and actor type as small codes),
+together with the artwork, institution, venue and label lookups they are
+joined with. Group-by and filter queries are then evaluated with array
+operations, e.g. transfers per decade by event type:
+
+    aggregate(['decade', 'event_type'])
+
+or the auction share per art type (`share` is relative to the first
+dimension):
+
+    aggregate(['art_type', 'actor_type'])
+
+Every query first reads the data versions (provenance.versions, one small
+query) and reloads only the tables that depend on a model that changed
+since they were loaded.
+"""
+import threading
+
+import numpy as np
+
+from .event_report import FilterParamError
+from .versions import data_versions
+
+# Loaded table -> models it is read from.
+TABLES = {
+    'events': ('provenance.provenanceevent',),
+    'artworks': ('provenance.artwork',),
+    'mediums': ('provenance.medium', 'provenance.arttype'),
+    'event_types': ('provenance.eventtype',),
+    'persons': ('provenance.person',),
+    'institutions': ('provenance.institution', 'provenance.institutiontype'),
+    'venues': ('provenance.auction', 'provenance.exhibition'),
+}
+
+# The actor an event is attributed to; auctions and exhibitions take
+# precedence over institutions, institutions over persons.
+ACTOR_TYPES = ('', 'person', 'institution', 'exhibition', 'auction')
+
+DIMENSIONS = (
+    'event_type', 'certainty', 'year', 'decade', 'actor_type', 'person', 'institution', 'institution_type',
+    'auction', 'exhibition', 'artwork', 'medium', 'art_type',
+)
+MEASURES = ('events', 'artworks')
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+_lock = threading.Lock()
+_corpus = None
+
+
+def _ids(values):
+    return np.fromiter((value or 0 for value in values), dtype=np.int64, count=len(values))
+
+
+def _columns(queryset, *fields):
+    rows = list(queryset.order_by().values_list(*fields))
+    return [tuple(column) for column in zip(*rows)] if rows else [() for _ in fields]
+
+
+def _lookup(keys, values):
+    """Dense array mapping an id to its value (0 for unknown ids)."""
+    table = np.zeros(int(keys.max(initial=0)) + 1, dtype=np.int64)
+    table[keys] = values
+    return table
+
+
+def _take(table, ids):
+    """`table[ids]`, with 0 for ids outside the table."""
+    inside = ids < len(table)
+    return np.where(inside, table[np.where(inside, ids, 0)], 0)
+
+
+def _load_events():
+    from .models import ProvenanceEvent
+
+    certainty_codes = {value: code for code, (value, _) in enumerate(ProvenanceEvent.CERTAINTY_CHOICES, start=1)}
+    (artwork, event_type, year, certainty, person, institution, auction, exhibition) = _columns(
+        ProvenanceEvent.objects.all(), 'artwork_id', 'event_type_id', 'year', 'certainty', 'person_id',
+        'institution_id', 'auction_id', 'exhibition_id',
+    )
+    return {
+        'artwork': _ids(artwork), 'event_type': _ids(event_type), 'year': _ids(year),
+        'certainty': np.fromiter((certainty_codes.get(value, 0) for value in certainty), dtype=np.int64,
+                                 count=len(certainty)),
+        'person': _ids(person), 'institution': _ids(institution), 'auction': _ids(auction),
+        'exhibition': _ids(exhibition),
+    }
+
+
+def _load_artworks():
+    from .models import Artwork
+
+    pk, name, medium = _columns(Artwork.objects.all(), 'pk', 'name', 'medium_id')
+    return {'medium_of': _lookup(_ids(pk), _ids(medium)), 'names': dict(zip(pk, name))}
+
+
+def _load_mediums():
+    from .models import ArtType, Medium
+
+    pk, name, art_type = _columns(Medium.objects.all(), 'pk', 'name', 'type_id')
+    return {
+        'art_type_of': _lookup(_ids(pk), _ids(art_type)),
+        'names': dict(zip(pk, name)),
+        'art_type_names': dict(ArtType.objects.values_list('pk', 'name')),
+    }
+
+
+def _load_event_types():
+    from .models import EventType
+
+    return {'names': dict(EventType.objects.values_list('pk', 'name'))}
+
+
+def _load_persons():
+    from .models import Person
+    from .serializers import person_name
+
+    pk, family_name, first_name = _columns(Person.objects.all(), 'pk', 'family_name', 'first_name')
+    return {'names': {p: person_name(f, g) for p, f, g in zip(pk, family_name, first_name)}}
+
+
+def _load_institutions():
+    from .models import Institution, InstitutionType
+
+    pk, name, type_id = _columns(Institution.objects.all(), 'pk', 'name', 'type_id')
+    return {
+        'type_of': _lookup(_ids(pk), _ids(type_id)),
+        'names': dict(zip(pk, name)),
+        'type_names': dict(InstitutionType.objects.values_list('pk', 'name')),
+    }
+
+
+def _load_venues():
+    from .models import Auction, Exhibition
+
+    venues = {}
+    for kind, model in (('auction', Auction), ('exhibition', Exhibition)):
+        pk, name, institution = _columns(model.objects.all(), 'pk', 'name', 'institution_id')
+        venues[f'{kind}_institution_of'] = _lookup(_ids(pk), _ids(institution))
+        venues[f'{kind}_names'] = dict(zip(pk, name))
+    return venues
+
+
+LOADERS = {
+    'events': _load_events,
+    'artworks': _load_artworks,
+    'mediums': _load_mediums,
+    'event_types': _load_event_types,
+    'persons': _load_persons,
+    'institutions': _load_institutions,
+    'venues': _load_venues,
+}
+
+
+class Corpus:
+    """
+    The loaded tables, the data versions they were read at, and the event
+    columns of every dimension.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.versions = {}
+        self.columns = {}
+
+    def refresh(self, versions):
+        """Reloads the tables whose models changed; returns their names."""
+        stale = [
+            name for name, models in TABLES.items()
+            if name not in self.tables or any(self.versions.get(m) != versions[m] for m in models)
+        ]
+        for name in stale:
+            self.tables[name] = LOADERS[name]()
+        if stale:
+            self.versions = versions
+            self._derive_columns()
+        return stale
+
+    def _derive_columns(self):
+        events, venues = self.tables['events'], self.tables['venues']
+        columns = dict(events)
+        columns['decade'] = np.where(events['year'] > 0, events['year'] // 10 * 10, 0)
+        actor_type = np.zeros(len(events['artwork']), dtype=np.int64)
+        for code, name in enumerate(ACTOR_TYPES):
+            if name:
+                actor_type[events[name] > 0] = code
+        columns['actor_type'] = actor_type
+        # Institution of the event itself, else of its auction or exhibition.
+        institution = events['institution']
+        for kind in ('auction', 'exhibition'):
+            via = _take(venues[f'{kind}_institution_of'], events[kind])
+            institution = np.where(institution > 0, institution, via)
+        columns['institution'] = institution
+        columns['institution_type'] = _take(self.tables['institutions']['type_of'], institution)
+        columns['medium'] = _take(self.tables['artworks']['medium_of'], events['artwork'])
+        columns['art_type'] = _take(self.tables['mediums']['art_type_of'], columns['medium'])
+        self.columns = columns
+
+    def label(self, dimension, value):
+        """(id, name) of a coded value for the API output."""
+        from .models import ProvenanceEvent
+
+        value = int(value)
+        if dimension == 'certainty':
+            if not value:
+                return None, ''
+            certainty, name = ProvenanceEvent.CERTAINTY_CHOICES[value - 1]
+            return certainty, name
+        if dimension == 'actor_type':
+            return ACTOR_TYPES[value] or None, ACTOR_TYPES[value]
+        if not value:
+            return None, ''
+        if dimension == 'year':
+            return value, str(value)
+        if dimension == 'decade':
+            return value, f"{value}s"
+        names = {
+            'event_type': self.tables['event_types']['names'],
+            'person': self.tables['persons']['names'],
+            'institution': self.tables['institutions']['names'],
+            'institution_type': self.tables['institutions']['type_names'],
+            'auction': self.tables['venues']['auction_names'],
+            'exhibition': self.tables['venues']['exhibition_names'],
+            'artwork': self.tables['artworks']['names'],
+            'medium': self.tables['mediums']['names'],
+            'art_type': self.tables['mediums']['art_type_names'],
+        }[dimension]
+        return value, names.get(value, '')
+
+    def encode(self, dimension, value):
+        """The column code of an API filter value."""
+        from .models import ProvenanceEvent
+
+        if dimension == 'certainty':
+            codes = {v: code for code, (v, _) in enumerate(ProvenanceEvent.CERTAINTY_CHOICES, start=1)}
+            if value not in codes:
+                raise FilterParamError(f"Unknown certainty: {value}")
+            return codes[value]
+        if dimension == 'actor_type':
+            if value not in ACTOR_TYPES[1:]:
+                raise FilterParamError(f"Unknown actor_type: {value}")
+            return ACTOR_TYPES.index(value)
+        try:
+            return int(value)
+        except ValueError:
+            raise FilterParamError(f"{dimension} must be a comma separated list of ids")
+
+
+def get_corpus():
+    """The process-wide corpus, refreshed to the current data versions."""
+    global _corpus
+    versions = data_versions()
+    with _lock:
+        if _corpus is None:
+            _corpus = Corpus()
+        _corpus.refresh(versions)
+        return _corpus
+
+
+def clear_cache():
+    global _corpus
+    with _lock:
+        _corpus = None
+
+
+def parse_query(params):
+    """
+    Reads `group_by` (comma separated DIMENSIONS), `measure`, `limit`,
+    `year_from`/`year_to` and a filter per dimension (comma separated ids,
+    or values for `certainty` and `actor_type`).
+    """
+    group_by = [v.strip() for v in params.get('group_by', '').split(',') if v.strip()]
+    unknown = set(group_by) - set(DIMENSIONS)
+    if unknown:
+        raise FilterParamError(f"Unknown dimension: {', '.join(sorted(unknown))}")
+    measure = params.get('measure') or 'events'
+    if measure not in MEASURES:
+        raise FilterParamError(f"measure must be one of: {', '.join(MEASURES)}")
+    try:
+        limit = int(params.get('limit') or DEFAULT_LIMIT)
+        year_from = int(params['year_from']) if params.get('year_from') else None
+        year_to = int(params['year_to']) if params.get('year_to') else None
+    except ValueError:
+        raise FilterParamError("limit, year_from and year_to must be numbers")
+    filters = {
+        name: [v.strip() for v in params[name].split(',') if v.strip()]
+        for name in DIMENSIONS if params.get(name)
+    }
+    return {
+        'group_by': list(dict.fromkeys(group_by)), 'measure': measure, 'filters': filters,
+        'years': (year_from, year_to), 'limit': max(1, min(limit, MAX_LIMIT)),
+    }
+
+
+def aggregate(group_by, filters=None, measure='events', years=(None, None), limit=DEFAULT_LIMIT, corpus=None):
+    """
+    Counts events (or distinct artworks) per combination of the `group_by`
+    dimensions over the events matching `filters` ({dimension: [values]})
+    and the `years` range. Returns {'total', 'results'}; results are sorted
+    by count, largest first, and cut to `limit`.
+    """
+    corpus = corpus or get_corpus()
+    columns = corpus.columns
+    mask = np.ones(len(columns['artwork']), dtype=bool)
+    for dimension, values in (filters or {}).items():
+        mask &= np.isin(columns[dimension], [corpus.encode(dimension, value) for value in values])
+    year_from, year_to = years
+    if year_from is not None:
+        mask &= columns['year'] >= year_from
+    if year_to is not None:
+        mask &= columns['year'] <= year_to
+
+    artworks = columns['artwork'][mask]
+    keys, codes = [], []
+    for dimension in group_by:
+        values, inverse = np.unique(columns[dimension][mask], return_inverse=True)
+        keys.append(values)
+        codes.append(inverse.ravel())
+    group = np.ravel_multi_index(codes, [len(k) for k in keys]) if group_by else np.zeros(len(artworks), np.int64)
+
+    if measure == 'artworks':
+        total = len(np.unique(artworks))
+        # One row per distinct (group, artwork).
+        pairs = np.unique(np.stack([group, artworks]), axis=1)
+        group = pairs[0]
+    else:
+        total = len(artworks)
+    groups, counts = np.unique(group, return_counts=True)
+
+    indices = np.unravel_index(groups, [len(k) for k in keys]) if group_by else []
+    if group_by:
+        # Share of each group within its value of the first dimension.
+        first_totals = np.bincount(indices[0], weights=counts)
+        shares = counts / first_totals[indices[0]]
+    else:
+        shares = np.ones(len(counts))
+    order = np.lexsort((groups, -counts))[:limit]
+
+    results = []
+    for n in order:
+        row = {}
+        for dimension, key, index in zip(group_by, keys, indices):
+            value_id, name = corpus.label(dimension, key[index[n]])
+            row[dimension] = {'id': value_id, 'name': name}
+        row['count'] = int(counts[n])
+        row['share'] = round(float(shares[n]), 4)
+        results.append(row)
+    return {'total': total, 'results': results}
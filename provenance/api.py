@@ -1,11 +1,69 @@
-from django.http import JsonResponse
+import csv
+
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods
 from .models import Artwork, ProvenanceEvent, Person, ArtType, Medium
+from . import analytics, artwork_matching, browse, chain_alignment, gaps, graph_export, holdings, image_hashes, network
+from .event_report import FilterParamError, apply_filters, facet_counts, ordering, parse_filters
+from .exports import Echo
+from .search import search_artworks, search_persons
+from .serializers import (
+    ARTWORK_DETAIL, PERSON_DETAIL, artwork_list_rows, artworks_by_actor, event_report_rows, first_image_urls,
+    holding_rows, json_response,
+)
+
+
+def _sparse_params(request):
+    """
+    Parses `?fields=a,b` and `?include=c,d`. `fields` is None when the
+    parameter is absent, meaning all fields.
+    """
+    def split(name):
+        return [part.strip() for part in request.GET.get(name, '').split(',') if part.strip()]
+    fields = split('fields') if 'fields' in request.GET else None
+    return fields, split('include')
+
+def _serialize_detail(request, serializer, queryset, pk):
+    fields, include = _sparse_params(request)
+    try:
+        serializer = serializer.select(fields, include)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    obj = get_object_or_404(serializer.plan(queryset, restrict_columns=fields is not None), pk=pk)
+    return JsonResponse(serializer.to_dict(obj))
+
+# Upper bound for the ids of one batch request.
+BATCH_MAX_IDS = 500
+
+def _serialize_batch(request, serializer, queryset):
+    """
+    Serializes the objects listed in `?ids=1,2,3` with the same shape as the
+    detail view. The whole batch is loaded with one query plan, so the query
+    count does not depend on the number of ids. Results follow the order of
+    `ids`; ids that do not exist are listed under `missing`.
+    """
+    try:
+        ids = list(dict.fromkeys(int(part) for part in request.GET.get('ids', '').split(',') if part.strip()))
+    except ValueError:
+        return JsonResponse({'error': "ids must be a comma separated list of integers"}, status=400)
+    if len(ids) > BATCH_MAX_IDS:
+        return JsonResponse({'error': f"At most {BATCH_MAX_IDS} ids per request"}, status=400)
 
-from django.db.models import Count
+    fields, include = _sparse_params(request)
+    try:
+        serializer = serializer.select(fields, include)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    objects = serializer.plan(queryset.filter(pk__in=ids), restrict_columns=fields is not None).in_bulk()
+    return json_response({
+        'results': [serializer.to_dict(objects[pk]) for pk in ids if pk in objects],
+        'missing': [pk for pk in ids if pk not in objects],
+    })
 
 def artwork_list(request):
-    artworks = Artwork.objects.all().select_related('medium', 'medium__type')
+    artworks = Artwork.objects.all()
     
     medium_id = request.GET.get('medium')
     art_type_id = request.GET.get('art_type')
@@ -14,26 +72,58 @@ def artwork_list(request):
         artworks = artworks.filter(medium_id=medium_id)
     if art_type_id:
         artworks = artworks.filter(medium__type_id=art_type_id)
+    if request.GET.get('q'):
+        artworks = search_artworks(artworks, request.GET['q'])
 
-    artworks = artworks.annotate(
-        event_count=Count('provenance_events', distinct=True)
-    )
+    try:
+        artworks = browse.apply_size_filters(artworks, browse.parse_size_filters(request.GET))
+        rows = artwork_list_rows(artworks, *_sparse_params(request))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return json_response({'results': rows})
 
-    data = []
-    for art in artworks:
-        data.append({
-            'id': art.id,
-            'name': art.name,
-            'medium': art.medium.name if art.medium else '',
-            'medium_id': art.medium.id if art.medium else None,
-            'art_type': art.medium.type.name if art.medium and art.medium.type else '',
-            'art_type_id': art.medium.type.id if art.medium and art.medium.type else None,
-            'dimension': art.dimension,
-            'image': art.images.first().image.url if art.images.exists() else None,
-            'event_count': art.event_count,
-            'creation_date': '', 
-        })
-    return JsonResponse({'results': data})
+BROWSE_PAGE_SIZE = 48
+BROWSE_MAX_PAGE_SIZE = 200
+
+def artwork_browse(request):
+    """
+    Faceted, paginated artwork browsing. Filters and facets are described in
+    provenance.browse; `page`/`page_size` select the page, `?fields=` and
+    `?include=` shape the rows like artwork_list, and `?facets=0` skips the
+    facet counts.
+    """
+    try:
+        filters = browse.parse_filters(request.GET)
+        page_size = int(request.GET.get('page_size') or BROWSE_PAGE_SIZE)
+    except FilterParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': "page_size must be a number"}, status=400)
+    page_size = max(1, min(page_size, BROWSE_MAX_PAGE_SIZE))
+
+    artworks = browse.apply_filters(Artwork.objects.all(), filters)
+    # Counted exactly: a low planner estimate of the filtered rows would make
+    # get_page() fold later pages back onto the last estimated one.
+    paginator = Paginator(artworks.order_by('name', 'pk').values_list('pk', flat=True), page_size)
+    page = paginator.get_page(request.GET.get('page'))
+    try:
+        rows = artwork_list_rows(
+            Artwork.objects.filter(pk__in=list(page.object_list)).order_by('name', 'pk'),
+            *_sparse_params(request),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    data = {
+        'count': paginator.count,
+        'num_pages': paginator.num_pages,
+        'page': page.number,
+        'page_size': page_size,
+        'results': rows,
+    }
+    if request.GET.get('facets') != '0':
+        data['facets'] = browse.facet_counts(Artwork.objects.all(), filters)
+    return json_response(data)
 
 def art_type_list(request):
     types = ArtType.objects.all().order_by('name')
@@ -53,72 +143,146 @@ def medium_list(request):
     return JsonResponse({'results': data})
 
 def artwork_detail(request, pk):
-    art = get_object_or_404(Artwork, pk=pk)
-    
-def format_provenance_event(event):
-    person_name = str(event.person) if event.person else ""
-    institution_name = str(event.institution) if event.institution else ""
-
-    actor_name = ""
-    if person_name:
-        if institution_name:
-            actor_name = f"{person_name} ({institution_name})"
-        else:
-            actor_name = person_name
-    elif institution_name:
-        actor_name = institution_name
-    elif event.auction:
-        actor_name = str(event.auction)
-    elif event.exhibition:
-        actor_name = str(event.exhibition)
-    else:
-        actor_name = "Unknown"
+    return _serialize_detail(request, ARTWORK_DETAIL, Artwork.objects.all(), pk)
 
-    return {
-        'id': event.id,
-        'artwork_id': event.artwork.id,
-        'artwork_name': event.artwork.name,
-        'sequence': event.sequence_number,
-        'type': event.event_type.name if event.event_type else '',
-        'date': event.date,
-        'person': person_name,
-        'institution': institution_name,
-        'actor': actor_name,
-        'auction': str(event.auction) if event.auction else '',
-        'auction_id': event.auction.id if event.auction else None,
-        'auction_institution': str(event.auction.institution) if event.auction and event.auction.institution else '',
-        'exhibition': str(event.exhibition) if event.exhibition else '',
-        'exhibition_id': event.exhibition.id if event.exhibition else None,
-        'exhibition_institution': str(event.exhibition.institution) if event.exhibition and event.exhibition.institution else '',
-        'certainty': event.get_certainty_display() if event.certainty else '',
-        'sources': [
-            {'source': str(ps.source), 'notes': ps.notes}
-            for ps in event.provenanceeventsource_set.all().select_related('source')
-        ],
-        'notes': event.notes,
-    }
+def artwork_batch(request):
+    return _serialize_batch(request, ARTWORK_DETAIL, Artwork.objects.all())
 
-def artwork_detail(request, pk):
-    art = get_object_or_404(Artwork, pk=pk)
+def artwork_similar(request, pk):
+    """
+    Artworks with an image that looks like one of this artwork's images:
+    pHash distance at most `distance` bits (default 8), closest first. Only
+    images hashed by the `find_possible_matches` job are compared; see
+    provenance.image_hashes.
+    """
+    try:
+        max_distance = int(request.GET.get('distance') or image_hashes.MATCH_DISTANCE)
+        image_hashes.check_distance(max_distance)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    matches = sorted(image_hashes.similar_artworks(pk, max_distance).values(),
+                     key=lambda match: (match.distance, match.other_id))
+    if not matches and not Artwork.objects.filter(pk=pk).exists():
+        raise Http404
+    names = dict(Artwork.objects.filter(pk__in=[m.other_id for m in matches]).values_list('pk', 'name'))
+    return json_response({'results': [
+        {
+            'artwork_id': match.other_id,
+            'artwork_name': names.get(match.other_id, ''),
+            'image_id': match.image_id,
+            'matched_image_id': match.other_image_id,
+            'distance': match.distance,
+            'ahash_distance': match.ahash_distance,
+            'dhash_distance': match.dhash_distance,
+        }
+        for match in matches
+    ]})
 
-    # Provenance
-    events = [format_provenance_event(e) for e in art.provenance_events.all().order_by('sequence_number')]
+def _forbidden():
+    return JsonResponse({'error': 'Forbidden'}, status=403)
 
-    data = {
-        'id': art.id,
-        'name': art.name,
-        'medium': art.medium.name if art.medium else '',
-        'dimension': art.dimension,
-        'creation_date': '', 
-        'notes': art.notes,
-        'image': art.images.first().image.url if art.images.exists() else None,
-        'provenance': events
-    }
-    return JsonResponse(data)
+@require_http_methods(["POST"])
+def find_possible_matches(request):
+    """
+    Queues the job that hashes new images and records visually similar
+    artworks as `possible_match` relationships (optional `distance`).
+    Staff only.
+    """
+    from .jobs import submit
+    from .jobs_api import serialize_job
+
+    if not request.user.is_staff:
+        return _forbidden()
+    try:
+        max_distance = int(request.POST.get('distance') or image_hashes.MATCH_DISTANCE)
+        image_hashes.check_distance(max_distance)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    job = submit('find_possible_matches', {'max_distance': max_distance}, user=request.user)
+    return JsonResponse(serialize_job(job), status=202)
+
+def artwork_similar_histories(request, pk):
+    """
+    Artworks whose provenance chains align with this artwork's (sharing at
+    least two rare actors), best first: the normalized alignment `score`
+    and the aligned event pairs. Optional `min_score` (default 0.5) and
+    `limit` (default 20, at most 100); see provenance.chain_alignment.
+    """
+    try:
+        min_score = float(request.GET.get('min_score') or chain_alignment.MIN_SCORE)
+        limit = int(request.GET.get('limit') or 20)
+    except ValueError:
+        min_score = limit = -1
+    if not 0 <= min_score <= 1 or not 1 <= limit <= 100:
+        return JsonResponse({'error': "min_score must be between 0 and 1, limit between 1 and 100"}, status=400)
+    matches = chain_alignment.similar_histories(pk, min_score, limit)
+    if matches is None:
+        if not Artwork.objects.filter(pk=pk).exists():
+            raise Http404
+        matches = []
+    names = dict(Artwork.objects.filter(pk__in=[m.other_id for m in matches]).values_list('pk', 'name'))
+    return json_response({'results': [
+        {
+            'artwork_id': match.other_id,
+            'artwork_name': names.get(match.other_id, ''),
+            'score': match.score,
+            'shared_actors': match.shared_actors,
+            'aligned_events': [list(pair) for pair in match.pairs],
+        }
+        for match in matches
+    ]})
+
+@require_http_methods(["POST"])
+def align_histories(request):
+    """
+    Queues the job that aligns the provenance chains of all artworks and
+    records matching histories as `possible_match` relationships (optional
+    `min_score`). Staff only.
+    """
+    from .jobs import submit
+    from .jobs_api import serialize_job
+
+    if not request.user.is_staff:
+        return _forbidden()
+    try:
+        min_score = float(request.POST.get('min_score') or chain_alignment.MIN_SCORE)
+    except ValueError:
+        min_score = -1
+    if not 0 <= min_score <= 1:
+        return JsonResponse({'error': "min_score must be between 0 and 1"}, status=400)
+    job = submit('align_provenance_chains', {'min_score': min_score}, user=request.user)
+    return JsonResponse(serialize_job(job), status=202)
+
+def artwork_suggestions(request, pk):
+    """
+    Artworks whose title, dimensions, medium and actors resemble this
+    artwork's, best first, with the score of each component (`threshold`,
+    default 0.7). Candidates come from the buckets stored by the
+    `suggest_artwork_matches` command; see provenance.artwork_matching.
+    """
+    try:
+        threshold = float(request.GET.get('threshold') or artwork_matching.SUGGEST_THRESHOLD)
+    except ValueError:
+        threshold = -1
+    if not 0 <= threshold <= 1:
+        return JsonResponse({'error': "threshold must be a number between 0 and 1"}, status=400)
+    suggestions = artwork_matching.suggestions_for(pk, threshold)
+    if suggestions is None:
+        raise Http404
+    names = dict(Artwork.objects.filter(pk__in=[s.other_id for s in suggestions]).values_list('pk', 'name'))
+    return json_response({'results': [
+        {
+            'artwork_id': suggestion.other_id,
+            'artwork_name': names.get(suggestion.other_id, ''),
+            'score': suggestion.score,
+            'components': {name: round(value, 4) for name, value in suggestion.components.items()},
+        }
+        for suggestion in suggestions
+    ]})
 
 def person_list(request):
     from django.db.models import Count
-    persons = Person.objects.prefetch_related('images').annotate(
+    persons = Person.objects.annotate(
         event_count=Count('provenance_events', distinct=True),
         artwork_count=Count('provenance_events__artwork', distinct=True)
     ).order_by('family_name', 'first_name')
@@ -126,7 +290,10 @@ def person_list(request):
     event_type = request.GET.get('event_type')
     if event_type:
         persons = persons.filter(provenance_events__event_type_id=event_type).distinct()
+    if request.GET.get('q'):
+        persons = search_persons(persons, request.GET['q'])
 
+    images = first_image_urls(Person, persons.values('pk'))
     data = []
     for person in persons:
         data.append({
@@ -137,7 +304,7 @@ def person_list(request):
             'death_date': person.death_date,
             'event_count': person.event_count,
             'artwork_count': person.artwork_count,
-            'image': person.images.first().image.url if person.images.exists() else None,
+            'image': images.get(person.id),
         })
     return JsonResponse({'results': data})
 
@@ -149,279 +316,326 @@ def event_type_list(request):
     return JsonResponse({'results': data})
 
 def person_detail(request, pk):
-    person = get_object_or_404(Person.objects.prefetch_related('images'), pk=pk)
-    
-    events = []
-    for event in person.provenance_events.all().select_related('artwork'):
-        events.append(format_provenance_event(event))
-        
-    data = {
-        'id': person.id,
-        'family_name': person.family_name,
-        'first_name': person.first_name,
-        'birth_date': person.birth_date,
-        'death_date': person.death_date,
-        'biography': person.biography,
-        'image': person.images.first().image.url if person.images.exists() else None,
-        'events': events,
-    }
-    return JsonResponse(data)
+    return _serialize_detail(request, PERSON_DETAIL, Person.objects.all(), pk)
+
+def person_batch(request):
+    return _serialize_batch(request, PERSON_DETAIL, Person.objects.all())
 
 def institution_list(request):
-    from .models import Institution, ProvenanceEvent
-    from django.db.models import Prefetch
+    from .models import Institution
 
-    institutions = Institution.objects.all().order_by('name')
-    
+    # Artworks with events at the institution itself, then at its auctions
+    # and exhibitions.
+    artworks = artworks_by_actor(['institution_id', 'auction__institution_id', 'exhibition__institution_id'])
     data = []
-    for inst in institutions:
-        # Artworks directly linked to provenance events with this institution
-        direct_events = ProvenanceEvent.objects.filter(institution=inst).select_related('artwork', 'event_type')
-        
-        # Artworks linked via auctions held at this institution
-        auction_events = ProvenanceEvent.objects.filter(auction__institution=inst).select_related('artwork', 'event_type')
-        
-        # Artworks linked via exhibitions held at this institution
-        exhibition_events = ProvenanceEvent.objects.filter(exhibition__institution=inst).select_related('artwork', 'event_type')
-        
-        # Map artwork_id to {artwork_info, event_types_set}
-        artwork_map = {}
-        
-        all_events = list(direct_events) + list(auction_events) + list(exhibition_events)
-        
-        for event in all_events:
-            art = event.artwork
-            if art.id not in artwork_map:
-                artwork_map[art.id] = {
-                    'id': art.id,
-                    'name': art.name,
-                    'image': art.images.first().image.url if art.images.exists() else None,
-                    'event_types': set()
-                }
-            if event.event_type:
-                artwork_map[art.id]['event_types'].add(event.event_type.name)
-        
-        artworks_data = []
-        for art_id, art_info in artwork_map.items():
-            art_info['event_types'] = sorted(list(art_info['event_types']))
-            artworks_data.append(art_info)
-        
-        if artworks_data:
+    for inst in Institution.objects.order_by('name'):
+        if inst.id in artworks:
             data.append({
                 'id': inst.id,
                 'name': inst.name,
                 'place': inst.place,
-                'artworks': artworks_data,
-                'artwork_count': len(artworks_data)
+                'artworks': artworks[inst.id],
+                'artwork_count': len(artworks[inst.id])
             })
-            
     return JsonResponse({'results': data})
 
 def auction_list(request):
-    from .models import Auction, ProvenanceEvent
-    
-    auctions = Auction.objects.all().order_by('name')
-    
+    from .models import Auction
+
+    artworks = artworks_by_actor(['auction_id'])
     data = []
-    for auction in auctions:
-        events = ProvenanceEvent.objects.filter(auction=auction).select_related('artwork', 'event_type')
-        
-        artwork_map = {}
-        for event in events:
-            art = event.artwork
-            if art.id not in artwork_map:
-                artwork_map[art.id] = {
-                    'id': art.id,
-                    'name': art.name,
-                    'image': art.images.first().image.url if art.images.exists() else None,
-                    'event_types': set()
-                }
-            if event.event_type:
-                artwork_map[art.id]['event_types'].add(event.event_type.name)
-        
-        artworks_data = []
-        for art_id, art_info in artwork_map.items():
-            art_info['event_types'] = sorted(list(art_info['event_types']))
-            artworks_data.append(art_info)
-            
-        if artworks_data:
+    for auction in Auction.objects.select_related('institution').order_by('name'):
+        if auction.id in artworks:
             data.append({
                 'id': auction.id,
                 'name': auction.name,
                 'date': auction.date,
                 'institution': str(auction.institution) if auction.institution else '',
-                'artworks': artworks_data,
-                'artwork_count': len(artworks_data)
+                'artworks': artworks[auction.id],
+                'artwork_count': len(artworks[auction.id])
             })
-            
     return JsonResponse({'results': data})
 
 def exhibition_list(request):
-    from .models import Exhibition, ProvenanceEvent
-    
-    exhibitions = Exhibition.objects.all().order_by('name')
-    
+    from .models import Exhibition
+
+    artworks = artworks_by_actor(['exhibition_id'])
     data = []
-    for exhibition in exhibitions:
-        events = ProvenanceEvent.objects.filter(exhibition=exhibition).select_related('artwork', 'event_type')
-        
-        artwork_map = {}
-        for event in events:
-            art = event.artwork
-            if art.id not in artwork_map:
-                artwork_map[art.id] = {
-                    'id': art.id,
-                    'name': art.name,
-                    'image': art.images.first().image.url if art.images.exists() else None,
-                    'event_types': set()
-                }
-            if event.event_type:
-                artwork_map[art.id]['event_types'].add(event.event_type.name)
-        
-        artworks_data = []
-        for art_id, art_info in artwork_map.items():
-            art_info['event_types'] = sorted(list(art_info['event_types']))
-            artworks_data.append(art_info)
-            
-        if artworks_data:
+    for exhibition in Exhibition.objects.select_related('institution').order_by('name'):
+        if exhibition.id in artworks:
             data.append({
                 'id': exhibition.id,
                 'name': exhibition.name,
                 'date_start': exhibition.date_start,
                 'date_end': exhibition.date_end,
                 'institution': str(exhibition.institution) if exhibition.institution else '',
-                'artworks': artworks_data,
-                'artwork_count': len(artworks_data)
+                'artworks': artworks[exhibition.id],
+                'artwork_count': len(artworks[exhibition.id])
             })
-            
     return JsonResponse({'results': data})
 
 def event_report(request):
-    from .models import ProvenanceEvent
-    
-    events = ProvenanceEvent.objects.select_related(
-        'artwork', 
-        'event_type', 
-        'person', 
-        'institution', 
-        'auction', 
-    ).prefetch_related(
-        'provenanceeventsource_set__source'
-    ).order_by('artwork__name', 'sequence_number')
-    
-    data = []
-    for event in events:
-        sources = list(event.provenanceeventsource_set.all())
-        base_event_data = {
-            'artwork_id': event.artwork.id,
-            'artwork_name': event.artwork.name,
-            'sequence_number': event.sequence_number,
-            'event_type_id': event.event_type.id if event.event_type else None,
-            'event_type_name': event.event_type.name if event.event_type else '',
-            'date': event.date,
-            'person': str(event.person) if event.person else '',
-            'institution': str(event.institution) if event.institution else '',
-            'auction': str(event.auction) if event.auction else '',
-            'exhibition': str(event.exhibition) if event.exhibition else '',
-            'certainty': event.get_certainty_display() if event.certainty else '',
-        }
-        
-        if not sources:
-            base_event_data['id'] = f"{event.id}_0"
-            base_event_data['sources'] = ''
-            data.append(base_event_data)
-        else:
-            for s in sources:
-                event_copy = base_event_data.copy()
-                event_copy['id'] = f"{event.id}_{s.id}"
-                event_copy['sources'] = str(s.source)
-                data.append(event_copy)
-        
-    return JsonResponse({'results': data})
+    """
+    The flat event report. Filters, sort keys and facets are described in
+    provenance.event_report; `?facets=0` skips the facet counts.
+    """
+    try:
+        filters = parse_filters(request.GET)
+        order = ordering(request.GET.get('sort'))
+    except FilterParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-def export_event_report_excel(request):
-    import openpyxl
-    from django.http import HttpResponse
-    from .models import ProvenanceEvent
-
-    events = ProvenanceEvent.objects.select_related(
-        'artwork', 'event_type', 'person', 'institution', 'auction', 'exhibition'
-    ).prefetch_related(
-        'provenanceeventsource_set__source'
-    ).order_by('artwork__name', 'sequence_number')
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Event Report"
-
-    headers = [
-        'Art ID', 'Artwork Name', 'Sequence #', 'Type ID', 'Event Type',
-        'Date', 'Person', 'Institution', 'Auction', 'Exhibition', 'Certainty', 'Sources'
-    ]
-    ws.append(headers)
-
-    for event in events:
-        sources = list(event.provenanceeventsource_set.all())
-        base_row = [
-            event.artwork.id,
-            event.artwork.name,
-            event.sequence_number,
-            event.event_type.id if event.event_type else None,
-            event.event_type.name if event.event_type else '',
-            event.date,
-            str(event.person) if event.person else '',
-            str(event.institution) if event.institution else '',
-            str(event.auction) if event.auction else '',
-            str(event.exhibition) if event.exhibition else '',
-            event.get_certainty_display() if event.certainty else '',
-        ]
-        
-        if not sources:
-            ws.append(base_row + [''])
-        else:
-            for s in sources:
-                ws.append(base_row + [str(s.source)])
-
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="event_report.xlsx"'
-    wb.save(response)
+    events = ProvenanceEvent.objects.all()
+    data = {'results': event_report_rows(apply_filters(events, filters), order)}
+    if request.GET.get('facets') != '0':
+        data['facets'] = facet_counts(events, filters)
+    return json_response(data)
+
+def holding_list(request):
+    """
+    Who held what when: holding intervals of the given artworks or actors,
+    optionally at a `date` or overlapping `from`/`to`. Parameters are
+    described in provenance.holdings.
+    """
+    from .models import HoldingInterval
+
+    try:
+        filters = holdings.parse_filters(request.GET)
+    except FilterParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return json_response({'results': holding_rows(holdings.apply_filters(HoldingInterval.objects.all(), filters))})
+
+GAP_PAGE_SIZE = 50
+GAP_MAX_PAGE_SIZE = 500
+
+def _gap_report(request):
+    """
+    Runs the gap analysis for the request's window (`from`/`to`) on the
+    artworks matching the browse filters; returns (report, positions).
+    """
+    window = gaps.parse_window(request.GET)
+    kinds, min_score = gaps.parse_kinds(request.GET), gaps.parse_min_score(request.GET)
+    filters = browse.parse_filters(request.GET)
+    artworks = browse.apply_filters(Artwork.objects.all(), filters).values('pk') if filters else None
+    report = gaps.analyze_gaps(window, artworks)
+    return report, report.select(kinds, min_score)
+
+def holding_gaps(request):
+    """
+    Artworks with gaps, overlapping claims or low-certainty spans in their
+    provenance within `from`/`to` (default 1933-1945), worst first. `kind`
+    and `min_score` narrow the list; the artwork and event filters of the
+    browse endpoint restrict the analyzed artworks. See provenance.gaps.
+    """
+    try:
+        report, positions = _gap_report(request)
+        page_size = int(request.GET.get('page_size') or GAP_PAGE_SIZE)
+    except FilterParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': "page_size must be a number"}, status=400)
+    page_size = max(1, min(page_size, GAP_MAX_PAGE_SIZE))
+
+    paginator = Paginator(positions, page_size)
+    page = paginator.get_page(request.GET.get('page'))
+    first, after = report.window
+    return json_response({
+        'from': first.isoformat(),
+        'to': after.isoformat(),
+        'count': paginator.count,
+        'num_pages': paginator.num_pages,
+        'page': page.number,
+        'page_size': page_size,
+        'results': gaps.report_rows(report, page.object_list),
+    })
+
+def export_holding_gaps(request):
+    """The gap report as CSV with one line per span, streamed as it is written."""
+    try:
+        report, positions = _gap_report(request)
+    except FilterParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(gaps.EXPORT_COLUMNS)
+        for row in gaps.export_rows(report, positions):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="provenance_gaps.csv"'
+    return response
+
+def export_network(request):
+    """
+    The actor-artwork-event graph as `format=graphml` (default), `gexf` or
+    `csv` (edge list), streamed while it is read. The event report filters
+    (e.g. `group`, `year_from`, `year_to`) restrict it; see
+    provenance.graph_export.
+    """
+    try:
+        export_format = graph_export.parse_format(request.GET)
+        filters = parse_filters(request.GET)
+    except FilterParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    content_type, extension = graph_export.FORMATS[export_format]
+    response = StreamingHttpResponse(graph_export.export_lines(export_format, filters), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="provenance_network.{extension}"'
     return response
 
+def analytics_query(request):
+    """
+    Aggregates over the in-memory event columns, e.g.
+    `?group_by=decade,event_type` or `?group_by=art_type,actor_type&measure=artworks`.
+    Parameters are described in provenance.analytics.
+    """
+    try:
+        query = analytics.parse_query(request.GET)
+        data = analytics.aggregate(**query)
+    except FilterParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return json_response({'group_by': query['group_by'], 'measure': query['measure'], **data})
+
+CENTRALITY_DEFAULT_LIMIT = 50
+CENTRALITY_MAX_LIMIT = 500
+# Metrics ranked on the per-actor endpoint.
+CENTRALITY_RANKED = ('degree', 'betweenness', 'pagerank')
+
+def _latest_centrality_job():
+    from .models import Job
+
+    return Job.objects.filter(kind='compute_centrality').order_by('-created_at').first()
+
+def _centrality_state(rows):
+    """
+    Version info of the stored centrality metrics (`rows` is a sample of
+    them, all rows share one version) and the latest refresh job. Stale
+    metrics are refreshed by POSTing to `centrality_refresh`.
+    """
+    from .jobs_api import serialize_job
+    from .models import ActorCentrality
+
+    current = network.network_version()
+    if rows:
+        stored = rows[0].data_version
+    else:
+        stored = ActorCentrality.objects.values_list('data_version', flat=True).first()
+    job = _latest_centrality_job() if stored != current else None
+    return {
+        'data_version': stored,
+        'current_version': current,
+        'stale': stored != current,
+        'job': serialize_job(job) if job else None,
+    }
+
+def _centrality_row(row, names):
+    return {
+        'actor_type': row.actor_type,
+        'actor_id': row.actor_id,
+        'name': names.get((row.actor_type, row.actor_id), ''),
+        **{metric: getattr(row, metric) for metric in network.METRICS},
+    }
+
+def centrality_list(request):
+    """
+    Actors ranked by `metric` (degree, in_degree, out_degree, betweenness or
+    pagerank; default pagerank), optionally only of the actor types in
+    `type`. The metrics come from the last `compute_centrality` job, see
+    provenance.network; `stale` tells whether the data changed since.
+    """
+    from .models import ActorCentrality
+
+    metric = request.GET.get('metric') or 'pagerank'
+    if metric not in network.METRICS:
+        return JsonResponse({'error': f"metric must be one of: {', '.join(network.METRICS)}"}, status=400)
+    actor_types = [v.strip() for v in request.GET.get('type', '').split(',') if v.strip()]
+    unknown = set(actor_types) - set(network.ACTOR_TYPES)
+    if unknown:
+        return JsonResponse({'error': f"Unknown type: {', '.join(sorted(unknown))}"}, status=400)
+    try:
+        limit = int(request.GET.get('limit') or CENTRALITY_DEFAULT_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': "limit must be a number"}, status=400)
+    limit = max(1, min(limit, CENTRALITY_MAX_LIMIT))
+
+    rows = ActorCentrality.objects.order_by(f'-{metric}', 'actor_type', 'actor_id')
+    if actor_types:
+        rows = rows.filter(actor_type__in=actor_types)
+    rows = list(rows[:limit])
+    names = network.actor_names((row.actor_type, row.actor_id) for row in rows)
+    return json_response({
+        'metric': metric,
+        **_centrality_state(rows),
+        'results': [_centrality_row(row, names) for row in rows],
+    })
+
+def centrality_detail(request, actor_type, pk):
+    """The centrality metrics of one actor, with its rank by degree, betweenness and pagerank."""
+    from .models import ActorCentrality
+
+    if actor_type not in network.ACTOR_TYPES:
+        raise Http404
+    row = get_object_or_404(ActorCentrality, actor_type=actor_type, actor_id=pk)
+    names = network.actor_names([(actor_type, pk)])
+    ranks = {
+        metric: ActorCentrality.objects.filter(**{f'{metric}__gt': getattr(row, metric)}).count() + 1
+        for metric in CENTRALITY_RANKED
+    }
+    return json_response({**_centrality_row(row, names), 'rank': ranks, **_centrality_state([row])})
+
+@require_http_methods(["POST"])
+def centrality_refresh(request):
+    """
+    Queues a `compute_centrality` job for the current data, unless one is
+    already queued or running for it (then that job is returned with 200).
+    Staff only.
+    """
+    from django.db import transaction
+    from .jobs import submit
+    from .jobs_api import serialize_job
+    from .models import DataVersion, Job
+
+    if not request.user.is_staff:
+        return _forbidden()
+    with transaction.atomic():
+        # Serializes concurrent refreshes, so only one of them submits.
+        list(DataVersion.objects.select_for_update().filter(model=network.NETWORK_MODELS[0]))
+        current = network.network_version()
+        job = _latest_centrality_job()
+        if (job is not None and job.status in (Job.STATUS_QUEUED, Job.STATUS_RUNNING)
+                and job.params.get('data_version') == current):
+            return JsonResponse(serialize_job(job))
+        job = submit('compute_centrality', {'data_version': current}, user=request.user)
+    return JsonResponse(serialize_job(job), status=202)
+
+@require_http_methods(["POST"])
+def export_event_report_excel(request):
+    """
+    Queues the Excel export as a background job and returns the job right away.
+    The frontend polls `status_url` and downloads `download_url` once finished.
+    Logged-in users only, so every export job has an owner.
+    """
+    from .jobs import submit
+    from .jobs_api import serialize_job
+
+    if not request.user.is_authenticated:
+        return _forbidden()
+    job = submit('export_event_report', user=request.user)
+    return JsonResponse(serialize_job(job), status=202)
+
 def source_list(request):
-    from .models import Source, ProvenanceEvent
-    
-    sources = Source.objects.all().order_by('source')
-    
+    from .models import Source
+
+    artworks = artworks_by_actor(['provenanceeventsource__source_id'])
     data = []
-    for src in sources:
-        events = ProvenanceEvent.objects.filter(sources=src).select_related('artwork', 'event_type')
-        
-        artwork_map = {}
-        for event in events:
-            art = event.artwork
-            if art.id not in artwork_map:
-                artwork_map[art.id] = {
-                    'id': art.id,
-                    'name': art.name,
-                    'image': art.images.first().image.url if art.images.exists() else None,
-                    'event_types': set()
-                }
-            if event.event_type:
-                artwork_map[art.id]['event_types'].add(event.event_type.name)
-        
-        artworks_data = []
-        for art_id, art_info in artwork_map.items():
-            art_info['event_types'] = sorted(list(art_info['event_types']))
-            artworks_data.append(art_info)
-            
-        if artworks_data:
+    for src in Source.objects.order_by('source'):
+        if src.id in artworks:
             data.append({
                 'id': src.id,
                 'name': src.source,
                 'type': src.type,
                 'link': src.link,
-                'artworks': artworks_data,
-                'artwork_count': len(artworks_data)
+                'artworks': artworks[src.id],
+                'artwork_count': len(artworks[src.id])
             })
-            
     return JsonResponse({'results': data})
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ProvenanceConfig(AppConfig):
     name = 'provenance'
+
+    def ready(self):
+        # Registers the background job handlers.
+        from . import tasks  # noqa: F401
+        from .versions import connect_signals
+        connect_signals()
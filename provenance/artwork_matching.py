@@ -0,0 +1,344 @@
+"""
+Artwork matching: the same work recorded under slightly different titles,
+dimensions or media.
+
+Every artwork is described by a set of tokens: character trigrams of its
+normalized title, its height and width in 5 cm steps, its medium and the
+actors of its provenance events. MinHash signatures of those sets are cut
+into LSH bands and each band is hashed into an `ArtworkBucket`; artworks
+that share a bucket are candidates (two sets with Jaccard similarity s share
+one of BANDS buckets with probability 1 - (1 - s^ROWS)^BANDS, about 40% at
+s = 0.3 and over 99.9% at s = 0.7). Only candidates are scored, on title trigram
+similarity, dimensions (either orientation), medium and shared actors, so
+no pair of artworks is compared otherwise.
+
+`update_signatures()` recomputes the buckets of artworks whose tokens
+changed since the last run; `suggest_matches()` scores the candidates of
+given (or all) artworks. The `suggest_artwork_matches` command runs both
+incrementally, `/api/artworks/<id>/suggestions/` scores one artwork live.
+"""
+import hashlib
+import re
+import zlib
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .dimensions import Dimensions
+from .persons import normalize_name
+
+NUM_PERM = 60
+ROWS = 3
+BANDS = NUM_PERM // ROWS
+DIMENSION_STEP_CM = 5
+
+# Buckets shared by more artworks than this ("Untitled", "Ohne Titel") are
+# too common to suggest anything.
+MAX_BUCKET_SIZE = 200
+
+SUGGEST_THRESHOLD = 0.7
+# Weights of the score components; missing components are left out.
+WEIGHTS = {'title': 0.5, 'dimension': 0.2, 'medium': 0.1, 'actors': 0.2}
+# Dimensions this close (relative) count as equal, this far apart as different.
+DIMENSION_TOLERANCE = (0.02, 0.1)
+
+SIGNATURE_BATCH_SIZE = 2000
+ID_BATCH_SIZE = 500
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240301)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.integers(1, 1 << 62, ROWS, dtype=np.uint64)
+
+Features = namedtuple('Features', 'name trigrams dimensions medium_id actors')
+Suggestion = namedtuple('Suggestion', 'artwork_id other_id score components')
+
+
+def normalize_title(text):
+    """'Kühe am Fluss (Nr. 2)' -> 'kuehe am fluss nr 2'; unlike names, digits are kept."""
+    parts = re.split(r'(\d+)', str(text or ''))
+    return ' '.join(filter(None, (part if part.isdigit() else normalize_name(part) for part in parts)))
+
+
+def _trigrams(title):
+    return frozenset(
+        padded[n:n + 3] for word in title.split() for padded in [f' {word} '] for n in range(len(padded) - 2)
+    )
+
+
+def features(name, dimensions, medium_id, actors):
+    title = normalize_title(name)
+    return Features(name, _trigrams(title), dimensions, medium_id, frozenset(actors))
+
+
+def tokens(feature):
+    result = [f't:{trigram}' for trigram in feature.trigrams]
+    dimensions = feature.dimensions
+    if dimensions:
+        result += [f'{axis}:{round(value / DIMENSION_STEP_CM)}'
+                   for axis, value in (('h', dimensions.height), ('w', dimensions.width)) if value]
+    if feature.medium_id:
+        result.append(f'm:{feature.medium_id}')
+    result += [f'a:{actor_type}:{pk}' for actor_type, pk in feature.actors]
+    return sorted(result)
+
+
+def fingerprint(token_list):
+    return hashlib.md5('\n'.join([f'{NUM_PERM}/{ROWS}', *token_list]).encode()).hexdigest()
+
+
+def load_features(artwork_ids=None):
+    """{artwork id: Features} of `artwork_ids` (default: all artworks). Two queries per id batch."""
+    from .models import Artwork, ProvenanceEvent
+
+    if artwork_ids is None:
+        batches = [None]
+    else:
+        artwork_ids = sorted(set(artwork_ids))
+        batches = [artwork_ids[n:n + ID_BATCH_SIZE] for n in range(0, len(artwork_ids), ID_BATCH_SIZE)]
+    result = {}
+    for batch in batches:
+        artworks, events = Artwork.objects.all(), ProvenanceEvent.objects.all()
+        if batch is not None:
+            artworks, events = artworks.filter(pk__in=batch), events.filter(artwork_id__in=batch)
+        actors = defaultdict(set)
+        for artwork_id, *columns in events.values_list(
+            'artwork_id', 'person_id', 'institution_id', 'auction_id', 'exhibition_id',
+        ).iterator(chunk_size=SIGNATURE_BATCH_SIZE):
+            for actor_type, pk in zip(('person', 'institution', 'auction', 'exhibition'), columns):
+                if pk:
+                    actors[artwork_id].add((actor_type, pk))
+        # The sizes parsed from `dimension` when the artwork was saved.
+        for pk, name, medium_id, height, width, depth, unit in artworks.values_list(
+            'pk', 'name', 'medium_id', 'height', 'width', 'depth', 'dimension_unit',
+        ).iterator(chunk_size=SIGNATURE_BATCH_SIZE):
+            dimensions = Dimensions(height, width, depth, unit) if height or width or depth else None
+            result[pk] = features(name, dimensions, medium_id, actors.get(pk, ()))
+    return result
+
+
+@lru_cache(maxsize=100000)
+def _token_hash(token):
+    return zlib.crc32(token.encode()) % _PRIME
+
+
+def minhash(token_lists):
+    """(len(token_lists), NUM_PERM) MinHash signatures of non-empty token lists."""
+    signatures = np.zeros((len(token_lists), NUM_PERM), dtype=np.uint64)
+    for first in range(0, len(token_lists), SIGNATURE_BATCH_SIZE):
+        chunk = token_lists[first:first + SIGNATURE_BATCH_SIZE]
+        values = np.fromiter((_token_hash(t) for tokens_ in chunk for t in tokens_), dtype=np.uint64)
+        starts = np.r_[0, np.cumsum([len(tokens_) for tokens_ in chunk])[:-1]]
+        hashed = (_A[:, None] * values[None, :] + _B[:, None]) % np.uint64(_PRIME)
+        signatures[first:first + len(chunk)] = np.minimum.reduceat(hashed, starts, axis=1).T
+    return signatures
+
+
+def lsh_buckets(signatures):
+    """(n, BANDS) bucket keys: each band's rows and its index hashed to a signed 64-bit int."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS)
+    keys = (bands * _BAND_MULTIPLIERS).sum(axis=2) + np.arange(BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    return keys.view(np.int64)
+
+
+def buckets_of(feature_list):
+    """LSH buckets of each Features in `feature_list` (an empty list for no tokens)."""
+    token_lists = [tokens(feature) for feature in feature_list]
+    filled = [n for n, token_list in enumerate(token_lists) if token_list]
+    result = [[] for _ in token_lists]
+    if filled:
+        keys = lsh_buckets(minhash([token_lists[n] for n in filled]))
+        for n, row in zip(filled, keys.tolist()):
+            result[n] = row
+    return result
+
+
+def update_signatures(full=False):
+    """
+    Recomputes the buckets of the artworks whose tokens changed since the
+    last run (all artworks with `full`). Returns the ids of the updated
+    artworks.
+    """
+    from .models import ArtworkBucket, ArtworkSignature
+
+    current = load_features()
+    token_lists = {pk: tokens(feature) for pk, feature in current.items()}
+    stored = {} if full else dict(ArtworkSignature.objects.values_list('artwork_id', 'fingerprint'))
+    fingerprints = {pk: fingerprint(token_list) for pk, token_list in token_lists.items() if token_list}
+    changed = sorted(pk for pk in current if stored.get(pk) != fingerprints.get(pk))
+    if not changed:
+        return []
+
+    filled = [pk for pk in changed if pk in fingerprints]
+    keys = lsh_buckets(minhash([token_lists[pk] for pk in filled])) if filled else np.zeros((0, BANDS))
+    with transaction.atomic():
+        for first in range(0, len(changed), ID_BATCH_SIZE):
+            batch = changed[first:first + ID_BATCH_SIZE]
+            ArtworkBucket.objects.filter(artwork_id__in=batch).delete()
+            ArtworkSignature.objects.filter(artwork_id__in=batch).delete()
+        ArtworkSignature.objects.bulk_create(
+            (ArtworkSignature(artwork_id=pk, fingerprint=fingerprints[pk]) for pk in filled),
+            batch_size=SIGNATURE_BATCH_SIZE,
+        )
+        ArtworkBucket.objects.bulk_create(
+            (ArtworkBucket(artwork_id=pk, bucket=key) for pk, row in zip(filled, keys.tolist()) for key in row),
+            batch_size=SIGNATURE_BATCH_SIZE,
+        )
+    return changed
+
+
+def _closeness(a, b):
+    low, high = DIMENSION_TOLERANCE
+    difference = abs(a - b) / max(a, b)
+    return max(0.0, min(1.0, (high - difference) / (high - low)))
+
+
+def _dimension_score(a, b):
+    if not (a and b and a.height and a.width and b.height and b.width):
+        return None
+    straight = min(_closeness(a.height, b.height), _closeness(a.width, b.width))
+    turned = min(_closeness(a.height, b.width), _closeness(a.width, b.height))
+    return max(straight, turned)
+
+
+def score_pair(a, b):
+    """(score, {component: value}) of two Features; components that are unknown on either side are left out."""
+    union = a.trigrams | b.trigrams
+    components = {'title': len(a.trigrams & b.trigrams) / len(union) if union else 0.0}
+    dimension = _dimension_score(a.dimensions, b.dimensions)
+    if dimension is not None:
+        components['dimension'] = dimension
+    if a.medium_id and b.medium_id:
+        components['medium'] = 1.0 if a.medium_id == b.medium_id else 0.0
+    if a.actors and b.actors:
+        components['actors'] = len(a.actors & b.actors) / len(a.actors | b.actors)
+    score = sum(WEIGHTS[name] * value for name, value in components.items()) / sum(map(WEIGHTS.get, components))
+    return score, components
+
+
+def _related_pairs(artwork_ids):
+    from .models import ArtworkRelationship
+
+    related = set()
+    for source, target in ArtworkRelationship.objects.filter(
+        Q(source_artwork_id__in=artwork_ids) | Q(target_artwork_id__in=artwork_ids),
+    ).values_list('source_artwork_id', 'target_artwork_id'):
+        related.update([(source, target), (target, source)])
+    return related
+
+
+def _candidates(bucket_members):
+    """Artwork pairs (a < b) sharing a bucket of {bucket: {artwork ids}} that is not too common."""
+    pairs = set()
+    for members in bucket_members.values():
+        if 1 < len(members) <= MAX_BUCKET_SIZE:
+            ordered = sorted(members)
+            pairs.update((a, b) for n, a in enumerate(ordered) for b in ordered[n + 1:])
+    return pairs
+
+
+def _score(pairs, feature_map, threshold):
+    suggestions = []
+    for a, b in pairs:
+        score, components = score_pair(feature_map[a], feature_map[b])
+        if score >= threshold:
+            suggestions.append(Suggestion(a, b, round(score, 4), components))
+    return sorted(suggestions, key=lambda s: (-s.score, s.artwork_id, s.other_id))
+
+
+def suggest_matches(artwork_ids=None, threshold=SUGGEST_THRESHOLD):
+    """
+    Scored candidate pairs involving `artwork_ids` (default: all pairs),
+    best first, leaving out pairs that are already related. Reads the
+    stored buckets, so run `update_signatures()` first.
+    """
+    from .models import ArtworkBucket
+
+    buckets = ArtworkBucket.objects.all()
+    if artwork_ids is not None:
+        artwork_ids = sorted(set(artwork_ids))
+        keys = set()
+        for first in range(0, len(artwork_ids), ID_BATCH_SIZE):
+            keys.update(ArtworkBucket.objects.filter(
+                artwork_id__in=artwork_ids[first:first + ID_BATCH_SIZE],
+            ).values_list('bucket', flat=True))
+        keys = sorted(keys)
+        rows = []
+        for first in range(0, len(keys), ID_BATCH_SIZE):
+            rows.extend(buckets.filter(bucket__in=keys[first:first + ID_BATCH_SIZE]).values_list('bucket', 'artwork_id'))
+    else:
+        rows = buckets.values_list('bucket', 'artwork_id').iterator(chunk_size=SIGNATURE_BATCH_SIZE)
+    members = defaultdict(set)
+    for key, artwork_id in rows:
+        members[key].add(artwork_id)
+    pairs = _candidates(members)
+    if artwork_ids is not None:
+        wanted = set(artwork_ids)
+        pairs = {(a, b) for a, b in pairs if a in wanted or b in wanted}
+    if not pairs:
+        return []
+    involved = {pk for pair in pairs for pk in pair}
+    related = _related_pairs(involved)
+    feature_map = load_features(involved)
+    return _score((pair for pair in pairs if pair not in related), feature_map, threshold)
+
+
+def suggestions_for(artwork_id, threshold=SUGGEST_THRESHOLD):
+    """
+    Suggestions for one artwork, computed from its current data (its own
+    buckets need not be stored yet). None if the artwork does not exist.
+    """
+    from .models import ArtworkBucket
+
+    own = load_features([artwork_id]).get(artwork_id)
+    if own is None:
+        return None
+    keys = buckets_of([own])[0]
+    members = defaultdict(set)
+    for key, other_id in ArtworkBucket.objects.filter(bucket__in=keys).exclude(artwork_id=artwork_id).values_list(
+        'bucket', 'artwork_id',
+    ):
+        members[key].add(other_id)
+    candidates = {
+        other_id for other_ids in members.values() if len(other_ids) < MAX_BUCKET_SIZE for other_id in other_ids
+    }
+    if not candidates:
+        return []
+    related = _related_pairs([artwork_id])
+    feature_map = {**load_features(candidates), artwork_id: own}
+    pairs = ((artwork_id, other_id) for other_id in candidates if (artwork_id, other_id) not in related)
+    return _score(pairs, feature_map, threshold)
+
+
+def describe(suggestion):
+    """Human readable reasoning of a Suggestion."""
+    parts = ', '.join(f'{name} {value:.2f}' for name, value in suggestion.components.items())
+    return f"Metadata similarity {suggestion.score:.2f} ({parts})"
+
+
+def record_possible_matches(pairs):
+    """
+    Records (artwork id, other id, reasoning) triples as `possible_match`
+    relationships, skipping artwork pairs that are already related in
+    either direction. Returns the number of relationships created.
+    """
+    from .models import ArtworkRelationship
+
+    pairs = list(pairs)
+    if not pairs:
+        return 0
+    related = _related_pairs({pk for a, b, _ in pairs for pk in (a, b)})
+    new = []
+    for a, b, reasoning in pairs:
+        if (a, b) not in related:
+            related.update([(a, b), (b, a)])
+            new.append(ArtworkRelationship(
+                source_artwork_id=a, target_artwork_id=b, type='possible_match', reasoning=reasoning,
+            ))
+    with transaction.atomic():
+        ArtworkRelationship.objects.bulk_create(new, batch_size=500)
+    return len(new)
@@ -0,0 +1,157 @@
+"""
+Faceted artwork browsing (`/api/artworks/browse/`).
+
+Artwork filters: `medium`, `art_type`, `group` (comma separated ids), `q`
+(artwork name) and `height_min`/`height_max`, `width_min`/`width_max`,
+`depth_min`/`depth_max` (cm, on the parsed dimensions). Event filters: `event_type`, `certainty`, `person`,
+`institution`, `auction`, `exhibition`, `source`, `year_from`/`year_to`;
+together they select artworks with at least one event matching all of them.
+
+Facets count artworks, each over the artworks filtered by all other
+dimensions: one grouped query per facet, independent of the number of
+artworks or facet values.
+"""
+import math
+
+from django.db.models import Count, ExpressionWrapper, F, IntegerField
+
+from . import event_report
+from .event_report import FilterParamError, grouped_counts, parse_id_list
+from .models import Artwork, ProvenanceEvent
+from .search import search_artworks
+
+ARTWORK_ID_FILTERS = {
+    'medium': 'medium_id',
+    'art_type': 'medium__type_id',
+}
+
+# Query parameter -> range lookup on the parsed dimensions (cm).
+SIZE_FILTERS = {
+    f'{field}_{bound}': f'{field}__{lookup}'
+    for field in ('height', 'width', 'depth') for bound, lookup in (('min', 'gte'), ('max', 'lte'))
+}
+
+# Dimensions filtered on the artwork itself; everything else is an event filter.
+ARTWORK_DIMENSIONS = (*ARTWORK_ID_FILTERS, *SIZE_FILTERS, 'group', 'q')
+
+
+def parse_size_filters(params):
+    """{size filter: cm} of the SIZE_FILTERS set in `params`."""
+    filters = {}
+    for name in SIZE_FILTERS:
+        value = params.get(name, '').strip().replace(',', '.')
+        if not value:
+            continue
+        try:
+            filters[name] = float(value)
+        except ValueError:
+            filters[name] = math.nan
+        if not math.isfinite(filters[name]):
+            raise FilterParamError(f"{name} must be a number (cm)")
+    return filters
+
+
+def apply_size_filters(queryset, filters):
+    """Filters an Artwork queryset by the result of `parse_size_filters()`."""
+    return queryset.filter(**{SIZE_FILTERS[name]: value for name, value in filters.items()})
+
+
+def parse_filters(params):
+    filters = event_report.parse_filters(params)
+    for name in ARTWORK_ID_FILTERS:
+        ids = parse_id_list(params, name)
+        if ids:
+            filters[name] = ids
+    filters.update(parse_size_filters(params))
+    return filters
+
+
+def _event_filters(filters, exclude=None):
+    return {
+        name: value for name, value in filters.items()
+        if name not in ARTWORK_DIMENSIONS and name != exclude
+    }
+
+
+def _filter_artworks(queryset, filters, exclude=None):
+    """Applies the artwork-level filters except `exclude`."""
+    for name, value in filters.items():
+        if name == exclude:
+            continue
+        if name in ARTWORK_ID_FILTERS:
+            queryset = queryset.filter(**{f'{ARTWORK_ID_FILTERS[name]}__in': value})
+        elif name in SIZE_FILTERS:
+            queryset = queryset.filter(**{SIZE_FILTERS[name]: value})
+        elif name == 'group':
+            queryset = queryset.filter(
+                pk__in=Artwork.groups.through.objects.filter(artworkgroup_id__in=value).values('artwork_id')
+            )
+        elif name == 'q':
+            queryset = search_artworks(queryset, value)
+    return queryset
+
+
+def _matching_events(filters, exclude=None):
+    return event_report.apply_filters(ProvenanceEvent.objects.all(), _event_filters(filters, exclude))
+
+
+def _has_filters(filters, exclude=None):
+    return any(name != exclude for name in filters)
+
+
+def apply_filters(queryset, filters, exclude=None):
+    """
+    Filters an Artwork queryset. Event filters are combined into a single
+    `pk IN (SELECT artwork_id ...)` so they must match on the same event.
+    """
+    queryset = _filter_artworks(queryset, filters, exclude)
+    if _event_filters(filters, exclude):
+        queryset = queryset.filter(pk__in=_matching_events(filters, exclude).values('artwork_id'))
+    return queryset
+
+
+def facet_counts(queryset, filters):
+    """
+    Artwork counts per medium, art type, group, event type, certainty and
+    decade.
+    """
+    def artworks(dimension):
+        return apply_filters(queryset, filters, exclude=dimension).order_by()
+
+    def for_artworks(related, dimension=None):
+        # Restricts rows of a related table (`artwork_id`) to the matching
+        # artworks; without any filter the subquery would only cost time.
+        if not _has_filters(filters, exclude=dimension):
+            return related
+        return related.filter(artwork_id__in=artworks(dimension).values('pk'))
+
+    def events(dimension):
+        # Events of the artworks matching the artwork filters, narrowed by the
+        # other event filters; counts are distinct artworks.
+        events = _matching_events(filters, exclude=dimension)
+        if any(name in ARTWORK_DIMENSIONS for name in filters):
+            events = events.filter(artwork_id__in=_filter_artworks(queryset, filters).values('pk'))
+        return events.order_by()
+
+    artwork_count = Count('artwork_id', distinct=True)
+    certainty_labels = dict(ProvenanceEvent.CERTAINTY_CHOICES)
+    decade = ExpressionWrapper(F('year') / 10 * 10, output_field=IntegerField())
+    return {
+        'medium': grouped_counts(artworks('medium'), 'medium_id', ['medium__name'], str),
+        'art_type': grouped_counts(artworks('art_type'), 'medium__type_id', ['medium__type__name'], str),
+        'group': grouped_counts(
+            for_artworks(Artwork.groups.through.objects.all(), 'group'),
+            'artworkgroup_id', ['artworkgroup__name'], str,
+        ),
+        'event_type': grouped_counts(
+            events('event_type'), 'event_type_id', ['event_type__name'], str, count=artwork_count,
+        ),
+        'certainty': grouped_counts(
+            events('certainty').exclude(certainty=''), 'certainty', [],
+            lambda value: certainty_labels.get(value, value), count=artwork_count,
+        ),
+        'decade': sorted(grouped_counts(
+            events('year').annotate(decade=decade), 'decade', [],
+            lambda value: f"{value}s", count=artwork_count,
+        ), key=lambda facet: facet['id']),
+    }
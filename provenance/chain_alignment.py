@@ -0,0 +1,246 @@
+"""
+Provenance chain alignment: artworks whose histories run through the same
+holders, which usually means two records of one physical work.
+
+An artwork's chain is its events in sequence order (disproven ones left
+out), each a token of its actor (as in provenance.network) and its event
+type. Two chains are compared by local alignment (Smith-Waterman), so a
+shared stretch of owners and sales scores high even when either record has
+extra events around it. The score is normalized by the shorter chain's
+score against itself: 1 means one chain is contained in the other.
+
+Only artworks sharing at least MIN_SHARED_ACTORS rare actors are aligned.
+An actor is rare when it appears in the chains of at most MAX_ACTOR_ARTWORKS
+artworks; dealers and museums that held thousands of works say nothing
+about two records being the same work. The inverted index of actors to
+artworks finds the candidates without comparing every pair.
+
+`similar_histories()` serves `/api/artworks/<id>/similar-histories/`;
+`align_all()` runs as the `align_provenance_chains` job, which records the
+matches as `possible_match` relationships.
+"""
+from collections import defaultdict, namedtuple
+from itertools import combinations
+
+from django.db.models import Q
+
+from .network import EVENT_ACTOR_COLUMNS, event_actor
+
+# Alignment scores: same actor, plus a bonus for the same event type; two
+# events without an actor count a little when their types agree.
+ACTOR_MATCH = 2.0
+EVENT_TYPE_MATCH = 1.0
+TYPE_ONLY_MATCH = 0.5
+MISMATCH = -1.0
+GAP = -1.0
+
+MAX_ACTOR_ARTWORKS = 50
+MIN_SHARED_ACTORS = 2
+MIN_SCORE = 0.5
+
+CHUNK_SIZE = 5000
+
+# `event`: id; `actor`: (type, id) or None; `event_type`: EventType id or None.
+Token = namedtuple('Token', 'event actor event_type')
+# `pairs`: aligned (event id, other event id) with the same actor, in order.
+HistoryMatch = namedtuple('HistoryMatch', 'artwork_id other_id score shared_actors pairs')
+
+
+def _token(event_id, event_type_id, columns):
+    return Token(event_id, event_actor(*columns), event_type_id)
+
+
+def load_chains(artwork_ids=None):
+    """{artwork id: [Token]} of `artwork_ids` (default: every artwork with events). One query."""
+    from .models import ProvenanceEvent
+
+    events = ProvenanceEvent.objects.exclude(certainty='false')
+    if artwork_ids is not None:
+        events = events.filter(artwork_id__in=artwork_ids)
+    chains = defaultdict(list)
+    for event_id, artwork_id, event_type_id, *columns in events.order_by(
+        'artwork_id', 'sequence_number', 'pk',
+    ).values_list('pk', 'artwork_id', 'event_type_id', *EVENT_ACTOR_COLUMNS).iterator(chunk_size=CHUNK_SIZE):
+        chains[artwork_id].append(_token(event_id, event_type_id, columns))
+    return dict(chains)
+
+
+def match_score(a, b):
+    if a.actor is not None and a.actor == b.actor:
+        return ACTOR_MATCH + (EVENT_TYPE_MATCH if a.event_type == b.event_type else 0.0)
+    if a.actor is None and b.actor is None and a.event_type is not None and a.event_type == b.event_type:
+        return TYPE_ONLY_MATCH
+    return MISMATCH
+
+
+def self_score(chain):
+    return sum(max(match_score(token, token), 0.0) for token in chain)
+
+
+def align(a, b):
+    """
+    Best local alignment of two chains: (raw score, [(index in a, index in
+    b)] of the aligned tokens with the same actor).
+    """
+    rows, cols = len(a), len(b)
+    score = [[0.0] * (cols + 1) for _ in range(rows + 1)]
+    best, best_cell = 0.0, (0, 0)
+    for i in range(1, rows + 1):
+        previous, current = score[i - 1], score[i]
+        for j in range(1, cols + 1):
+            value = max(
+                0.0, previous[j - 1] + match_score(a[i - 1], b[j - 1]), previous[j] + GAP, current[j - 1] + GAP,
+            )
+            current[j] = value
+            if value > best:
+                best, best_cell = value, (i, j)
+
+    pairs = []
+    i, j = best_cell
+    while i and j and score[i][j] > 0:
+        value = score[i][j]
+        diagonal = match_score(a[i - 1], b[j - 1])
+        if value == score[i - 1][j - 1] + diagonal:
+            if diagonal > 0 and a[i - 1].actor is not None:
+                pairs.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif value == score[i - 1][j] + GAP:
+            i -= 1
+        else:
+            j -= 1
+    return best, pairs[::-1]
+
+
+def compare(artwork_id, chain, other_id, other):
+    """HistoryMatch of two chains, with the score normalized to 0-1."""
+    raw, pairs = align(chain, other)
+    shortest = min(self_score(chain), self_score(other))
+    shared = len({chain[i].actor for i, _ in pairs})
+    return HistoryMatch(
+        artwork_id, other_id, round(min(1.0, raw / shortest), 4) if shortest else 0.0, shared,
+        [(chain[i].event, other[j].event) for i, j in pairs],
+    )
+
+
+def _actors(chain):
+    return {token.actor for token in chain if token.actor is not None}
+
+
+def inverted_index(chains):
+    """{actor: sorted artwork ids} of `chains`."""
+    index = defaultdict(set)
+    for artwork_id, chain in chains.items():
+        for actor in _actors(chain):
+            index[actor].add(artwork_id)
+    return {actor: sorted(artwork_ids) for actor, artwork_ids in index.items()}
+
+
+def candidate_pairs(index, max_actor_artworks=MAX_ACTOR_ARTWORKS, min_shared=MIN_SHARED_ACTORS):
+    """Artwork pairs (a < b) sharing at least `min_shared` rare actors of an inverted index."""
+    shared = defaultdict(int)
+    for artwork_ids in index.values():
+        if len(artwork_ids) <= max_actor_artworks:
+            for pair in combinations(artwork_ids, 2):
+                shared[pair] += 1
+    return sorted(pair for pair, count in shared.items() if count >= min_shared)
+
+
+def _ranked(matches, min_score):
+    return sorted(
+        (match for match in matches if match.score >= min_score),
+        key=lambda match: (-match.score, -match.shared_actors, match.artwork_id, match.other_id),
+    )
+
+
+def align_all(min_score=MIN_SCORE, progress=None):
+    """
+    Every pair of artworks whose chains align with at least `min_score`,
+    best first. Returns (matches, number of candidate pairs aligned).
+    """
+    chains = load_chains()
+    pairs = candidate_pairs(inverted_index(chains))
+    matches = []
+    for n, (a, b) in enumerate(pairs, start=1):
+        matches.append(compare(a, chains[a], b, chains[b]))
+        if progress and n % 1000 == 0:
+            progress(n, len(pairs))
+    return _ranked(matches, min_score), len(pairs)
+
+
+def _postings(actors):
+    """
+    Rows (artwork id, actor) of the events with one of `actors`, reading
+    only the columns the actors can come from. One query.
+    """
+    from .models import ProvenanceEvent
+
+    ids = defaultdict(list)
+    for actor_type, pk in actors:
+        ids[actor_type].append(pk)
+    condition = Q(pk__in=[])
+    for actor_type, columns in (
+        ('person', ['person_id']),
+        ('institution', ['institution_id', 'auction__institution_id', 'exhibition__institution_id']),
+        ('auction', ['auction_id']), ('exhibition', ['exhibition_id']),
+    ):
+        if ids[actor_type]:
+            for column in columns:
+                condition |= Q(**{f'{column}__in': ids[actor_type]})
+    rows = ProvenanceEvent.objects.exclude(certainty='false').filter(condition).values_list(
+        'artwork_id', *EVENT_ACTOR_COLUMNS,
+    ).distinct()
+    for artwork_id, *columns in rows.iterator(chunk_size=CHUNK_SIZE):
+        actor = event_actor(*columns)
+        if actor in actors:
+            yield artwork_id, actor
+
+
+def similar_histories(artwork_id, min_score=MIN_SCORE, limit=20):
+    """
+    The `limit` artworks whose chains align best with `artwork_id`'s, as
+    HistoryMatch. None when the artwork has no events. At most three
+    queries.
+    """
+    chain = load_chains([artwork_id]).get(artwork_id)
+    if not chain:
+        return None
+    index = defaultdict(set)
+    for other_id, actor in _postings(_actors(chain)):
+        index[actor].add(other_id)
+    counts = defaultdict(int)
+    for artwork_ids in index.values():
+        if len(artwork_ids) <= MAX_ACTOR_ARTWORKS:
+            for other_id in artwork_ids - {artwork_id}:
+                counts[other_id] += 1
+    candidates = [other_id for other_id, count in counts.items() if count >= MIN_SHARED_ACTORS]
+    if not candidates:
+        return []
+    chains = load_chains(candidates)
+    matches = (compare(artwork_id, chain, other_id, chains[other_id]) for other_id in candidates)
+    return _ranked(matches, min_score)[:limit]
+
+
+def clusters(matches):
+    """Groups of artworks connected by `matches`, largest first (union-find)."""
+    parent = {}
+
+    def root(pk):
+        parent.setdefault(pk, pk)
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    for match in matches:
+        parent[root(match.artwork_id)] = root(match.other_id)
+    groups = defaultdict(list)
+    for pk in parent:
+        groups[root(pk)].append(pk)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: (-len(group), group[0]))
+
+
+def describe(match):
+    return (
+        f"Provenance chains align (score {match.score:.2f}, {match.shared_actors} shared actors, "
+        f"{len(match.pairs)} matching events)"
+    )
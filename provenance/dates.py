@@ -0,0 +1,164 @@
+"""
+Parsing of the free-text dates stored on the models ("12.03.1938",
+"1938", "ca. 1920", "1938-1945", ...).
+
+Full dates are stored as DD.MM.YYYY. `normalize_date()` rewrites the other
+spellings of a full date that imports left behind (ISO dates, Excel
+timestamps, unpadded days) and leaves everything else untouched;
+`normalize_stored_dates()` applies it to every date column.
+"""
+import calendar
+import datetime
+import re
+from functools import lru_cache
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Case, Count, Value, When
+
+from .versions import bump_data_version
+
+YEAR_RE = re.compile(r'(?<!\d)(1[0-9]{3}|20[0-9]{2})(?!\d)')
+
+# "1938-03-12", "1938-03-12 00:00:00", "1938-03-12T00:00:00"
+ISO_DATE_RE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$')
+# "12.3.1938", "12. 03. 1938"
+DOTTED_DATE_RE = re.compile(r'^(\d{1,2})\.\s*(\d{1,2})\.\s*(\d{4})$')
+# "03.1938"
+MONTH_RE = re.compile(r'^(\d{1,2})\.\s*(\d{4})$')
+
+# (model, field) pairs holding free-text dates.
+DATE_FIELDS = [
+    ('Person', 'birth_date'),
+    ('Person', 'death_date'),
+    ('Institution', 'start_date'),
+    ('Institution', 'end_date'),
+    ('ProvenanceEvent', 'date'),
+    ('Auction', 'date'),
+    ('Exhibition', 'date_start'),
+    ('Exhibition', 'date_end'),
+]
+
+NORMALIZE_BATCH_SIZE = 500
+
+
+def parse_year(value):
+    """
+    Returns the first four-digit year (1000-2099) in `value`, or None.
+    For ranges such as "1938-1945" this is the start year.
+    """
+    if not value:
+        return None
+    match = YEAR_RE.search(str(value))
+    return int(match.group(1)) if match else None
+
+
+# Columns derived from a date field that must change along with it.
+DERIVED_FIELDS = {
+    ('ProvenanceEvent', 'date'): ('year', parse_year),
+}
+
+
+@lru_cache(maxsize=65536)
+def normalize_date(value):
+    """
+    Returns `value` as DD.MM.YYYY if it is a full calendar date in another
+    spelling, otherwise `value` with surrounding whitespace removed.
+    Impossible dates ("1938-02-30") are left as they are.
+    """
+    if not value:
+        return value
+    text = value.strip()
+    match = ISO_DATE_RE.match(text)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = DOTTED_DATE_RE.match(text)
+        if not match:
+            return text
+        day, month, year = match.groups()
+    year, month, day = int(year), int(month), int(day)
+    if not (1 <= month <= 12 and 1 <= day <= calendar.monthrange(year, month)[1]):
+        return text
+    return f'{day:02d}.{month:02d}.{year:04d}'
+
+
+@lru_cache(maxsize=65536)
+def date_bounds(value):
+    """
+    The period a date text stands for, as (first day, day after the last
+    day): a single day for full dates, a month for "03.1938" and the years
+    from the first to the last one mentioned otherwise ("1938" or
+    "ca. 1938-1945"). None if `value` names no year.
+    """
+    text = normalize_date(value)
+    if not text:
+        return None
+    match = DOTTED_DATE_RE.match(text)
+    if match:
+        try:
+            first = datetime.date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+            return first, first + datetime.timedelta(days=1)
+        except ValueError:
+            pass  # an impossible day; fall back to its year
+    match = MONTH_RE.match(text)
+    if match and 1 <= int(match.group(1)) <= 12:
+        month, year = int(match.group(1)), int(match.group(2))
+        first = datetime.date(year, month, 1)
+        return first, datetime.date(year + month // 12, month % 12 + 1, 1)
+    years = [int(year) for year in YEAR_RE.findall(text)]
+    if not years:
+        return None
+    return datetime.date(min(years), 1, 1), datetime.date(max(years) + 1, 1, 1)
+
+
+def date_changes(model, field):
+    """
+    The distinct values of `model.field` that `normalize_date()` changes, as
+    (old, new, row count) triples.
+    """
+    rows = (
+        model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        .values_list(field).annotate(rows=Count('pk')).order_by()
+    )
+    changes = []
+    for value, count in rows.iterator(chunk_size=2000):
+        normalized = normalize_date(value)
+        if normalized != value:
+            changes.append((value, normalized, count))
+    return changes
+
+
+def normalize_stored_dates(fields=None, dry_run=False, batch_size=NORMALIZE_BATCH_SIZE, get_model=apps.get_model):
+    """
+    Normalizes every date column in `fields` (default: DATE_FIELDS). Each
+    distinct value is parsed once and rewritten with one set-wise UPDATE per
+    batch of values, so the cost depends on the number of distinct
+    spellings, not on the number of rows. Batches commit separately and
+    normalized values are not touched again, so an interrupted run is
+    resumed by running it again.
+
+    Returns {'Model.field': [(old, new, rows), ...]}; with `dry_run` nothing
+    is written.
+    """
+    report = {}
+    for model_name, field in fields or DATE_FIELDS:
+        model = get_model('provenance', model_name)
+        changes = date_changes(model, field)
+        report[f'{model_name}.{field}'] = changes
+        if dry_run:
+            continue
+        derived = DERIVED_FIELDS.get((model_name, field))
+        for start in range(0, len(changes), batch_size):
+            batch = changes[start:start + batch_size]
+            update = {field: Case(*(When(**{field: old}, then=Value(new)) for old, new, _ in batch))}
+            if derived:
+                name, derive = derived
+                update[name] = Case(
+                    *(When(**{field: old}, then=Value(derive(new))) for old, new, _ in batch),
+                    output_field=model._meta.get_field(name),
+                )
+            with transaction.atomic():
+                model.objects.filter(**{f'{field}__in': [old for old, _, _ in batch]}).update(**update)
+                bump_data_version(model)
+    return report
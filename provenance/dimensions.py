@@ -0,0 +1,131 @@
+"""
+Parsing of the free-text `Artwork.dimension`.
+
+Values look like "65 x 81 cm", "65,5 × 81 × 3 cm", "H. 12,5 cm",
+"h 30, b 20 cm", "Ø 30 cm" or "24 x 30 in". Numbers joined by x/×/* are
+height, width and depth in that order. Labelled numbers go to their field:
+H/Höhe/height, B/Breite/W/width, T/Tiefe/D/depth, and Ø/diameter for both
+height and width. A single unlabelled number is a height. The unit is the
+first of mm, cm, m or in/inches/"; cm when none is given. Only the first
+measurement is read, so "65 x 81 cm (25 x 32 in)" is 65 x 81 cm and
+"65 x 81 cm; 25 x 32 in" is too; labels may still be separated by
+semicolons ("Höhe: 40 cm; Breite 30 cm").
+
+The parsed sizes are stored on Artwork (`height`, `width`, `depth`,
+`dimension_unit`) when it is saved; `backfill_dimensions()` (the
+`backfill_dimensions` command) updates rows written without `save()`.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Sizes in centimetres; `unit` is the unit the text was written in.
+Dimensions = namedtuple('Dimensions', 'height width depth unit')
+
+UNIT_CM = {'mm': 0.1, 'cm': 1.0, 'm': 100.0, 'in': 2.54}
+
+# Artwork fields maintained from `dimension`.
+DIMENSION_FIELDS = ('height', 'width', 'depth', 'dimension_unit')
+
+BACKFILL_BATCH_SIZE = 1000
+
+_NUMBER = r'\d+(?:[.,]\d+)?'
+_UNIT = r'(?:mm|cm|m|in(?:ch(?:es)?)?|"|zoll)(?![a-zäöü])'
+_LABELS = {
+    'height': ('höhe', 'hoehe', 'height', 'hoch', 'ht', 'h'),
+    'width': ('breite', 'width', 'br', 'b', 'w'),
+    'depth': ('tiefe', 'depth', 't', 'd'),
+    'diameter': ('durchmesser', 'durchm', 'diameter', 'diam', 'dm', 'ø', '⌀'),
+}
+_LABEL_FIELD = {label: field for field, labels in _LABELS.items() for label in labels}
+_LABELLED_RE = re.compile(
+    rf'(?<![a-zäöü])({"|".join(sorted(map(re.escape, _LABEL_FIELD), key=len, reverse=True))})'
+    rf'\.?\s*[:=]?\s*({_NUMBER})'
+)
+_PRODUCT_RE = re.compile(rf'({_NUMBER})(?:\s*{_UNIT})?(?:\s*[x×*]\s*({_NUMBER})(?:\s*{_UNIT})?)?'
+                         rf'(?:\s*[x×*]\s*({_NUMBER}))?')
+_UNIT_RE = re.compile(rf'\d\s*({_UNIT})')
+# Only the first measurement counts: cut at brackets and slashes, and at
+# semicolons unless the measurement is labelled.
+_SEGMENT_RE = re.compile(r'[(\[/]')
+
+
+def _number(text):
+    return float(text.replace(',', '.')) if text else None
+
+
+def _unit(text):
+    match = _UNIT_RE.search(text)
+    if not match:
+        return 'cm'
+    unit = match.group(1)
+    return 'in' if unit.startswith('in') or unit in ('"', 'zoll') else unit
+
+
+@lru_cache(maxsize=10000)
+def parse_dimension(text):
+    """Dimensions of a dimension text, or None when it has no size in it."""
+    segment = _SEGMENT_RE.split(str(text or '').casefold().strip())[0]
+    if not re.search(r'\d', segment):
+        return None
+    unit = _unit(segment)
+    values = {}
+    for label, number in _LABELLED_RE.findall(segment):
+        field = _LABEL_FIELD[label]
+        for name in (('height', 'width') if field == 'diameter' else (field,)):
+            values.setdefault(name, _number(number))
+    if not values:
+        segment = segment.split(';')[0]
+        if not re.search(r'\d', segment):
+            return None
+        unit = _unit(segment)
+        match = _PRODUCT_RE.search(segment)
+        values = dict(zip(('height', 'width', 'depth'), map(_number, match.groups())))
+    factor = UNIT_CM[unit]
+    sizes = {
+        name: round(value * factor, 2) if value else None
+        for name, value in values.items()
+    }
+    if not any(sizes.values()):
+        return None
+    return Dimensions(sizes.get('height'), sizes.get('width'), sizes.get('depth'), unit)
+
+
+def dimension_fields(text):
+    """{Artwork field: value} of a dimension text, all empty when it has no size."""
+    dimensions = parse_dimension(text)
+    if dimensions is None:
+        return {'height': None, 'width': None, 'depth': None, 'dimension_unit': ''}
+    return {'height': dimensions.height, 'width': dimensions.width, 'depth': dimensions.depth,
+            'dimension_unit': dimensions.unit}
+
+
+def backfill_dimensions(batch_size=BACKFILL_BATCH_SIZE, dry_run=False):
+    """
+    Stores the parsed dimensions of every artwork whose stored fields are
+    out of date, walking the table in primary key order `batch_size` rows
+    at a time with one bulk UPDATE per batch. Returns (checked, changed).
+    """
+    from .models import Artwork
+
+    checked = changed = 0
+    last = 0
+    while True:
+        rows = list(Artwork.objects.filter(pk__gt=last).order_by('pk').values_list(
+            'pk', 'dimension', *DIMENSION_FIELDS,
+        )[:batch_size])
+        if not rows:
+            break
+        stale = []
+        for pk, dimension, *stored in rows:
+            fields = dimension_fields(dimension)
+            if list(fields.values()) != stored:
+                stale.append(Artwork(pk=pk, **fields))
+        if stale and not dry_run:
+            Artwork.objects.bulk_update(stale, DIMENSION_FIELDS)
+        checked += len(rows)
+        changed += len(stale)
+        last = rows[-1][0]
+        if len(rows) < batch_size:
+            break
+    return checked, changed
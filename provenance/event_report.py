@@ -0,0 +1,187 @@
+"""
+Filters, sort keys and facet counts of the event report (`/api/events/report/`).
+
+Every filter takes a comma separated list of ids (or certainty values), e.g.
+`?event_type=1,3&certainty=proven&year_from=1933&year_to=1945`. Facets are
+computed with one grouped query per dimension over the report filtered by
+all *other* dimensions, so the options of an active filter keep their
+counts and can be combined.
+"""
+from django.db.models import Count, ExpressionWrapper, F, IntegerField
+
+from .models import Artwork, ProvenanceEvent, ProvenanceEventSource
+from .search import search_events
+from .serializers import person_name
+
+# Query parameter -> lookup on ProvenanceEvent (used with `__in`).
+ID_FILTERS = {
+    'event_type': 'event_type_id',
+    'person': 'person_id',
+    'institution': 'institution_id',
+    'auction': 'auction_id',
+    'exhibition': 'exhibition_id',
+}
+
+# Sort key -> order_by. A leading '-' on the key reverses its first column.
+SORT_KEYS = {
+    'artwork': ('artwork__name', 'sequence_number'),
+    'artwork_id': ('artwork_id', 'sequence_number'),
+    'date': ('year', 'artwork__name', 'sequence_number'),
+    'event_type': ('event_type__name', 'artwork__name', 'sequence_number'),
+    'person': ('person__family_name', 'person__first_name', 'artwork__name', 'sequence_number'),
+    'institution': ('institution__name', 'artwork__name', 'sequence_number'),
+    'certainty': ('certainty', 'artwork__name', 'sequence_number'),
+}
+DEFAULT_SORT = 'artwork'
+
+# Facet lists are cut to the most frequent values.
+FACET_LIMIT = 50
+
+
+class FilterParamError(ValueError):
+    pass
+
+
+def parse_id_list(params, name):
+    values = [v for v in params.get(name, '').split(',') if v.strip()]
+    try:
+        return [int(v) for v in values]
+    except ValueError:
+        raise FilterParamError(f"{name} must be a comma separated list of ids")
+
+
+def _year(params, name):
+    value = params.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise FilterParamError(f"{name} must be a year")
+
+
+def parse_filters(params):
+    """
+    Reads the report filters from a QueryDict/dict into
+    `{dimension: value}`, leaving out filters that are not set.
+    """
+    filters = {}
+    for name in (*ID_FILTERS, 'source', 'group'):
+        ids = parse_id_list(params, name)
+        if ids:
+            filters[name] = ids
+    certainty = [v.strip() for v in params.get('certainty', '').split(',') if v.strip()]
+    unknown = set(certainty) - set(dict(ProvenanceEvent.CERTAINTY_CHOICES))
+    if unknown:
+        raise FilterParamError(f"Unknown certainty: {', '.join(sorted(unknown))}")
+    if certainty:
+        filters['certainty'] = certainty
+    year_from, year_to = _year(params, 'year_from'), _year(params, 'year_to')
+    if year_from is not None or year_to is not None:
+        filters['year'] = (year_from, year_to)
+    if params.get('q', '').strip():
+        filters['q'] = params['q']
+    return filters
+
+
+def apply_filters(queryset, filters, exclude=None):
+    """
+    Applies parsed `filters` to a ProvenanceEvent queryset, skipping the
+    dimension `exclude` (used for facet counts). Relations that could repeat
+    an event (sources, artwork groups) are filtered through id subqueries.
+    """
+    for name, value in filters.items():
+        if name == exclude:
+            continue
+        if name in ID_FILTERS:
+            queryset = queryset.filter(**{f'{ID_FILTERS[name]}__in': value})
+        elif name == 'certainty':
+            queryset = queryset.filter(certainty__in=value)
+        elif name == 'source':
+            queryset = queryset.filter(
+                id__in=ProvenanceEventSource.objects.filter(source_id__in=value).values('event_id')
+            )
+        elif name == 'group':
+            queryset = queryset.filter(
+                artwork_id__in=Artwork.groups.through.objects.filter(artworkgroup_id__in=value).values('artwork_id')
+            )
+        elif name == 'year':
+            year_from, year_to = value
+            if year_from is not None:
+                queryset = queryset.filter(year__gte=year_from)
+            if year_to is not None:
+                queryset = queryset.filter(year__lte=year_to)
+        elif name == 'q':
+            queryset = search_events(queryset, value)
+    return queryset
+
+
+def ordering(sort):
+    """order_by() arguments for a sort key such as 'date' or '-person'."""
+    key = (sort or DEFAULT_SORT).strip()
+    descending = key.startswith('-')
+    columns = SORT_KEYS.get(key.lstrip('-'))
+    if columns is None:
+        raise FilterParamError(f"Unknown sort key: {key}")
+    if descending:
+        columns = (f'-{columns[0]}', *columns[1:])
+    return (*columns, 'id')
+
+
+def grouped_counts(queryset, id_column, label_columns, label, count=None):
+    """
+    The FACET_LIMIT most frequent values of `id_column` with their labels and
+    counts (rows by default, or the `count` aggregate), in one grouped query.
+    `label` is called with the `label_columns` values, or with the id when
+    there are none.
+    """
+    rows = (
+        queryset.exclude(**{f'{id_column}__isnull': True})
+        .values(id_column, *label_columns)
+        .annotate(count=count or Count('id'))
+        .order_by('-count', id_column)[:FACET_LIMIT]
+    )
+    return [
+        {'id': row[id_column], 'name': label(*(row[c] for c in label_columns or [id_column])), 'count': row['count']}
+        for row in rows
+    ]
+
+
+def facet_counts(queryset, filters):
+    """
+    Event counts per value of every filter dimension, computed with one
+    grouped query each.
+    """
+    def base(dimension):
+        return apply_filters(queryset, filters, exclude=dimension).order_by()
+
+    facets = {
+        'event_type': grouped_counts(base('event_type'), 'event_type_id', ['event_type__name'], str),
+        'person': grouped_counts(base('person'), 'person_id', ['person__family_name', 'person__first_name'], person_name),
+        'institution': grouped_counts(base('institution'), 'institution_id', ['institution__name'], str),
+        'auction': grouped_counts(base('auction'), 'auction_id', ['auction__name'], str),
+        'exhibition': grouped_counts(base('exhibition'), 'exhibition_id', ['exhibition__name'], str),
+        'group': grouped_counts(base('group'), 'artwork__groups', ['artwork__groups__name'], str),
+    }
+
+    certainty_labels = dict(ProvenanceEvent.CERTAINTY_CHOICES)
+    facets['certainty'] = [
+        {'id': row['certainty'], 'name': certainty_labels.get(row['certainty'], row['certainty']), 'count': row['count']}
+        for row in base('certainty').exclude(certainty__isnull=True).exclude(certainty='')
+        .values('certainty').annotate(count=Count('id')).order_by('-count', 'certainty')
+    ]
+
+    facets['source'] = [
+        {'id': row['source_id'], 'name': (row['source__source'] or '')[:200], 'count': row['count']}
+        for row in ProvenanceEventSource.objects.filter(event__in=base('source').values('id'))
+        .values('source_id', 'source__source').annotate(count=Count('event_id', distinct=True))
+        .order_by('-count', 'source_id')[:FACET_LIMIT]
+    ]
+
+    decade = ExpressionWrapper(F('year') / 10 * 10, output_field=IntegerField())
+    facets['decade'] = [
+        {'id': row['decade'], 'name': f"{row['decade']}s", 'count': row['count']}
+        for row in base('year').exclude(year__isnull=True).annotate(decade=decade)
+        .values('decade').annotate(count=Count('id')).order_by('decade')
+    ]
+    return facets
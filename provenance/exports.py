@@ -0,0 +1,66 @@
+"""
+File exports that are produced by background jobs.
+"""
+import openpyxl
+
+from .models import ProvenanceEvent
+
+EVENT_REPORT_HEADERS = [
+    'Art ID', 'Artwork Name', 'Sequence #', 'Type ID', 'Event Type',
+    'Date', 'Person', 'Institution', 'Auction', 'Exhibition', 'Certainty', 'Sources'
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object for csv.writer that returns each line instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def write_event_report_workbook(path, progress=None):
+    """
+    Writes the event report as .xlsx to `path`.
+    Uses a write-only workbook and a chunked queryset so memory stays flat
+    regardless of the number of events. `progress(done, total)` is called
+    once per chunk.
+    """
+    events = ProvenanceEvent.objects.select_related(
+        'artwork', 'event_type', 'person', 'institution', 'auction', 'exhibition'
+    ).prefetch_related(
+        'provenanceeventsource_set__source'
+    ).order_by('artwork__name', 'sequence_number')
+    total = events.count()
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Event Report")
+    ws.append(EVENT_REPORT_HEADERS)
+
+    for done, event in enumerate(events.iterator(chunk_size=EXPORT_CHUNK_SIZE), start=1):
+        sources = list(event.provenanceeventsource_set.all())
+        base_row = [
+            event.artwork.id,
+            event.artwork.name,
+            event.sequence_number,
+            event.event_type.id if event.event_type else None,
+            event.event_type.name if event.event_type else '',
+            event.date,
+            str(event.person) if event.person else '',
+            str(event.institution) if event.institution else '',
+            str(event.auction) if event.auction else '',
+            str(event.exhibition) if event.exhibition else '',
+            event.get_certainty_display() if event.certainty else '',
+        ]
+
+        if not sources:
+            ws.append(base_row + [''])
+        else:
+            for s in sources:
+                ws.append(base_row + [str(s.source)])
+
+        if progress and done % EXPORT_CHUNK_SIZE == 0:
+            progress(done, total)
+
+    wb.save(path)
+    return total
@@ -0,0 +1,263 @@
+"""
+Provenance gap analysis over the holding intervals (see provenance.holdings).
+
+Within a window (by default 1933-1945) every artwork's timeline is cut into
+segments at the interval boundaries and each segment is classified:
+
+- `gap`: no known holder, i.e. before the first dated event of the artwork
+  or covered only by events without a person, institution, auction or
+  exhibition;
+- `overlap`: more than one holder claimed at the same time;
+- `low_certainty`: the best claim is `possible`, `unproven` or has no
+  certainty.
+
+Artworks whose first dated event lies after the window are not analyzed.
+The score of an artwork is the certainty-weighted share of the window that is
+not proven: a gap counts fully, an `unproven` span by 0.75 and a `proven`
+one not at all.
+
+The whole corpus is analyzed at once with NumPy: intervals become +1/-1
+events sorted by (artwork, day), and running sums give the number of
+holders of each certainty level on every segment, so the cost is a few
+array passes instead of a Python loop per artwork.
+"""
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .dates import date_bounds
+from .event_report import FilterParamError
+
+DEFAULT_WINDOW = ('1933', '1945')
+
+# Certainty level of a holding: 0 is an unknown holder. WEIGHTS[level] is how
+# much the level counts as proven.
+LEVEL_UNKNOWN, LEVEL_UNPROVEN, LEVEL_POSSIBLE, LEVEL_LIKELY, LEVEL_PROVEN = range(5)
+WEIGHTS = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+CERTAINTY_LEVELS = {'proven': LEVEL_PROVEN, 'likely': LEVEL_LIKELY, 'unproven': LEVEL_UNPROVEN}
+# Segments whose best claim is below this level are low certainty.
+LOW_CERTAINTY_BELOW = LEVEL_LIKELY
+
+KINDS = ('gap', 'overlap', 'low_certainty')
+KIND_OK = -1
+
+Span = namedtuple('Span', 'artwork_id kind start end')
+
+
+def _level():
+    no_holder = Q(person__isnull=True, institution__isnull=True, auction__isnull=True, exhibition__isnull=True)
+    return Case(
+        When(no_holder, then=Value(LEVEL_UNKNOWN)),
+        *(When(certainty=certainty, then=Value(level)) for certainty, level in CERTAINTY_LEVELS.items()),
+        default=Value(LEVEL_POSSIBLE),
+        output_field=IntegerField(),
+    )
+
+
+def parse_window(params):
+    """(first day, day after the last day) of `from`/`to`, 1933-1945 by default."""
+    from .holdings import date_param
+
+    first = date_param(params, 'from') or date_bounds(DEFAULT_WINDOW[0])
+    last = date_param(params, 'to') or date_bounds(DEFAULT_WINDOW[1])
+    if first[0] >= last[1]:
+        raise FilterParamError("from must not be after to")
+    return first[0], last[1]
+
+
+# Day number of an open end.
+OPEN_END = np.iinfo(np.int64).min
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _days(values):
+    """Date objects as day numbers since 1970; None (open end) becomes OPEN_END."""
+    return np.array(values, dtype='datetime64[D]').astype(np.int64)
+
+
+def _date(day):
+    return date.fromordinal(int(day) + _EPOCH_ORDINAL)
+
+
+class GapReport:
+    """
+    Result of `analyze_gaps()`. Per analyzed artwork (aligned arrays):
+    `artwork_ids`, `score`, `gap_days`, `overlap_days`, `low_certainty_days`.
+    Flagged spans: `span_artwork`, `span_kind` (index into KINDS),
+    `span_start`, `span_end` (day numbers, end exclusive).
+    """
+
+    def __init__(self, window, artwork, start, end, level):
+        self.window = window
+        first, after = (_days([day])[0] for day in window)
+        artwork_ids, index = np.unique(artwork, return_inverse=True)
+        self.artwork_ids = artwork_ids
+        n = len(artwork_ids)
+        if not n:
+            self.score = np.zeros(0)
+            self.gap_days = self.overlap_days = self.low_certainty_days = np.zeros(0, dtype=np.int64)
+            self.span_artwork = self.span_kind = self.span_start = self.span_end = np.zeros(0, dtype=np.int64)
+            return
+
+        start = np.clip(start, first, after)
+        end = np.clip(np.where(end == OPEN_END, after, end), first, after)
+        # Every interval adds its level at its start and removes it at its end;
+        # window borders are added as empty events so each artwork's timeline
+        # starts and ends there.
+        group = np.arange(n)
+        pos = np.concatenate([start, end, np.full(n, first), np.full(n, after)])
+        owner = np.concatenate([index, index, group, group])
+        delta = np.concatenate([np.ones_like(start), -np.ones_like(end), np.zeros(2 * n, dtype=np.int64)])
+        levels = np.concatenate([level, level, np.full(2 * n, -1)])
+        order = np.lexsort((pos, owner))
+        pos, owner, delta, levels = pos[order], owner[order], delta[order], levels[order]
+
+        # Holders of at least each level, after all events up to this one. The
+        # +1/-1 of each artwork cancel out, so the sums need no per-artwork reset.
+        at_least = [np.cumsum(delta * (levels >= k)) for k in range(LEVEL_UNPROVEN, LEVEL_PROVEN + 1)]
+        best = np.sum([count > 0 for count in at_least], axis=0)
+        holders = at_least[0]
+
+        # One segment per distinct (artwork, day), up to the next day of the artwork.
+        last = np.r_[(owner[1:] != owner[:-1]) | (pos[1:] != pos[:-1]), True]
+        pos, owner, best, holders = pos[last], owner[last], best[last], holders[last]
+        has_next = np.r_[owner[1:] == owner[:-1], False]
+        seg_end = np.r_[pos[1:], after]
+        length = np.where(has_next, seg_end - pos, 0)
+
+        kind = np.full(len(pos), KIND_OK)
+        kind[best < LOW_CERTAINTY_BELOW] = KINDS.index('low_certainty')
+        kind[holders > 1] = KINDS.index('overlap')
+        kind[best == LEVEL_UNKNOWN] = KINDS.index('gap')
+        kind[length == 0] = KIND_OK
+
+        window_days = max(after - first, 1)
+        self.score = np.bincount(owner, weights=length * (1 - WEIGHTS[best]), minlength=n) / window_days
+        for name in KINDS:
+            mask = kind == KINDS.index(name)
+            days = np.bincount(owner[mask], weights=length[mask], minlength=n)
+            setattr(self, f'{name}_days', days.astype(np.int64))
+
+        # Adjacent flagged segments of the same kind form one span.
+        flagged = np.flatnonzero(kind != KIND_OK)
+        f_owner, f_kind, f_start, f_end = owner[flagged], kind[flagged], pos[flagged], seg_end[flagged]
+        new_span = np.r_[
+            True, (f_owner[1:] != f_owner[:-1]) | (f_kind[1:] != f_kind[:-1]) | (f_start[1:] != f_end[:-1])
+        ]
+        starts = np.flatnonzero(new_span)
+        ends = np.r_[starts[1:], len(flagged)] - 1
+        self.span_artwork = artwork_ids[f_owner[starts]]
+        self.span_kind = f_kind[starts]
+        self.span_start = f_start[starts]
+        self.span_end = f_end[ends]
+
+    def select(self, kinds=None, min_score=0.0):
+        """
+        Positions of the artworks with any span of `kinds` (default: any
+        kind) and at least `min_score`, worst first.
+        """
+        mask = self.score >= min_score
+        wanted = [KINDS.index(name) for name in (kinds or KINDS)]
+        flagged = np.isin(self.artwork_ids, self.span_artwork[np.isin(self.span_kind, wanted)])
+        positions = np.flatnonzero(mask & flagged)
+        return positions[np.lexsort((self.artwork_ids[positions], -self.score[positions]))]
+
+    def spans(self, artwork_ids):
+        """{artwork id: [Span, ...]} for `artwork_ids`, in date order."""
+        spans = {}
+        for index in np.flatnonzero(np.isin(self.span_artwork, artwork_ids)):
+            artwork_id = int(self.span_artwork[index])
+            spans.setdefault(artwork_id, []).append(Span(
+                artwork_id, KINDS[self.span_kind[index]], _date(self.span_start[index]), _date(self.span_end[index]),
+            ))
+        return spans
+
+
+def analyze_gaps(window, artworks=None):
+    """
+    Analyzes the holding intervals overlapping `window` (first day, day after
+    the last day). `artworks` optionally restricts the artworks, e.g. to a
+    `values('pk')` queryset. One query.
+    """
+    from .models import HoldingInterval
+
+    first, after = window
+    intervals = HoldingInterval.objects.filter(Q(end__isnull=True) | Q(end__gt=first), start__lt=after)
+    if artworks is not None:
+        intervals = intervals.filter(artwork_id__in=artworks)
+    rows = list(intervals.order_by().annotate(level=_level()).values_list('artwork_id', 'start', 'end', 'level'))
+    artwork, start, end, level = zip(*rows) if rows else ((), (), (), ())
+    return GapReport(
+        window, np.array(artwork, dtype=np.int64), _days(start), _days(end), np.array(level, dtype=np.int64),
+    )
+
+
+def parse_kinds(params):
+    kinds = [v.strip() for v in params.get('kind', '').split(',') if v.strip()]
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise FilterParamError(f"Unknown kind: {', '.join(sorted(unknown))}")
+    return kinds
+
+
+def parse_min_score(params):
+    try:
+        return float(params.get('min_score') or 0)
+    except ValueError:
+        raise FilterParamError("min_score must be a number")
+
+
+def _names(artwork_ids):
+    from .models import Artwork
+    return dict(Artwork.objects.filter(pk__in=[int(pk) for pk in artwork_ids]).values_list('pk', 'name'))
+
+
+def _summary(report, position, names):
+    artwork_id = int(report.artwork_ids[position])
+    return {
+        'artwork_id': artwork_id,
+        'artwork_name': names.get(artwork_id, ''),
+        'score': round(float(report.score[position]), 4),
+        'gap_days': int(report.gap_days[position]),
+        'overlap_days': int(report.overlap_days[position]),
+        'low_certainty_days': int(report.low_certainty_days[position]),
+    }
+
+
+def report_rows(report, positions):
+    """Report rows of the artworks at `positions` with their spans; one query for the names."""
+    artwork_ids = report.artwork_ids[positions]
+    names, spans = _names(artwork_ids), report.spans(artwork_ids)
+    rows = []
+    for position in positions:
+        row = _summary(report, position, names)
+        row['spans'] = [
+            {'kind': span.kind, 'start': span.start.isoformat(), 'end': span.end.isoformat()}
+            for span in spans.get(row['artwork_id'], [])
+        ]
+        rows.append(row)
+    return rows
+
+
+EXPORT_COLUMNS = ('artwork_id', 'artwork_name', 'score', 'kind', 'start', 'end', 'days')
+EXPORT_CHUNK_SIZE = 1000
+
+
+def export_rows(report, positions):
+    """
+    Yields EXPORT_COLUMNS tuples, one per span, for the artworks at
+    `positions`. Names are read per chunk of artworks.
+    """
+    for chunk in range(0, len(positions), EXPORT_CHUNK_SIZE):
+        batch = positions[chunk:chunk + EXPORT_CHUNK_SIZE]
+        artwork_ids = report.artwork_ids[batch]
+        names, spans = _names(artwork_ids), report.spans(artwork_ids)
+        for position in batch:
+            row = _summary(report, position, names)
+            for span in spans.get(row['artwork_id'], []):
+                yield (
+                    row['artwork_id'], row['artwork_name'], row['score'], span.kind,
+                    span.start.isoformat(), span.end.isoformat(), (span.end - span.start).days,
+                )
@@ -0,0 +1,222 @@
+"""
+Streamed exports of the provenance network for Gephi, networkx & co.
+
+Nodes are the persons, institutions, auctions, exhibitions and artworks,
+with ids such as `person:12`. Edges are
+
+- `event`: artwork -> each actor of one of its provenance events;
+- `transfer`: actor of an event -> actor of the next event of the same
+  artwork (the actor as in provenance.network);
+- `auction_person`: person -> auction, with the person's role;
+- `relationship`: artwork -> related artwork (`copy_of`, ...).
+
+Formats are GraphML, GEXF 1.3 and a CSV edge list. Everything is written
+while chunked querysets are read: the exporter keeps only the previous
+event's actor and never holds the graph in memory.
+
+The event report filters (provenance.event_report, e.g. `group` and
+`year_from`/`year_to`) restrict the events; the artworks and actors are
+then the ones those events reference, plus the persons of their auctions.
+"""
+import csv
+from xml.sax.saxutils import escape, quoteattr
+
+from django.db.models import Q
+
+from .event_report import FilterParamError, apply_filters
+from .exports import Echo
+from .network import EVENT_ACTOR_COLUMNS, event_actor
+from .serializers import person_name
+
+FORMATS = {
+    'graphml': ('application/graphml+xml', 'graphml'),
+    'gexf': ('application/xml', 'gexf'),
+    'csv': ('text/csv', 'csv'),
+}
+
+NODE_TYPES = ('person', 'institution', 'auction', 'exhibition', 'artwork')
+NODE_ATTRIBUTES = ('type',)
+EDGE_ATTRIBUTES = ('kind', 'artwork', 'event', 'event_type', 'date', 'certainty', 'role', 'relation')
+CSV_COLUMNS = ('source', 'target', *EDGE_ATTRIBUTES)
+
+# Actor columns of an event -> node type.
+EVENT_ACTORS = {
+    'person_id': 'person', 'institution_id': 'institution', 'auction_id': 'auction', 'exhibition_id': 'exhibition',
+}
+
+CHUNK_SIZE = 2000
+# Lines per chunk of the HTTP response.
+LINES_PER_WRITE = 500
+
+
+def parse_format(params):
+    value = params.get('format') or 'graphml'
+    if value not in FORMATS:
+        raise FilterParamError(f"format must be one of: {', '.join(FORMATS)}")
+    return value
+
+
+def _node_id(node_type, pk):
+    return f'{node_type}:{pk}'
+
+
+def _querysets(filters):
+    """Events, node querysets by type, auction persons and relationships for `filters`."""
+    from .models import (
+        Artwork, ArtworkRelationship, Auction, AuctionPerson, Exhibition, Institution, Person, ProvenanceEvent,
+    )
+
+    events = apply_filters(ProvenanceEvent.objects.all(), filters)
+    nodes = {
+        'person': Person.objects.all(), 'institution': Institution.objects.all(), 'auction': Auction.objects.all(),
+        'exhibition': Exhibition.objects.all(), 'artwork': Artwork.objects.all(),
+    }
+    auction_persons = AuctionPerson.objects.all()
+    relationships = ArtworkRelationship.objects.all()
+    if filters:
+        artworks = events.values('artwork_id')
+        auctions = events.exclude(auction_id=None).values('auction_id')
+        nodes['artwork'] = nodes['artwork'].filter(pk__in=artworks)
+        nodes['auction'] = nodes['auction'].filter(pk__in=auctions)
+        nodes['exhibition'] = nodes['exhibition'].filter(pk__in=events.values('exhibition_id'))
+        # Houses of the auctions and exhibitions count as the event's actor.
+        nodes['institution'] = nodes['institution'].filter(
+            Q(pk__in=events.values('institution_id')) | Q(pk__in=events.values('auction__institution_id'))
+            | Q(pk__in=events.values('exhibition__institution_id'))
+        )
+        auction_persons = auction_persons.filter(auction_id__in=auctions)
+        nodes['person'] = nodes['person'].filter(
+            Q(pk__in=events.values('person_id')) | Q(pk__in=auction_persons.values('person_id'))
+        )
+        relationships = relationships.filter(source_artwork_id__in=artworks, target_artwork_id__in=artworks)
+    return events, nodes, auction_persons, relationships
+
+
+def nodes(filters):
+    """Yields (node id, node type, label)."""
+    _, querysets, _, _ = _querysets(filters)
+    for node_type in NODE_TYPES:
+        queryset = querysets[node_type].order_by('pk')
+        if node_type == 'person':
+            rows = (
+                (pk, person_name(family_name, first_name))
+                for pk, family_name, first_name in queryset.values_list('pk', 'family_name', 'first_name')
+                .iterator(chunk_size=CHUNK_SIZE)
+            )
+        else:
+            rows = queryset.values_list('pk', 'name').iterator(chunk_size=CHUNK_SIZE)
+        for pk, label in rows:
+            yield _node_id(node_type, pk), node_type, label
+
+
+def edges(filters):
+    """Yields (source id, target id, {attribute: value}) for every edge."""
+    events, _, auction_persons, relationships = _querysets(filters)
+    rows = events.order_by('artwork_id', 'sequence_number', 'pk').values_list(
+        'pk', 'artwork_id', 'event_type__name', 'date', 'certainty', *EVENT_ACTORS, *EVENT_ACTOR_COLUMNS,
+    )
+    previous_artwork, previous_actor = None, None
+    for pk, artwork_id, event_type, date, certainty, *columns in rows.iterator(chunk_size=CHUNK_SIZE):
+        details = {'artwork': artwork_id, 'event': pk, 'event_type': event_type or '', 'date': date or '',
+                   'certainty': certainty or ''}
+        artwork = _node_id('artwork', artwork_id)
+        for node_type, actor_id in zip(EVENT_ACTORS.values(), columns[:len(EVENT_ACTORS)]):
+            if actor_id:
+                yield artwork, _node_id(node_type, actor_id), {'kind': 'event', **details}
+
+        if artwork_id != previous_artwork:
+            previous_artwork, previous_actor = artwork_id, None
+        actor = event_actor(*columns[len(EVENT_ACTORS):]) if certainty != 'false' else None
+        if actor:
+            actor = _node_id(*actor)
+            if previous_actor and previous_actor != actor:
+                yield previous_actor, actor, {'kind': 'transfer', **details}
+            previous_actor = actor
+
+    for person_id, auction_id, role in auction_persons.order_by('pk').values_list(
+        'person_id', 'auction_id', 'role',
+    ).iterator(chunk_size=CHUNK_SIZE):
+        yield _node_id('person', person_id), _node_id('auction', auction_id), {'kind': 'auction_person', 'role': role}
+
+    for source_id, target_id, relation in relationships.order_by('pk').values_list(
+        'source_artwork_id', 'target_artwork_id', 'type',
+    ).iterator(chunk_size=CHUNK_SIZE):
+        yield _node_id('artwork', source_id), _node_id('artwork', target_id), {
+            'kind': 'relationship', 'relation': relation,
+        }
+
+
+def _graphml(filters):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+    yield '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+    for name in NODE_ATTRIBUTES:
+        yield f'  <key id="{name}" for="node" attr.name="{name}" attr.type="string"/>\n'
+    for name in EDGE_ATTRIBUTES:
+        yield f'  <key id="e_{name}" for="edge" attr.name="{name}" attr.type="string"/>\n'
+    yield '  <graph id="provenance" edgedefault="directed">\n'
+    for node_id, node_type, label in nodes(filters):
+        yield (
+            f'    <node id={quoteattr(node_id)}><data key="label">{escape(label)}</data>'
+            f'<data key="type">{node_type}</data></node>\n'
+        )
+    for n, (source, target, attributes) in enumerate(edges(filters)):
+        data = ''.join(
+            f'<data key="e_{name}">{escape(str(value))}</data>' for name, value in attributes.items() if value != ''
+        )
+        yield f'    <edge id="e{n}" source={quoteattr(source)} target={quoteattr(target)}>{data}</edge>\n'
+    yield '  </graph>\n</graphml>\n'
+
+
+def _gexf(filters):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<gexf xmlns="http://gexf.net/1.3" version="1.3">\n'
+    yield '  <graph defaultedgetype="directed" mode="static">\n'
+    yield '    <attributes class="node">\n'
+    for name in NODE_ATTRIBUTES:
+        yield f'      <attribute id="{name}" title="{name}" type="string"/>\n'
+    yield '    </attributes>\n    <attributes class="edge">\n'
+    for name in EDGE_ATTRIBUTES:
+        yield f'      <attribute id="{name}" title="{name}" type="string"/>\n'
+    yield '    </attributes>\n    <nodes>\n'
+    for node_id, node_type, label in nodes(filters):
+        yield (
+            f'      <node id={quoteattr(node_id)} label={quoteattr(label)}>'
+            f'<attvalues><attvalue for="type" value="{node_type}"/></attvalues></node>\n'
+        )
+    yield '    </nodes>\n    <edges>\n'
+    for n, (source, target, attributes) in enumerate(edges(filters)):
+        values = ''.join(
+            f'<attvalue for="{name}" value={quoteattr(str(value))}/>'
+            for name, value in attributes.items() if value != ''
+        )
+        yield (
+            f'      <edge id="{n}" source={quoteattr(source)} target={quoteattr(target)}>'
+            f'<attvalues>{values}</attvalues></edge>\n'
+        )
+    yield '    </edges>\n  </graph>\n</gexf>\n'
+
+
+def _csv(filters):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for source, target, attributes in edges(filters):
+        yield writer.writerow([source, target, *(attributes.get(name, '') for name in EDGE_ATTRIBUTES)])
+
+
+WRITERS = {'graphml': _graphml, 'gexf': _gexf, 'csv': _csv}
+
+
+def export_lines(export_format, filters):
+    """
+    Yields the export in `export_format` as text chunks of LINES_PER_WRITE
+    lines, for a StreamingHttpResponse.
+    """
+    buffer = []
+    for line in WRITERS[export_format](filters):
+        buffer.append(line)
+        if len(buffer) >= LINES_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,200 @@
+"""
+Holding intervals: who held an artwork when.
+
+Every dated provenance event starts an interval that lasts until the next
+dated event of the same artwork (`end` is exclusive and null for the last
+event, i.e. still held). Dates are free text, so an interval starts on the
+first day its event's date can mean ("1938" -> 1.1.1938) and lasts at least
+until the last day it can mean. Undated and disproven events are left out;
+an undated event between two dated ones therefore lets the earlier interval
+run until the next dated event.
+
+The intervals are stored in `HoldingInterval` with the event's actors and
+certainty, indexed by (actor, start), so "who held artwork X on 12.03.1938"
+and "what did person Y hold in 1933-1945" are range scans instead of walks
+over every chain. `ProvenanceEvent.save()` rebuilds the intervals of its
+artwork; bulk loads call `rebuild_holdings()` themselves.
+"""
+import threading
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+
+from .dates import date_bounds
+from .event_report import FilterParamError, parse_id_list
+
+REBUILD_BATCH_SIZE = 500
+
+ACTOR_FIELDS = ('person_id', 'institution_id', 'auction_id', 'exhibition_id')
+EVENT_COLUMNS = ('pk', 'artwork_id', 'date', 'certainty', *ACTOR_FIELDS)
+
+# Query parameter -> HoldingInterval column (used with `__in`).
+ID_FILTERS = {
+    'artwork': 'artwork_id',
+    'person': 'person_id',
+    'institution': 'institution_id',
+    'auction': 'auction_id',
+    'exhibition': 'exhibition_id',
+}
+
+_deferred = threading.local()
+
+
+def derive_intervals(events):
+    """
+    Interval field values for the events of one artwork, given as
+    EVENT_COLUMNS rows in sequence order.
+    """
+    dated = []
+    for pk, artwork_id, date, certainty, *actors in events:
+        bounds = date_bounds(date)
+        if bounds is not None and certainty != 'false':
+            dated.append((pk, artwork_id, bounds, certainty, actors))
+    intervals = []
+    for n, (pk, artwork_id, (start, last), certainty, actors) in enumerate(dated):
+        end = None
+        if n + 1 < len(dated):
+            end = max(dated[n + 1][2][0], last)
+        intervals.append({
+            'event_id': pk, 'artwork_id': artwork_id, 'start': start, 'end': end, 'certainty': certainty,
+            **dict(zip(ACTOR_FIELDS, actors)),
+        })
+    return intervals
+
+
+def rebuild_holdings(artwork_ids=None, get_model=apps.get_model):
+    """
+    Recomputes the intervals of `artwork_ids` (default: all artworks) from
+    their events. Returns the number of intervals written.
+
+    `get_model` lets the migration that introduced the table pass its
+    historical models.
+    """
+    ProvenanceEvent = get_model('provenance', 'ProvenanceEvent')
+    HoldingInterval = get_model('provenance', 'HoldingInterval')
+
+    if artwork_ids is None:
+        batches = [None]
+    else:
+        artwork_ids = sorted(set(artwork_ids))
+        batches = [artwork_ids[n:n + REBUILD_BATCH_SIZE] for n in range(0, len(artwork_ids), REBUILD_BATCH_SIZE)]
+
+    written = 0
+    with transaction.atomic():
+        for batch in batches:
+            intervals = HoldingInterval.objects.all()
+            events = ProvenanceEvent.objects.all()
+            if batch is not None:
+                intervals = intervals.filter(artwork_id__in=batch)
+                events = events.filter(artwork_id__in=batch)
+            intervals.delete()
+            rows = events.order_by('artwork_id', 'sequence_number', 'pk').values_list(*EVENT_COLUMNS)
+            pending = []
+            for _, group in groupby(rows.iterator(chunk_size=2000), key=itemgetter(1)):
+                pending.extend(HoldingInterval(**values) for values in derive_intervals(group))
+                if len(pending) >= REBUILD_BATCH_SIZE:
+                    HoldingInterval.objects.bulk_create(pending)
+                    written += len(pending)
+                    pending = []
+            HoldingInterval.objects.bulk_create(pending)
+            written += len(pending)
+    return written
+
+
+def events_changed(*artwork_ids):
+    """
+    Called when events of `artwork_ids` were saved or deleted: rebuilds their
+    intervals now, or at the end of an enclosing `deferred_rebuild()`.
+    """
+    pending = getattr(_deferred, 'artwork_ids', None)
+    if pending is not None:
+        pending.update(artwork_ids)
+    else:
+        rebuild_holdings(artwork_ids)
+
+
+@contextmanager
+def deferred_rebuild():
+    """
+    Rebuilds the intervals of every artwork whose events change inside the
+    block once, when the block exits without an error, instead of after
+    every saved event. Used by the importers.
+    """
+    if getattr(_deferred, 'artwork_ids', None) is not None:
+        yield
+        return
+    _deferred.artwork_ids = artwork_ids = set()
+    try:
+        yield
+    finally:
+        _deferred.artwork_ids = None
+    if artwork_ids:
+        rebuild_holdings(artwork_ids)
+
+
+def date_param(params, name):
+    """(first day, day after the last day) of the date in `params[name]`, or None."""
+    value = params.get(name, '').strip()
+    if not value:
+        return None
+    bounds = date_bounds(value)
+    if bounds is None:
+        raise FilterParamError(f"{name} must be a date (DD.MM.YYYY, YYYY-MM-DD, MM.YYYY or YYYY)")
+    return bounds
+
+
+def parse_filters(params):
+    """
+    Reads `artwork`/`person`/`institution`/`auction`/`exhibition` (comma
+    separated ids, at least one of them), `certainty`, and either `date` or
+    `from`/`to` into `{name: value}`. Dates are reduced to the period they
+    stand for, so `date=1938` finds everything held at some point in 1938.
+    """
+    filters = {}
+    for name in ID_FILTERS:
+        ids = parse_id_list(params, name)
+        if ids:
+            filters[name] = ids
+    if not filters:
+        raise FilterParamError(f"Filter by at least one of: {', '.join(ID_FILTERS)}")
+
+    from .models import ProvenanceEvent
+    certainty = [v.strip() for v in params.get('certainty', '').split(',') if v.strip()]
+    unknown = set(certainty) - set(dict(ProvenanceEvent.CERTAINTY_CHOICES))
+    if unknown:
+        raise FilterParamError(f"Unknown certainty: {', '.join(sorted(unknown))}")
+    if certainty:
+        filters['certainty'] = certainty
+
+    date = date_param(params, 'date')
+    date_from, date_to = date_param(params, 'from'), date_param(params, 'to')
+    if date and (date_from or date_to):
+        raise FilterParamError("Use either date or from/to")
+    if date:
+        filters['period'] = date
+    elif date_from or date_to:
+        filters['period'] = (date_from[0] if date_from else None, date_to[1] if date_to else None)
+    return filters
+
+
+def apply_filters(queryset, filters):
+    """
+    Filters a HoldingInterval queryset. `period` keeps the intervals that
+    overlap [first day, day after the last day).
+    """
+    for name, value in filters.items():
+        if name in ID_FILTERS:
+            queryset = queryset.filter(**{f'{ID_FILTERS[name]}__in': value})
+        elif name == 'certainty':
+            queryset = queryset.filter(certainty__in=value)
+        elif name == 'period':
+            first, after = value
+            if after is not None:
+                queryset = queryset.filter(start__lt=after)
+            if first is not None:
+                queryset = queryset.filter(Q(end__isnull=True) | Q(end__gt=first))
+    return queryset
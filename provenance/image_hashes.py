@@ -0,0 +1,276 @@
+"""
+Perceptual hashes of artwork images, for finding visually duplicate artworks.
+
+Every image attached to an artwork gets three 64-bit hashes of its
+downscaled grayscale pixels (`ImageHash`):
+
+- aHash: pixels brighter than the mean;
+- dHash: pixels brighter than their right neighbour;
+- pHash: low-frequency DCT coefficients above their median.
+
+Similar images have hashes with a small Hamming distance; pHash is the one
+matched on, the others are reported alongside. The pHash is also stored as
+BANDS 16-bit bands for multi-index hashing: two hashes within distance d
+agree on at least one band up to d // BANDS bits, so candidates are found
+with indexed equality lookups on the bands (d // BANDS = 0 for d < BANDS,
+i.e. exact matches) and only those are compared bit by bit.
+
+`hash_images()` hashes the images without an up-to-date hash,
+`find_similar_images()` compares all of them in memory and
+`propose_possible_matches()` records the pairs as `possible_match`
+relationships; the `find_possible_matches` job and command run all three.
+"""
+import logging
+from collections import namedtuple
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+from django.db.models import F, Q
+from PIL import Image as PILImage, ImageOps, UnidentifiedImageError
+from scipy.fft import dct
+
+from .artwork_matching import record_possible_matches
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+# Default and largest pHash distance of a match. Above MAX_DISTANCE the band
+# lookups enumerate too many neighbouring values.
+MATCH_DISTANCE = 8
+MAX_DISTANCE = 3 * BANDS - 1
+
+HASH_BATCH_SIZE = 200
+
+# `distance` is the pHash distance; the aHash and dHash ones are informative.
+ImageMatch = namedtuple(
+    'ImageMatch', 'artwork_id other_id image_id other_image_id distance ahash_distance dhash_distance',
+)
+
+_POPCOUNT = np.array([bin(n).count('1') for n in range(256)], dtype=np.int64)
+
+
+def _pixels(image, width, height):
+    return np.asarray(image.resize((width, height), PILImage.Resampling.LANCZOS), dtype=np.float64)
+
+
+def _pack(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def average_hash(image):
+    pixels = _pixels(image, 8, 8)
+    return _pack(pixels > pixels.mean())
+
+
+def difference_hash(image):
+    pixels = _pixels(image, 9, 8)
+    return _pack(pixels[:, 1:] > pixels[:, :-1])
+
+
+def perceptual_hash(image):
+    pixels = _pixels(image, 32, 32)
+    low = dct(dct(pixels, axis=0, norm='ortho'), axis=1, norm='ortho')[:8, :8]
+    return _pack(low > np.median(low))
+
+
+def compute_hashes(file):
+    """(aHash, dHash, pHash) of an image file or path, as unsigned ints."""
+    with PILImage.open(file) as image:
+        gray = ImageOps.exif_transpose(image).convert('L')
+    return average_hash(gray), difference_hash(gray), perceptual_hash(gray)
+
+
+def to_signed(value):
+    """An unsigned 64-bit hash as stored in a BigIntegerField."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value):
+    return value & ((1 << HASH_BITS) - 1)
+
+
+def bands(value):
+    """The BANDS bands of an unsigned hash, most significant first."""
+    mask = (1 << BAND_BITS) - 1
+    return tuple((value >> (BAND_BITS * (BANDS - 1 - n))) & mask for n in range(BANDS))
+
+
+def hash_fields(ahash, dhash, phash):
+    """ImageHash field values of three unsigned hashes."""
+    return {
+        'ahash': to_signed(ahash), 'dhash': to_signed(dhash), 'phash': to_signed(phash),
+        **{f'band{n}': band for n, band in enumerate(bands(phash))},
+    }
+
+
+def hamming(a, b):
+    return bin(to_unsigned(a) ^ to_unsigned(b)).count('1')
+
+
+@lru_cache(maxsize=None)
+def _band_masks(radius):
+    """XOR masks of every BAND_BITS-bit value within `radius` bits, 0 first."""
+    masks = [0]
+    for bits in range(1, radius + 1):
+        masks.extend(sum(1 << bit for bit in flipped) for flipped in combinations(range(BAND_BITS), bits))
+    return tuple(masks)
+
+
+def check_distance(max_distance):
+    if not 0 <= max_distance <= MAX_DISTANCE:
+        raise ValueError(f"distance must be between 0 and {MAX_DISTANCE}")
+
+
+def hash_images(progress=None):
+    """
+    Hashes the artwork images that have no hash or whose file changed since
+    it was hashed. Unreadable files are logged and skipped. Returns
+    (hashed, unreadable).
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from .models import Artwork, Image, ImageHash
+
+    ImageHash.objects.exclude(file=F('image__image')).delete()
+    images = Image.objects.filter(
+        content_type=ContentType.objects.get_for_model(Artwork), object_id__in=Artwork.objects.values('pk'),
+        image_hash__isnull=True,
+    )
+    total = images.count()
+    hashed = unreadable = done = 0
+    pending = []
+    for image in images.order_by('pk').only('image', 'object_id').iterator(chunk_size=HASH_BATCH_SIZE):
+        try:
+            with image.image.open('rb') as file:
+                hashes = compute_hashes(file)
+        except (OSError, UnidentifiedImageError, ValueError) as e:
+            logger.warning("Cannot hash image %s (%s): %s", image.pk, image.image.name, e)
+            unreadable += 1
+        else:
+            pending.append(ImageHash(
+                image_id=image.pk, artwork_id=image.object_id, file=image.image.name, **hash_fields(*hashes),
+            ))
+        done += 1
+        if len(pending) >= HASH_BATCH_SIZE:
+            ImageHash.objects.bulk_create(pending)
+            hashed += len(pending)
+            pending = []
+            if progress:
+                progress(done, total)
+    ImageHash.objects.bulk_create(pending)
+    return hashed + len(pending), unreadable
+
+
+def _popcount(values):
+    return _POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _band_pairs(band, masks):
+    """Index pairs (i, j), i < j, whose band values differ by one of `masks`."""
+    order = np.argsort(band, kind='stable')
+    ordered = band[order]
+    left, right = [], []
+    for mask in masks:
+        target = band ^ mask
+        lo = np.searchsorted(ordered, target, 'left')
+        counts = np.searchsorted(ordered, target, 'right') - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        i, j = np.repeat(np.arange(len(band)), counts), order[np.repeat(lo, counts) + offsets]
+        keep = i < j
+        left.append(i[keep])
+        right.append(j[keep])
+    if not left:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(left), np.concatenate(right)
+
+
+def find_similar_images(max_distance=MATCH_DISTANCE):
+    """
+    Pairs of different artworks with images within `max_distance` pHash
+    bits, as ImageMatch (artwork_id < other_id, the closest pair of images
+    per artwork pair), closest first. One query.
+    """
+    from .models import ImageHash
+
+    check_distance(max_distance)
+    rows = list(ImageHash.objects.order_by('pk').values_list('image_id', 'artwork_id', 'phash', 'ahash', 'dhash'))
+    if len(rows) < 2:
+        return []
+    image_ids, artwork_ids, phash, ahash, dhash = (np.array(column, dtype=np.int64) for column in zip(*rows))
+    phash, ahash, dhash = phash.view(np.uint64), ahash.view(np.uint64), dhash.view(np.uint64)
+    masks = np.array(_band_masks(max_distance // BANDS), dtype=np.uint64)
+
+    pairs = []
+    for n in range(BANDS):
+        band = (phash >> np.uint64(BAND_BITS * (BANDS - 1 - n))) & np.uint64((1 << BAND_BITS) - 1)
+        pairs.append(np.stack(_band_pairs(band, masks)))
+    i, j = np.unique(np.concatenate(pairs, axis=1), axis=1)
+    distance = _popcount(phash[i] ^ phash[j])
+    keep = (distance <= max_distance) & (artwork_ids[i] != artwork_ids[j])
+    i, j, distance = i[keep], j[keep], distance[keep]
+
+    # Orient every pair by artwork id and keep the closest images per artwork pair.
+    swap = artwork_ids[i] > artwork_ids[j]
+    i, j = np.where(swap, j, i), np.where(swap, i, j)
+    order = np.lexsort((image_ids[j], image_ids[i], distance, artwork_ids[j], artwork_ids[i]))
+    i, j, distance = i[order], j[order], distance[order]
+    first = np.r_[True, (artwork_ids[i][1:] != artwork_ids[i][:-1]) | (artwork_ids[j][1:] != artwork_ids[j][:-1])]
+    i, j, distance = i[first], j[first], distance[first]
+    matches = [
+        ImageMatch(int(artwork_ids[a]), int(artwork_ids[b]), int(image_ids[a]), int(image_ids[b]), int(d), int(da),
+                   int(dd))
+        for a, b, d, da, dd in zip(i, j, distance, _popcount(ahash[i] ^ ahash[j]), _popcount(dhash[i] ^ dhash[j]))
+    ]
+    return sorted(matches, key=lambda match: (match.distance, match.artwork_id, match.other_id))
+
+
+def similar_artworks(artwork_id, max_distance=MATCH_DISTANCE):
+    """
+    Artworks with an image within `max_distance` pHash bits of an image of
+    `artwork_id`: {other artwork id: ImageMatch}, using the band indexes.
+    Two queries (one when the artwork has no hashed image).
+    """
+    from .models import ImageHash
+
+    check_distance(max_distance)
+    own = list(ImageHash.objects.filter(artwork_id=artwork_id).values_list('image_id', 'ahash', 'dhash', 'phash'))
+    if not own:
+        return {}
+    masks = _band_masks(max_distance // BANDS)
+    condition = Q()
+    for n in range(BANDS):
+        values = {bands(to_unsigned(phash))[n] ^ mask for *_, phash in own for mask in masks}
+        condition |= Q(**{f'band{n}__in': sorted(values)})
+    candidates = ImageHash.objects.filter(condition).exclude(artwork_id=artwork_id).values_list(
+        'image_id', 'artwork_id', 'ahash', 'dhash', 'phash',
+    )
+    matches = {}
+    for other_image_id, other_id, other_ahash, other_dhash, other_phash in candidates:
+        for image_id, ahash, dhash, phash in own:
+            distance = hamming(phash, other_phash)
+            best = matches.get(other_id)
+            if distance <= max_distance and (best is None or distance < best.distance):
+                matches[other_id] = ImageMatch(
+                    artwork_id, other_id, image_id, other_image_id, distance, hamming(ahash, other_ahash),
+                    hamming(dhash, other_dhash),
+                )
+    return matches
+
+
+def propose_possible_matches(matches):
+    """
+    Records `matches` as `possible_match` relationships, skipping artwork
+    pairs that are already related in either direction. Returns the number
+    of relationships created.
+    """
+    return record_possible_matches(
+        (match.artwork_id, match.other_id,
+         f"Images {match.image_id} and {match.other_image_id} look alike (hash distances: "
+         f"pHash {match.distance}, aHash {match.ahash_distance}, dHash {match.dhash_distance})")
+        for match in matches
+    )
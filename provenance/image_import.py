@@ -0,0 +1,59 @@
+"""
+Attaches image files to artworks based on an Excel mapping sheet
+(columns: artwork name, image filename).
+"""
+import os
+
+import openpyxl
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File
+
+from .models import Artwork, Image
+
+
+def import_artwork_images(mapping_file, images_dir, log=None, progress=None):
+    """
+    Creates an `Image` for every mapping row whose artwork and file exist.
+    `log(level, message)` receives one line per row ('success', 'warning' or
+    'error'), `progress(done, total)` is called after each row.
+    Returns the number of imported images.
+    """
+    log = log or (lambda level, message: None)
+
+    wb = openpyxl.load_workbook(mapping_file, read_only=True)
+    ws = wb.active
+
+    # Skip header
+    rows = list(ws.iter_rows(values_only=True))[1:]
+    wb.close()
+
+    artwork_ct = ContentType.objects.get_for_model(Artwork)
+    names = {row[0] for row in rows if row and row[0]}
+    artworks = {a.name: a for a in Artwork.objects.filter(name__in=names)}
+
+    imported = 0
+    for done, row in enumerate(rows, start=1):
+        artwork_name, image_filename = (tuple(row) + (None, None))[:2]
+        if artwork_name and image_filename:
+            artwork = artworks.get(artwork_name)
+            image_path = os.path.join(images_dir, image_filename)
+            if artwork is None:
+                log('error', f'Artwork "{artwork_name}" not found in database')
+            elif not os.path.exists(image_path):
+                log('warning', f'Image file {image_path} not found for {artwork_name}')
+            else:
+                try:
+                    with open(image_path, 'rb') as f:
+                        img_obj = Image(
+                            content_type=artwork_ct,
+                            object_id=artwork.id,
+                            caption=artwork_name
+                        )
+                        img_obj.image.save(os.path.basename(image_filename), File(f), save=True)
+                    imported += 1
+                    log('success', f'Successfully imported image for {artwork_name}')
+                except Exception as e:
+                    log('error', f'Error importing image for {artwork_name}: {str(e)}')
+        if progress:
+            progress(done, len(rows))
+    return imported
@@ -0,0 +1,122 @@
+"""
+Database-backed background jobs.
+
+Heavy work (Excel exports, database dumps and syncs, image imports) is queued
+as a `Job` row and picked up by `manage.py run_jobs`, so no request has to wait
+for it and no extra broker (Redis etc.) is needed. Tasks are plain functions
+registered with `@task('<kind>')` in provenance/tasks.py; they receive the job
+as first argument to report progress and attach result files.
+
+Every progress report renews the job's heartbeat. A job still `running`
+JOB_LEASE seconds after its last heartbeat lost its worker (killed, OOM,
+redeployed); `run_jobs` marks such jobs failed so clients stop waiting.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(kind):
+    """
+    Registers the decorated function as the handler for jobs of `kind`.
+    """
+    def decorator(func):
+        TASKS[kind] = func
+        return func
+    return decorator
+
+
+def submit(kind, params=None, user=None):
+    """
+    Queues a job and returns it immediately.
+    """
+    if kind not in TASKS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(
+        kind=kind,
+        params=params or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def claim_next_job():
+    """
+    Atomically moves the oldest queued job to `running` and returns it,
+    or None if the queue is empty. Several workers can poll concurrently
+    on PostgreSQL thanks to SKIP LOCKED.
+    """
+    with transaction.atomic():
+        queued = Job.objects.filter(status=Job.STATUS_QUEUED).order_by('created_at')
+        if connection.features.has_select_for_update_skip_locked:
+            queued = queued.select_for_update(skip_locked=True)
+        job = queued.first()
+        if job is None:
+            return None
+        job.status = Job.STATUS_RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def fail_stale_jobs(lease=None):
+    """
+    Marks running jobs without a heartbeat for `lease` seconds (default
+    JOB_LEASE) as failed. Returns their number.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.JOB_LEASE if lease is None else lease)
+    return Job.objects.filter(status=Job.STATUS_RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+    ).update(
+        status=Job.STATUS_FAILED, finished_at=now,
+        error="The worker running this job stopped responding.",
+    )
+
+
+def run_job(job):
+    """
+    Executes a claimed job and records its outcome. Exceptions are stored on the
+    job instead of being raised, so one failing job does not stop the worker.
+    """
+    handler = TASKS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        result = handler(job, **job.params)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job.pk, job.kind)
+        job.status = Job.STATUS_FAILED
+        job.error = f"{e}\n\n{traceback.format_exc()}"
+    else:
+        job.status = Job.STATUS_SUCCEEDED
+        job.progress = 100
+        job.result = result or {}
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'result', 'result_file', 'error', 'finished_at'])
+    return job
+
+
+def run_pending(limit=None):
+    """
+    Runs queued jobs one after the other until the queue is empty
+    (or `limit` jobs ran). Returns the number of jobs processed.
+    """
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
@@ -0,0 +1,65 @@
+import os
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods
+from .models import Job
+
+def serialize_job(job):
+    return {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'error': job.error.splitlines()[0] if job.error else '',
+        'result': job.result,
+        'download_url': reverse('job-download', args=[job.pk]) if job.result_file else None,
+        'status_url': reverse('job-detail', args=[job.pk]),
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def _get_job_for_request(request, pk):
+    """
+    Jobs submitted anonymously are reachable by their (unguessable) id,
+    everything else only by its owner or staff.
+    """
+    job = get_object_or_404(Job, pk=pk)
+    if job.created_by_id is not None and not request.user.is_staff and request.user.pk != job.created_by_id:
+        raise Http404
+    return job
+
+@require_http_methods(["GET"])
+def job_list(request):
+    """
+    Returns the most recent jobs (staff only).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    jobs = Job.objects.all()[:50]
+    return JsonResponse({'results': [serialize_job(job) for job in jobs]})
+
+@require_http_methods(["GET"])
+def job_detail(request, pk):
+    """
+    Returns status and progress of a job; poll this until `status` is
+    `succeeded` or `failed`.
+    """
+    job = _get_job_for_request(request, pk)
+    return JsonResponse(serialize_job(job))
+
+@require_http_methods(["GET"])
+def job_download(request, pk):
+    """
+    Streams the artifact produced by a finished job.
+    """
+    job = _get_job_for_request(request, pk)
+    if job.status != Job.STATUS_SUCCEEDED or not job.result_file:
+        raise Http404
+    return FileResponse(
+        job.result_file.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(job.result_file.name),
+    )
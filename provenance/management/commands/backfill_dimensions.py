@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from provenance.dimensions import BACKFILL_BATCH_SIZE, backfill_dimensions
+
+
+class Command(BaseCommand):
+    help = 'Parses artwork dimension texts into the numeric height, width, depth and unit fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the artworks that would change')
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE,
+                            help='Artworks read and updated per batch')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('batch size must be at least 1')
+        checked, changed = backfill_dimensions(options['batch_size'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{changed} of {checked} artworks would change. Run without --dry-run to apply.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Updated the dimensions of {changed} of {checked} artworks.'))
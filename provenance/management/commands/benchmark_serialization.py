@@ -0,0 +1,110 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.http import JsonResponse
+from provenance.models import Artwork, ProvenanceEvent
+from provenance.serializers import artwork_list_rows, event_report_rows, json_response
+
+
+def instance_event_report():
+    """The event report as built before the values_list path, for comparison."""
+    events = ProvenanceEvent.objects.select_related(
+        'artwork', 'event_type', 'person', 'institution', 'auction', 'exhibition',
+    ).prefetch_related('provenanceeventsource_set__source').order_by('artwork__name', 'sequence_number')
+    data = []
+    for event in events:
+        sources = list(event.provenanceeventsource_set.all())
+        base_event_data = {
+            'artwork_id': event.artwork.id,
+            'artwork_name': event.artwork.name,
+            'sequence_number': event.sequence_number,
+            'event_type_id': event.event_type.id if event.event_type else None,
+            'event_type_name': event.event_type.name if event.event_type else '',
+            'date': event.date,
+            'person': str(event.person) if event.person else '',
+            'institution': str(event.institution) if event.institution else '',
+            'auction': str(event.auction) if event.auction else '',
+            'exhibition': str(event.exhibition) if event.exhibition else '',
+            'certainty': event.get_certainty_display() if event.certainty else '',
+        }
+        if not sources:
+            data.append({**base_event_data, 'id': f"{event.id}_0", 'sources': ''})
+        for s in sources:
+            data.append({**base_event_data, 'id': f"{event.id}_{s.id}", 'sources': str(s.source)})
+    return JsonResponse({'results': data})
+
+
+def instance_artwork_list():
+    """The artwork list as built before the values_list path, for comparison."""
+    artworks = Artwork.objects.select_related('medium', 'medium__type').annotate(
+        event_count=Count('provenance_events', distinct=True)
+    )
+    data = []
+    for art in artworks:
+        data.append({
+            'id': art.id,
+            'name': art.name,
+            'medium': art.medium.name if art.medium else '',
+            'medium_id': art.medium.id if art.medium else None,
+            'art_type': art.medium.type.name if art.medium and art.medium.type else '',
+            'art_type_id': art.medium.type.id if art.medium and art.medium.type else None,
+            'dimension': art.dimension,
+            'height': art.height,
+            'width': art.width,
+            'depth': art.depth,
+            'dimension_unit': art.dimension_unit,
+            'image': art.images.first().image.url if art.images.exists() else None,
+            'event_count': art.event_count,
+            'creation_date': '',
+        })
+    return JsonResponse({'results': data})
+
+
+BENCHMARKS = {
+    'event_report': (
+        instance_event_report,
+        lambda: json_response({'results': event_report_rows(ProvenanceEvent.objects.all())}),
+    ),
+    'artwork_list': (
+        instance_artwork_list,
+        lambda: json_response({'results': artwork_list_rows(Artwork.objects.all())}),
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Times the model-instance and values_list serialization paths of the list endpoints on the current database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the best time is reported')
+        parser.add_argument('--endpoint', choices=sorted(BENCHMARKS), action='append', help='Only benchmark this endpoint (repeatable)')
+
+    def _time(self, build, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = build()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, response
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        for name in options['endpoint'] or sorted(BENCHMARKS):
+            instance_build, values_build = BENCHMARKS[name]
+            instance_time, instance_response = self._time(instance_build, repeat)
+            values_time, values_response = self._time(values_build, repeat)
+
+            instance_rows = json.loads(instance_response.content)['results']
+            values_rows = json.loads(values_response.content)['results']
+            key = lambda row: row['id']
+            if sorted(instance_rows, key=key) != sorted(values_rows, key=key):
+                self.stderr.write(self.style.WARNING(f'{name}: the two paths returned different rows'))
+
+            self.stdout.write(
+                f'{name}: {len(values_rows)} rows, '
+                f'instances {instance_time * 1000:.1f} ms, '
+                f'values_list {values_time * 1000:.1f} ms '
+                f'({instance_time / values_time if values_time else 0:.1f}x)'
+            )
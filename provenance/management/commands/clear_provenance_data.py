@@ -1,31 +1,14 @@
 from django.core.management.base import BaseCommand
-from provenance.models import (
-    ArtType, ArtworkGroup, Medium, Person, InstitutionType, 
-    Institution, Artwork, Source, ProvenanceEvent, ArtworkRelationship,
-    Image
-)
+from provenance.reset import reset_provenance_data
 
 class Command(BaseCommand):
     help = 'Clears all data from provenance tables'
 
     def handle(self, *args, **options):
         self.stdout.write('Clearing provenance data...')
-        
-        # Order matters for foreign keys
-        ProvenanceEvent.objects.all().delete()
-        ArtworkRelationship.objects.all().delete()
-        Source.objects.all().delete()
-        Artwork.objects.all().delete()
-        Medium.objects.all().delete()
-        Institution.objects.all().delete()
-        Person.objects.all().delete()
-        InstitutionType.objects.all().delete()
-        ArtworkGroup.objects.all().delete()
-        ArtType.objects.all().delete()
-        
-        # Clear images related to these models
-        # (Optional: might want to be careful here if Image is used by other apps)
-        # But in this project it seems centered on provenance.
-        Image.objects.all().delete()
 
-        self.stdout.write(self.style.SUCCESS('Successfully cleared provenance data.'))
+        # Truncates every provenance table (images included) in one go,
+        # see provenance/reset.py for the table order and backend handling.
+        tables = reset_provenance_data()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully cleared provenance data ({len(tables)} tables).'))
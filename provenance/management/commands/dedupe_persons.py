@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from provenance.models import Person
+from provenance.persons import MATCH_THRESHOLD, find_duplicate_persons, merge_persons
+
+
+class Command(BaseCommand):
+    help = 'Lists (and optionally merges) persons that are probably duplicates of each other'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=MATCH_THRESHOLD,
+                            help='Minimum score of a reported pair (0-1)')
+        parser.add_argument('--merge', action='store_true',
+                            help='Merge every reported pair into the person with the lower id')
+
+    def handle(self, *args, **options):
+        candidates = find_duplicate_persons(threshold=options['threshold'])
+        persons = Person.objects.only('family_name', 'first_name').in_bulk(
+            {pk for c in candidates for pk in (c.person_id, c.other_id)}
+        )
+        for candidate in candidates:
+            self.stdout.write(
+                f"{candidate.score:.3f}  #{candidate.person_id} {persons[candidate.person_id]}"
+                f"  <->  #{candidate.other_id} {persons[candidate.other_id]}"
+            )
+        if not options['merge']:
+            self.stdout.write(f'{len(candidates)} candidate pairs. Run with --merge to merge them.')
+            return
+        merged = merge_persons((c.person_id, c.other_id) for c in candidates)
+        self.stdout.write(self.style.SUCCESS(f'Merged {merged} persons.'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from provenance.image_hashes import (
+    MATCH_DISTANCE, check_distance, find_similar_images, hash_images, propose_possible_matches,
+)
+from provenance.models import Artwork
+
+
+class Command(BaseCommand):
+    help = 'Hashes artwork images and lists (and optionally records) visually similar artworks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--distance', type=int, default=MATCH_DISTANCE,
+                            help='Largest pHash Hamming distance of a reported pair (bits)')
+        parser.add_argument('--propose', action='store_true',
+                            help='Record every reported pair as a possible_match relationship')
+
+    def handle(self, *args, **options):
+        try:
+            check_distance(options['distance'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        hashed, unreadable = hash_images()
+        self.stdout.write(f'Hashed {hashed} images ({unreadable} unreadable).')
+        matches = find_similar_images(options['distance'])
+        artworks = Artwork.objects.only('name').in_bulk(
+            {pk for match in matches for pk in (match.artwork_id, match.other_id)}
+        )
+        for match in matches:
+            self.stdout.write(
+                f"{match.distance:2d}  #{match.artwork_id} {artworks[match.artwork_id]}"
+                f"  <->  #{match.other_id} {artworks[match.other_id]}"
+            )
+        if not options['propose']:
+            self.stdout.write(f'{len(matches)} candidate pairs. Run with --propose to record them.')
+            return
+        proposed = propose_possible_matches(matches)
+        self.stdout.write(self.style.SUCCESS(f'Recorded {proposed} possible matches.'))
@@ -2,8 +2,11 @@ import openpyxl
 from django.core.management.base import BaseCommand
 from provenance.models import (
     ArtType, ArtworkGroup, Medium, Person, InstitutionType, 
-    Institution, Artwork, Source, ProvenanceEvent, ArtworkRelationship
+    Institution, Artwork, ProvenanceEvent, ArtworkRelationship
 )
+from provenance.holdings import deferred_rebuild
+from provenance.persons import match_persons
+from provenance.sources import resolve_sources
 from datetime import datetime
 
 class Command(BaseCommand):
@@ -27,8 +30,9 @@ class Command(BaseCommand):
         self.import_artworks(wb['Artworks'])
         self.import_sources(wb['Sources'])
 
-        # 3. Events and Relationships
-        self.import_provenance_events(wb['ProvenanceEvents'])
+        # 3. Events and Relationships; holding intervals are rebuilt once at the end.
+        with deferred_rebuild():
+            self.import_provenance_events(wb['ProvenanceEvents'])
         self.import_artwork_relationships(wb['Artworks']) # From the same sheet
 
         self.stdout.write(self.style.SUCCESS('Import completed successfully!'))
@@ -112,19 +116,25 @@ class Command(BaseCommand):
                     artwork.groups.add(group)
 
     def import_sources(self, sheet):
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            # Headers: ['Source', 'Type', 'Link']
-            if row[0]:
-                Source.objects.get_or_create(
-                    source=row[0],
-                    defaults={
-                        'type': row[1] or '',
-                        'link': row[2] if row[2] and str(row[2]).startswith('http') else None
-                    }
-                )
+        # Headers: ['Source', 'Type', 'Link']
+        rows = [row for row in sheet.iter_rows(min_row=2, values_only=True) if row[0]]
+        resolve_sources(
+            [row[0] for row in rows],
+            defaults={
+                row[0]: {
+                    'type': row[1] or '',
+                    'link': row[2] if row[2] and str(row[2]).startswith('http') else None
+                }
+                for row in rows
+            },
+        )
 
     def import_provenance_events(self, sheet):
-        for row in sheet.iter_rows(min_row=2, values_only=True):
+        rows = list(sheet.iter_rows(min_row=2, values_only=True))
+        # Source1/Source2 citations of the whole sheet, resolved at once.
+        sources = resolve_sources(row[i] for row in rows if row[0] for i in (9, 10))
+        persons = match_persons(row[5] for row in rows if row[0])
+        for row in rows:
             # Headers: ['Werk', 'Gruppe', 'Event', 'EventSeqNr', 'date', 'person', 'Institute', 'Certainty', 'Notes', 'Source1', 'Source2', None]
             artwork_name = row[0]
             if not artwork_name:
@@ -135,9 +145,9 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING(f"Artwork not found: {artwork_name}"))
                 continue
 
-            person = None
-            if row[5]:
-                person = Person.objects.filter(family_name=row[5].split(',')[0]).first() # Rough match
+            person = persons.get(row[5])
+            if row[5] and person is None:
+                self.stdout.write(self.style.WARNING(f"Person not matched (unknown or ambiguous): {row[5]}"))
             
             institution = None
             if row[6]:
@@ -154,12 +164,9 @@ class Command(BaseCommand):
                 notes=row[8] or ''
             )
 
-            if row[9]: # Source1
-                s1, _ = Source.objects.get_or_create(source=row[9])
-                event.sources.add(s1)
-            if row[10]: # Source2
-                s2, _ = Source.objects.get_or_create(source=row[10])
-                event.sources.add(s2)
+            event_sources = [sources[c] for c in (row[9], row[10]) if c in sources] # Source1, Source2
+            if event_sources:
+                event.sources.add(*event_sources)
 
     def import_artwork_relationships(self, sheet):
         for row in sheet.iter_rows(min_row=2, values_only=True):
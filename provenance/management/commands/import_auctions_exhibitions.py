@@ -1,8 +1,10 @@
 import openpyxl
 from django.core.management.base import BaseCommand
 from provenance.models import (
-    Person, Institution, Source, Auction, AuctionPerson, Exhibition
+    Institution, Auction, AuctionPerson, Exhibition
 )
+from provenance.persons import match_persons
+from provenance.sources import resolve_sources
 from datetime import datetime
 
 class Command(BaseCommand):
@@ -28,7 +30,12 @@ class Command(BaseCommand):
 
     def import_auctions(self, sheet):
         self.stdout.write('Importing Auctions...')
-        for row in sheet.iter_rows(min_row=2, values_only=True):
+        rows = list(sheet.iter_rows(min_row=2, values_only=True))
+        sources = resolve_sources(s_name for row in rows for s_name in row[6:8])
+        # Auctioneers and experts, matched against existing persons (spelling
+        # variants included) and created when unknown.
+        persons = match_persons((p_name for row in rows for p_name in row[4:6]), create=True)
+        for row in rows:
             # Headers: ['Date', 'Institution', 'Name', 'Notes', 'Auctioneer', 'Expert', 'Source 1', 'Source 2']
             date_val, inst_name, name, notes, auctioneer_name, expert_name, s1_name, s2_name = row[:8]
             
@@ -49,20 +56,21 @@ class Command(BaseCommand):
             )
 
             # Sources
-            for s_name in [s1_name, s2_name]:
-                if s_name:
-                    source, _ = Source.objects.get_or_create(source=s_name)
-                    auction.sources.add(source)
+            auction_sources = [sources[s_name] for s_name in (s1_name, s2_name) if s_name in sources]
+            if auction_sources:
+                auction.sources.add(*auction_sources)
 
             # Persons
-            if auctioneer_name:
-                self._link_person(auction, auctioneer_name, 'auctioneer')
-            if expert_name:
-                self._link_person(auction, expert_name, 'expert')
+            if persons.get(auctioneer_name):
+                self._link_person(auction, persons[auctioneer_name], 'auctioneer')
+            if persons.get(expert_name):
+                self._link_person(auction, persons[expert_name], 'expert')
 
     def import_exhibitions(self, sheet):
         self.stdout.write('Importing Exhibitions...')
-        for row in sheet.iter_rows(min_row=2, values_only=True):
+        rows = list(sheet.iter_rows(min_row=2, values_only=True))
+        sources = resolve_sources(row[5] for row in rows)
+        for row in rows:
             # Headers: ['DateStart', 'DateEnd', 'Institution', 'Name', 'Notes', 'Source']
             d_start, d_end, inst_name, name, notes, s_name = row[:6]
 
@@ -83,20 +91,10 @@ class Command(BaseCommand):
                 }
             )
 
-            if s_name:
-                source, _ = Source.objects.get_or_create(source=s_name)
-                exhibition.sources.add(source)
+            if s_name in sources:
+                exhibition.sources.add(sources[s_name])
 
-    def _link_person(self, auction, person_fullname, role):
-        # person_fullname is expected to be "Family, First" or just "Family"
-        parts = str(person_fullname).split(',')
-        family_name = parts[0].strip()
-        first_name = parts[1].strip() if len(parts) > 1 else ''
-
-        person, _ = Person.objects.get_or_create(
-            family_name=family_name,
-            first_name=first_name
-        )
+    def _link_person(self, auction, person, role):
         AuctionPerson.objects.get_or_create(
             auction=auction,
             person=person,
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from provenance.dates import DATE_FIELDS, NORMALIZE_BATCH_SIZE, normalize_stored_dates
+
+
+class Command(BaseCommand):
+    help = 'Rewrites full dates on persons, institutions, events, auctions and exhibitions as DD.MM.YYYY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the values that would change')
+        parser.add_argument('--field', action='append', dest='fields', metavar='MODEL.FIELD',
+                            help='Limit to these date fields (repeatable), e.g. Person.birth_date')
+        parser.add_argument('--batch-size', type=int, default=NORMALIZE_BATCH_SIZE,
+                            help='Distinct values rewritten per UPDATE')
+
+    def handle(self, *args, **options):
+        known = {f'{model}.{field}': (model, field) for model, field in DATE_FIELDS}
+        fields = None
+        if options['fields']:
+            unknown = set(options['fields']) - set(known)
+            if unknown:
+                raise CommandError(f"Unknown date fields: {', '.join(sorted(unknown))}")
+            fields = [known[name] for name in options['fields']]
+
+        report = normalize_stored_dates(fields, dry_run=options['dry_run'], batch_size=options['batch_size'])
+        total = 0
+        for name, changes in report.items():
+            rows = sum(count for _, _, count in changes)
+            total += rows
+            if not changes:
+                continue
+            self.stdout.write(f'{name}: {len(changes)} values, {rows} rows')
+            if options['dry_run']:
+                for old, new, count in changes:
+                    self.stdout.write(f'  {old!r} -> {new!r} ({count})')
+        if options['dry_run']:
+            self.stdout.write(f'{total} rows would change. Run without --dry-run to apply.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Normalized {total} dates.'))
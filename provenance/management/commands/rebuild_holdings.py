@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from provenance.holdings import rebuild_holdings
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the holding intervals of all artworks from their provenance events'
+
+    def handle(self, *args, **options):
+        written = rebuild_holdings()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} holding intervals.'))
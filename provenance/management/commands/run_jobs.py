@@ -0,0 +1,33 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from provenance.jobs import claim_next_job, fail_stale_jobs, run_job
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (exports, database syncs, image imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the current queue and exit instead of polling')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Job worker started.'))
+        while True:
+            close_old_connections()
+            stale = fail_stale_jobs()
+            if stale:
+                self.stderr.write(self.style.ERROR(f'Marked {stale} job(s) failed whose worker stopped responding.'))
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Running job {job.pk} ({job.kind})...')
+            job = run_job(job)
+            if job.status == job.STATUS_SUCCEEDED:
+                self.stdout.write(self.style.SUCCESS(f'Job {job.pk} finished.'))
+            else:
+                self.stderr.write(self.style.ERROR(f'Job {job.pk} failed: {job.error.splitlines()[0] if job.error else ""}'))
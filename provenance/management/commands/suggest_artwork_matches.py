@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from provenance.artwork_matching import (
+    SUGGEST_THRESHOLD, describe, record_possible_matches, suggest_matches, update_signatures,
+)
+from provenance.models import Artwork
+
+
+class Command(BaseCommand):
+    help = 'Lists (and optionally records) artworks with similar titles, dimensions, media and actors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Rebucket every artwork and score all candidate pairs, not only changed artworks')
+        parser.add_argument('--threshold', type=float, default=SUGGEST_THRESHOLD,
+                            help='Lowest similarity score of a reported pair (0-1)')
+        parser.add_argument('--propose', action='store_true',
+                            help='Record every reported pair as a possible_match relationship')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['threshold'] <= 1:
+            raise CommandError('threshold must be between 0 and 1')
+        changed = update_signatures(full=options['all'])
+        self.stdout.write(f'Updated the signatures of {len(changed)} artworks.')
+        suggestions = suggest_matches(None if options['all'] else changed, threshold=options['threshold'])
+        artworks = Artwork.objects.only('name').in_bulk(
+            {pk for suggestion in suggestions for pk in (suggestion.artwork_id, suggestion.other_id)}
+        )
+        for suggestion in suggestions:
+            self.stdout.write(
+                f"{suggestion.score:.2f}  #{suggestion.artwork_id} {artworks[suggestion.artwork_id]}"
+                f"  <->  #{suggestion.other_id} {artworks[suggestion.other_id]}"
+            )
+        if not options['propose']:
+            self.stdout.write(f'{len(suggestions)} candidate pairs. Run with --propose to record them.')
+            return
+        proposed = record_possible_matches((s.artwork_id, s.other_id, describe(s)) for s in suggestions)
+        self.stdout.write(self.style.SUCCESS(f'Recorded {proposed} possible matches.'))
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# The columns searched by provenance.search.
+TRIGRAM_INDEXED_COLUMNS = [
+    ('provenance_artwork', 'name'),
+    ('provenance_person', 'family_name'),
+    ('provenance_person', 'first_name'),
+    ('provenance_institution', 'name'),
+    ('provenance_auction', 'name'),
+    ('provenance_exhibition', 'name'),
+    ('provenance_provenanceevent', 'notes'),
+]
+
+
+def index_name(table, column):
+    return f"{table.replace('provenance_', 'prov_')}_{column}_trgm"
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Trigram indexes make `icontains` searches index-backed. They are
+    # PostgreSQL-only; SQLite (local development) keeps sequential scans.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_INDEXED_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index_name(table, column)}" '
+            f'ON "{table}" USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in TRIGRAM_INDEXED_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0026_upload'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:35
+
+import re
+
+from django.db import migrations, models
+
+# Mirrors provenance.dates.parse_year at the time of this migration.
+YEAR_RE = re.compile(r'(?<!\d)(1[0-9]{3}|20[0-9]{2})(?!\d)')
+
+
+def backfill_years(apps, schema_editor):
+    # Dates repeat a lot (years, auction days), so update per distinct value.
+    ProvenanceEvent = apps.get_model('provenance', 'ProvenanceEvent')
+    dates = ProvenanceEvent.objects.exclude(date='').values_list('date', flat=True).distinct().order_by()
+    for date in dates.iterator():
+        match = YEAR_RE.search(date)
+        if match:
+            ProvenanceEvent.objects.filter(date=date).update(year=int(match.group(1)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0027_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provenanceevent',
+            name='year',
+            field=models.SmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_years, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='provenanceevent',
+            index=models.Index(fields=['event_type', 'year'], name='provevent_type_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provenanceevent',
+            index=models.Index(fields=['certainty', 'year'], name='provevent_certainty_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provenanceevent',
+            index=models.Index(fields=['year'], name='provevent_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provenanceeventsource',
+            index=models.Index(fields=['source', 'event'], name='provevsource_source_event_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0028_event_year_and_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['name', 'id'], name='artwork_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provenanceevent',
+            index=models.Index(fields=['event_type', 'artwork'], name='provevent_type_artwork_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provenanceevent',
+            index=models.Index(fields=['certainty', 'artwork'], name='provevent_cert_artwork_idx'),
+        ),
+    ]
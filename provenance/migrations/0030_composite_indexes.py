@@ -0,0 +1,41 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('provenance', '0029_artwork_browse_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auction',
+            index=models.Index(fields=['name', 'date'], name='auction_name_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exhibition',
+            index=models.Index(fields=['name', 'date_start'], name='exhibition_name_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['content_type', 'object_id'], name='image_ct_object_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['family_name', 'first_name'], name='person_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provenanceevent',
+            index=models.Index(fields=['artwork', 'sequence_number'], name='provevent_artwork_seq_idx'),
+        ),
+        # Drop the single-column FK index only once the composite index exists.
+        migrations.AlterField(
+            model_name='provenanceevent',
+            name='artwork',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='provenance_events', to='provenance.artwork'),
+        ),
+    ]
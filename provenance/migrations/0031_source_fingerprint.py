@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+def fingerprint_sources(apps, schema_editor):
+    # Collapses citations that differ only in whitespace or case.
+    from provenance.sources import deduplicate_sources
+    deduplicate_sources(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('provenance', '0030_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='source',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=40, null=True, unique=True),
+        ),
+        migrations.RunPython(fingerprint_sources, migrations.RunPython.noop),
+    ]
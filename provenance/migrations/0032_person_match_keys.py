@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:49
+
+from django.db import migrations, models
+
+
+def backfill_keys(apps, schema_editor):
+    from provenance.persons import name_key, phonetic_key
+    Person = apps.get_model('provenance', 'Person')
+    persons = []
+    for person in Person.objects.only('family_name', 'first_name').iterator(chunk_size=2000):
+        person.name_key = name_key(person.family_name, person.first_name)
+        person.phonetic_key = phonetic_key(person.family_name)
+        persons.append(person)
+    Person.objects.bulk_update(persons, ['name_key', 'phonetic_key'], batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0031_source_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='phonetic_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_intervals(apps, schema_editor):
+    from provenance.holdings import rebuild_holdings
+    rebuild_holdings(get_model=apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0032_person_match_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HoldingInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField()),
+                ('end', models.DateField(blank=True, null=True)),
+                ('certainty', models.CharField(blank=True, choices=[('proven', 'Proven'), ('likely', 'Likely'), ('possible', 'Possible'), ('unproven', 'Unproven'), ('false', 'False / Disproven')], max_length=20, null=True)),
+                ('artwork', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='holding_intervals', to='provenance.artwork')),
+                ('auction', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holding_intervals', to='provenance.auction')),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='holding_interval', to='provenance.provenanceevent')),
+                ('exhibition', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holding_intervals', to='provenance.exhibition')),
+                ('institution', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holding_intervals', to='provenance.institution')),
+                ('person', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='holding_intervals', to='provenance.person')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['artwork', 'start'], name='holding_artwork_start_idx'), models.Index(fields=['person', 'start'], name='holding_person_start_idx'), models.Index(fields=['institution', 'start'], name='holding_institution_start_idx'), models.Index(fields=['auction', 'start'], name='holding_auction_start_idx'), models.Index(fields=['exhibition', 'start'], name='holding_exhibition_start_idx')],
+            },
+        ),
+        migrations.RunPython(build_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:12
+
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    from provenance.versions import TRACKED_MODELS
+    DataVersion = apps.get_model('provenance', 'DataVersion')
+    DataVersion.objects.bulk_create([DataVersion(model=label) for label in TRACKED_MODELS], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0033_holding_intervals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0034_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActorCentrality',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor_type', models.CharField(choices=[('person', 'Person'), ('institution', 'Institution'), ('auction', 'Auction'), ('exhibition', 'Exhibition')], max_length=20)),
+                ('actor_id', models.PositiveIntegerField()),
+                ('in_degree', models.PositiveIntegerField(default=0)),
+                ('out_degree', models.PositiveIntegerField(default=0)),
+                ('degree', models.PositiveIntegerField(default=0)),
+                ('betweenness', models.FloatField(default=0)),
+                ('pagerank', models.FloatField(default=0)),
+                ('data_version', models.PositiveBigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-degree'], name='centrality_degree_idx'), models.Index(fields=['-in_degree'], name='centrality_in_degree_idx'), models.Index(fields=['-out_degree'], name='centrality_out_degree_idx'), models.Index(fields=['-betweenness'], name='centrality_betweenness_idx'), models.Index(fields=['-pagerank'], name='centrality_pagerank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='actorcentrality',
+            constraint=models.UniqueConstraint(fields=('actor_type', 'actor_id'), name='centrality_actor_unique'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0035_actor_centrality'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.CharField(max_length=255)),
+                ('ahash', models.BigIntegerField()),
+                ('dhash', models.BigIntegerField()),
+                ('phash', models.BigIntegerField()),
+                ('band0', models.PositiveIntegerField()),
+                ('band1', models.PositiveIntegerField()),
+                ('band2', models.PositiveIntegerField()),
+                ('band3', models.PositiveIntegerField()),
+                ('artwork', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_hashes', to='provenance.artwork')),
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='image_hash', to='provenance.image')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band0'], name='imagehash_band0_idx'), models.Index(fields=['band1'], name='imagehash_band1_idx'), models.Index(fields=['band2'], name='imagehash_band2_idx'), models.Index(fields=['band3'], name='imagehash_band3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0036_image_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtworkSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('artwork', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signature', to='provenance.artwork')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArtworkBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField()),
+                ('artwork', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='provenance.artwork')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='artworkbucket_bucket_idx')],
+            },
+        ),
+    ]
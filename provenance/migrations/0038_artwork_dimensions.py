@@ -0,0 +1,123 @@
+# Generated by Django 5.0.2 on 2026-10-19 12:31
+
+import re
+
+from django.db import migrations, models
+
+
+# A copy of provenance.dimensions as of this migration, so later changes to
+# the parser do not change what migrating an old database writes.
+_NUMBER = r'\d+(?:[.,]\d+)?'
+_UNIT = r'(?:mm|cm|m|in(?:ch(?:es)?)?|"|zoll)(?![a-zäöü])'
+_UNIT_CM = {'mm': 0.1, 'cm': 1.0, 'm': 100.0, 'in': 2.54}
+_LABELS = {
+    'height': ('höhe', 'hoehe', 'height', 'hoch', 'ht', 'h'),
+    'width': ('breite', 'width', 'br', 'b', 'w'),
+    'depth': ('tiefe', 'depth', 't', 'd'),
+    'diameter': ('durchmesser', 'durchm', 'diameter', 'diam', 'dm', 'ø', '⌀'),
+}
+_LABEL_FIELD = {label: field for field, labels in _LABELS.items() for label in labels}
+_LABELLED_RE = re.compile(
+    rf'(?<![a-zäöü])({"|".join(sorted(map(re.escape, _LABEL_FIELD), key=len, reverse=True))})'
+    rf'\.?\s*[:=]?\s*({_NUMBER})'
+)
+_PRODUCT_RE = re.compile(rf'({_NUMBER})(?:\s*{_UNIT})?(?:\s*[x×*]\s*({_NUMBER})(?:\s*{_UNIT})?)?'
+                         rf'(?:\s*[x×*]\s*({_NUMBER}))?')
+_UNIT_RE = re.compile(rf'\d\s*({_UNIT})')
+_SEGMENT_RE = re.compile(r'[(\[/]')
+DIMENSION_FIELDS = ('height', 'width', 'depth', 'dimension_unit')
+BATCH_SIZE = 1000
+
+
+def _number(text):
+    return float(text.replace(',', '.')) if text else None
+
+
+def _unit(text):
+    match = _UNIT_RE.search(text)
+    if not match:
+        return 'cm'
+    unit = match.group(1)
+    return 'in' if unit.startswith('in') or unit in ('"', 'zoll') else unit
+
+
+def dimension_fields(text):
+    empty = {'height': None, 'width': None, 'depth': None, 'dimension_unit': ''}
+    segment = _SEGMENT_RE.split(str(text or '').casefold().strip())[0]
+    if not re.search(r'\d', segment):
+        return empty
+    unit = _unit(segment)
+    values = {}
+    for label, number in _LABELLED_RE.findall(segment):
+        field = _LABEL_FIELD[label]
+        for name in (('height', 'width') if field == 'diameter' else (field,)):
+            values.setdefault(name, _number(number))
+    if not values:
+        segment = segment.split(';')[0]
+        if not re.search(r'\d', segment):
+            return empty
+        unit = _unit(segment)
+        match = _PRODUCT_RE.search(segment)
+        values = dict(zip(('height', 'width', 'depth'), map(_number, match.groups())))
+    sizes = {name: round(value * _UNIT_CM[unit], 2) if value else None for name, value in values.items()}
+    if not any(sizes.values()):
+        return empty
+    return {'height': sizes.get('height'), 'width': sizes.get('width'), 'depth': sizes.get('depth'),
+            'dimension_unit': unit}
+
+
+def backfill_dimensions(apps, schema_editor):
+    Artwork = apps.get_model('provenance', 'Artwork')
+    last = 0
+    while True:
+        rows = list(Artwork.objects.filter(pk__gt=last).exclude(dimension='').order_by('pk').values_list(
+            'pk', 'dimension',
+        )[:BATCH_SIZE])
+        if not rows:
+            break
+        Artwork.objects.bulk_update(
+            [Artwork(pk=pk, **dimension_fields(dimension)) for pk, dimension in rows], DIMENSION_FIELDS,
+        )
+        last = rows[-1][0]
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('provenance', '0037_artwork_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='depth',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='dimension_unit',
+            field=models.CharField(blank=True, editable=False, max_length=2),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='height',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='width',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['height'], name='artwork_height_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['width'], name='artwork_width_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['depth'], name='artwork_depth_idx'),
+        ),
+        migrations.RunPython(backfill_dimensions, migrations.RunPython.noop),
+    ]
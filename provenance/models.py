@@ -1,7 +1,16 @@
+import os
+import uuid
 from django.db import models
+from django.conf import settings
+from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from .dates import parse_year
+from .dimensions import DIMENSION_FIELDS, dimension_fields
+from .persons import name_key, phonetic_key
+from .sources import citation_fingerprint
 
 class Image(models.Model):
     image = models.ImageField(upload_to='images/')
@@ -12,6 +21,12 @@ class Image(models.Model):
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey('content_type', 'object_id')
 
+    class Meta:
+        indexes = [
+            # Every `images` lookup filters on both columns.
+            models.Index(fields=['content_type', 'object_id'], name='image_ct_object_idx'),
+        ]
+
     def __str__(self):
         return self.caption or f"Image {self.id}"
 
@@ -48,9 +63,26 @@ class Person(models.Model):
     birth_date = models.CharField(max_length=100, blank=True, null=True) # Changed to CharField to handle Excel dates
     death_date = models.CharField(max_length=100, blank=True, null=True)
     biography = models.TextField(blank=True)
+    # Matching keys, see provenance/persons.py.
+    name_key = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    phonetic_key = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
     
     images = GenericRelation(Image)
 
+    class Meta:
+        indexes = [
+            # Importers look persons up by (family_name, first_name).
+            models.Index(fields=['family_name', 'first_name'], name='person_name_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.name_key = name_key(self.family_name, self.first_name)
+        self.phonetic_key = phonetic_key(self.family_name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'family_name', 'first_name'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'name_key', 'phonetic_key'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.family_name}, {self.first_name}".strip(", ")
 
@@ -74,12 +106,35 @@ class Institution(models.Model):
 class Artwork(models.Model):
     name = models.CharField(max_length=255)
     dimension = models.CharField(max_length=255, blank=True)
+    # Parsed from `dimension` on save (provenance/dimensions.py), in cm;
+    # `dimension_unit` is the unit the dimension was written in.
+    height = models.FloatField(null=True, blank=True, editable=False)
+    width = models.FloatField(null=True, blank=True, editable=False)
+    depth = models.FloatField(null=True, blank=True, editable=False)
+    dimension_unit = models.CharField(max_length=2, blank=True, editable=False)
     medium = models.ForeignKey(Medium, on_delete=models.SET_NULL, null=True, blank=True, related_name='artworks')
     notes = models.TextField(blank=True)
     
     groups = models.ManyToManyField(ArtworkGroup, blank=True, related_name='artworks')
     images = GenericRelation(Image)
 
+    class Meta:
+        indexes = [
+            # Browse pages are ordered by name; lets LIMIT/OFFSET walk the index.
+            models.Index(fields=['name', 'id'], name='artwork_name_id_idx'),
+            models.Index(fields=['height'], name='artwork_height_idx'),
+            models.Index(fields=['width'], name='artwork_width_idx'),
+            models.Index(fields=['depth'], name='artwork_depth_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        for field, value in dimension_fields(self.dimension).items():
+            setattr(self, field, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'dimension' in update_fields:
+            kwargs['update_fields'] = {*update_fields, *DIMENSION_FIELDS}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -87,8 +142,25 @@ class Source(models.Model):
     source = models.CharField(max_length=500)
     type = models.CharField(max_length=255, blank=True)
     link = models.URLField(max_length=500, blank=True, null=True)
+    # SHA-1 of the normalized citation, see provenance/sources.py. Importers
+    # resolve citations through it; null only for rows loaded from fixtures
+    # until `deduplicate_sources()` runs.
+    fingerprint = models.CharField(max_length=40, unique=True, null=True, editable=False)
     images = GenericRelation(Image)
 
+    def clean(self):
+        super().clean()
+        duplicate = Source.objects.filter(fingerprint=citation_fingerprint(self.source)).exclude(pk=self.pk)
+        if duplicate.exists():
+            raise ValidationError({'source': "A source with this citation already exists."})
+
+    def save(self, *args, **kwargs):
+        self.fingerprint = citation_fingerprint(self.source)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'source' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'fingerprint'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.source[:200]
 
@@ -101,10 +173,13 @@ class ProvenanceEvent(models.Model):
         ('false', 'False / Disproven'),
     ]
 
-    artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='provenance_events')
+    # Indexed as the leading column of provevent_artwork_seq_idx.
+    artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='provenance_events', db_index=False)
     event_type = models.ForeignKey(EventType, on_delete=models.SET_NULL, null=True, blank=True, related_name='provenance_events')
     sequence_number = models.IntegerField(help_text="Order of events.")
     date = models.CharField(max_length=100, blank=True, help_text="Date as input type text")
+    # Year parsed from `date`, kept in sync by save(); used for date range filters and sorting.
+    year = models.SmallIntegerField(null=True, blank=True, editable=False)
     
     person = models.ForeignKey(Person, on_delete=models.SET_NULL, null=True, blank=True, related_name='provenance_events')
     institution = models.ForeignKey(Institution, on_delete=models.SET_NULL, null=True, blank=True, related_name='provenance_events')
@@ -124,18 +199,184 @@ class ProvenanceEvent(models.Model):
         if len(active_actors) > 1:
             raise ValidationError("Only one of Institution, Auction, or Exhibition can be set.")
 
+    def save(self, *args, **kwargs):
+        from .holdings import events_changed
+
+        self.year = parse_year(self.date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'date' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'year'}
+        artwork_ids = {self.artwork_id}
+        if self.pk:
+            # An event moved to another artwork also changes the old artwork's intervals.
+            artwork_ids.update(HoldingInterval.objects.filter(event_id=self.pk).values_list('artwork_id', flat=True))
+        super().save(*args, **kwargs)
+        events_changed(*artwork_ids)
+
+    def delete(self, *args, **kwargs):
+        from .holdings import events_changed
+
+        artwork_id = self.artwork_id
+        result = super().delete(*args, **kwargs)
+        events_changed(artwork_id)
+        return result
+
     class Meta:
         ordering = ['sequence_number']
+        indexes = [
+            # Chains are always read per artwork in sequence order.
+            models.Index(fields=['artwork', 'sequence_number'], name='provevent_artwork_seq_idx'),
+            # Event report filters (see provenance.event_report).
+            models.Index(fields=['event_type', 'year'], name='provevent_type_year_idx'),
+            models.Index(fields=['certainty', 'year'], name='provevent_certainty_year_idx'),
+            models.Index(fields=['year'], name='provevent_year_idx'),
+            # Artwork browse facets count distinct artworks per value.
+            models.Index(fields=['event_type', 'artwork'], name='provevent_type_artwork_idx'),
+            models.Index(fields=['certainty', 'artwork'], name='provevent_cert_artwork_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sequence_number}. {self.event_type} - {self.artwork}"
 
 
+class HoldingInterval(models.Model):
+    """
+    Who held an artwork from one dated event to the next, derived from the
+    provenance events by provenance/holdings.py. Never edited directly.
+    """
+    # Indexed as the leading column of holding_artwork_start_idx.
+    artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='holding_intervals', db_index=False)
+    event = models.OneToOneField(ProvenanceEvent, on_delete=models.CASCADE, related_name='holding_interval')
+    person = models.ForeignKey(Person, on_delete=models.SET_NULL, null=True, blank=True, related_name='holding_intervals', db_index=False)
+    institution = models.ForeignKey(Institution, on_delete=models.SET_NULL, null=True, blank=True, related_name='holding_intervals', db_index=False)
+    auction = models.ForeignKey('Auction', on_delete=models.SET_NULL, null=True, blank=True, related_name='holding_intervals', db_index=False)
+    exhibition = models.ForeignKey('Exhibition', on_delete=models.SET_NULL, null=True, blank=True, related_name='holding_intervals', db_index=False)
+    start = models.DateField()
+    # Exclusive; null while the artwork is still held.
+    end = models.DateField(null=True, blank=True)
+    certainty = models.CharField(max_length=20, choices=ProvenanceEvent.CERTAINTY_CHOICES, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Point and overlap queries: equality on the actor, range on start.
+            models.Index(fields=['artwork', 'start'], name='holding_artwork_start_idx'),
+            models.Index(fields=['person', 'start'], name='holding_person_start_idx'),
+            models.Index(fields=['institution', 'start'], name='holding_institution_start_idx'),
+            models.Index(fields=['auction', 'start'], name='holding_auction_start_idx'),
+            models.Index(fields=['exhibition', 'start'], name='holding_exhibition_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.artwork} {self.start} - {self.end or '...'}"
+
+
+class ImageHash(models.Model):
+    """
+    Perceptual hashes of an artwork image, computed by
+    provenance/image_hashes.py. Hashes are unsigned 64-bit values stored
+    signed; `band0`-`band3` split the pHash for multi-index lookups.
+    """
+    image = models.OneToOneField(Image, on_delete=models.CASCADE, related_name='image_hash')
+    artwork = models.ForeignKey('Artwork', on_delete=models.CASCADE, related_name='image_hashes')
+    # Image file the hashes were computed from; a replaced file is rehashed.
+    file = models.CharField(max_length=255)
+    ahash = models.BigIntegerField()
+    dhash = models.BigIntegerField()
+    phash = models.BigIntegerField()
+    band0 = models.PositiveIntegerField()
+    band1 = models.PositiveIntegerField()
+    band2 = models.PositiveIntegerField()
+    band3 = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['band0'], name='imagehash_band0_idx'),
+            models.Index(fields=['band1'], name='imagehash_band1_idx'),
+            models.Index(fields=['band2'], name='imagehash_band2_idx'),
+            models.Index(fields=['band3'], name='imagehash_band3_idx'),
+        ]
+
+    def __str__(self):
+        return f"Hashes of {self.image}"
+
+
+class ArtworkSignature(models.Model):
+    """
+    Fingerprint of the metadata tokens an artwork's `ArtworkBucket` rows
+    were computed from (provenance/artwork_matching.py); artworks whose
+    tokens no longer match it are rebucketed.
+    """
+    artwork = models.OneToOneField('Artwork', on_delete=models.CASCADE, related_name='signature')
+    fingerprint = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"Signature of {self.artwork}"
+
+
+class ArtworkBucket(models.Model):
+    """One LSH bucket of an artwork's MinHash signature."""
+    artwork = models.ForeignKey('Artwork', on_delete=models.CASCADE, related_name='buckets')
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bucket'], name='artworkbucket_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"Bucket {self.bucket} of {self.artwork}"
+
+
+class ActorCentrality(models.Model):
+    """
+    Centrality of an actor in the transfer network, computed by the
+    `compute_centrality` job (provenance/network.py). Never edited directly.
+    """
+    ACTOR_TYPE_CHOICES = [
+        ('person', 'Person'),
+        ('institution', 'Institution'),
+        ('auction', 'Auction'),
+        ('exhibition', 'Exhibition'),
+    ]
+
+    actor_type = models.CharField(max_length=20, choices=ACTOR_TYPE_CHOICES)
+    actor_id = models.PositiveIntegerField()
+    in_degree = models.PositiveIntegerField(default=0)
+    out_degree = models.PositiveIntegerField(default=0)
+    degree = models.PositiveIntegerField(default=0)
+    betweenness = models.FloatField(default=0)
+    pagerank = models.FloatField(default=0)
+    # network.network_version() the metrics were computed at.
+    data_version = models.PositiveBigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['actor_type', 'actor_id'], name='centrality_actor_unique'),
+        ]
+        indexes = [
+            # Top-N lists and ranks per metric.
+            models.Index(fields=['-degree'], name='centrality_degree_idx'),
+            models.Index(fields=['-in_degree'], name='centrality_in_degree_idx'),
+            models.Index(fields=['-out_degree'], name='centrality_out_degree_idx'),
+            models.Index(fields=['-betweenness'], name='centrality_betweenness_idx'),
+            models.Index(fields=['-pagerank'], name='centrality_pagerank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_type} {self.actor_id}"
+
+
 class ProvenanceEventSource(models.Model):
     event = models.ForeignKey(ProvenanceEvent, on_delete=models.CASCADE)
     source = models.ForeignKey(Source, on_delete=models.CASCADE)
     notes = models.CharField(max_length=100, blank=True)
 
+    class Meta:
+        indexes = [
+            # Lets the source filter resolve event ids from the index alone.
+            models.Index(fields=['source', 'event'], name='provevsource_source_event_idx'),
+        ]
+
     def __str__(self):
         return f"{self.source} for {self.event}"
 
@@ -165,6 +406,11 @@ class Auction(models.Model):
     sources = models.ManyToManyField(Source, blank=True, related_name='auctions')
     images = GenericRelation(Image)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'date'], name='auction_name_date_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -191,5 +437,129 @@ class Exhibition(models.Model):
     sources = models.ManyToManyField(Source, blank=True, related_name='exhibitions')
     images = GenericRelation(Image)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'date_start'], name='exhibition_name_start_idx'),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class DataVersion(models.Model):
+    """
+    Change counter of one model, see provenance/versions.py. Bookkeeping,
+    kept on reset.
+    """
+    model = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.model} v{self.version}"
+
+
+class JobFileStorage(FileSystemStorage):
+    # Job artifacts (exports, dumps, uploads) live outside MEDIA_ROOT so they
+    # are never served publicly by nginx, only through the job download view.
+    @property
+    def base_location(self):
+        return settings.JOB_FILES_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+def job_file_storage():
+    return JobFileStorage()
+
+class Job(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=100)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent done (0-100).")
+    message = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    result_file = models.FileField(upload_to='results/', storage=job_file_storage, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='provenance_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Renewed by every progress report; see jobs.fail_stale_jobs.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+    def set_progress(self, done, total=None, message=None):
+        """
+        Stores progress without touching the other columns, so it is safe to call
+        from inside a running task. `done`/`total` are converted to a percentage.
+        Also renews the job's heartbeat.
+        """
+        percent = done if total is None else int(done * 100 / total) if total else 100
+        self.progress = max(0, min(100, percent))
+        self.heartbeat_at = timezone.now()
+        update = {'progress': self.progress, 'heartbeat_at': self.heartbeat_at}
+        if message is not None:
+            self.message = message[:255]
+            update['message'] = self.message
+        Job.objects.filter(pk=self.pk).update(**update)
+
+    def __str__(self):
+        return f"{self.kind} ({self.get_status_display()})"
+
+class Upload(models.Model):
+    """
+    A resumable chunked upload. Chunks are written to job storage as they
+    arrive (see provenance/uploads.py) and assembled by the job that consumes
+    the upload.
+    """
+    PURPOSE_DB_SYNC = 'db_sync'
+    PURPOSE_IMAGES = 'images'
+    PURPOSE_CHOICES = [
+        (PURPOSE_DB_SYNC, 'Database dump'),
+        (PURPOSE_IMAGES, 'Image archive'),
+    ]
+    STATUS_PENDING = 'pending'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField(help_text="Total size in bytes.")
+    chunk_size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256 of the whole file (optional).")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='provenance_uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
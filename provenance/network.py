@@ -0,0 +1,239 @@
+"""
+Actor centrality over the transfer network.
+
+Every artwork's chain of events links consecutive holders: an edge runs from
+the actor of one event to the actor of the next (weighted by the number of
+such transfers). The actor of an event is its person, else its institution,
+else the house of its auction or exhibition, else the auction or exhibition
+itself; events without an actor and disproven events are left out.
+
+Three metrics are computed with scipy.sparse on the whole graph at once:
+
+- `in_degree`/`out_degree`/`degree`: transfers received, passed on, both;
+- `pagerank`: weighted PageRank by power iteration;
+- `betweenness`: share of shortest transfer paths (hops) through the actor,
+  by Brandes' algorithm run for a batch of sources at a time as sparse
+  matrix products. Beyond BETWEENNESS_SAMPLES actors it is estimated from
+  that many random sources.
+
+The computation runs as the `compute_centrality` job and its results are
+stored in `ActorCentrality` together with the data version they were read
+at, so the API can tell when they are stale and queue a new run.
+"""
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .versions import data_versions
+
+# Node types, in order of precedence for an event's actor.
+ACTOR_TYPES = ('person', 'institution', 'auction', 'exhibition')
+METRICS = ('degree', 'in_degree', 'out_degree', 'betweenness', 'pagerank')
+
+# Models the network is derived from; see `network_version()`. Deleting a
+# person or institution counts as a change of the events (and auctions and
+# exhibitions) it is cleared from, see provenance.versions.
+NETWORK_MODELS = ('provenance.provenanceevent', 'provenance.auction', 'provenance.exhibition')
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-10
+PAGERANK_MAX_ITERATIONS = 200
+
+BETWEENNESS_SAMPLES = 500
+# Dense cells (sources x actors) per Brandes batch, bounds the memory used.
+BETWEENNESS_BATCH_CELLS = 2 ** 22
+
+STORE_BATCH_SIZE = 1000
+
+# Node key: id * len(ACTOR_TYPES) + type code.
+_TYPES = len(ACTOR_TYPES)
+
+
+def network_version(versions=None):
+    """
+    A number that grows whenever a model the network is derived from
+    changes (the sum of their counters, which only ever increase).
+    """
+    versions = versions if versions is not None else data_versions()
+    return sum(versions[model] for model in NETWORK_MODELS)
+
+
+# ProvenanceEvent columns `event_actor()` reads.
+EVENT_ACTOR_COLUMNS = (
+    'person_id', 'institution_id', 'auction__institution_id', 'exhibition__institution_id', 'auction_id',
+    'exhibition_id',
+)
+
+
+def event_actor(person, institution, auction_house, exhibition_house, auction, exhibition):
+    """(actor type, id) of an event from its EVENT_ACTOR_COLUMNS, or None."""
+    for actor_type, actor in (
+        ('person', person), ('institution', institution or auction_house or exhibition_house),
+        ('auction', auction), ('exhibition', exhibition),
+    ):
+        if actor:
+            return actor_type, actor
+    return None
+
+
+def _event_actors():
+    """(artwork ids, node keys) of the events with an actor, in chain order."""
+    from .models import ProvenanceEvent
+
+    rows = ProvenanceEvent.objects.exclude(certainty='false').order_by('artwork_id', 'sequence_number', 'pk')
+    artworks, keys = [], []
+    for artwork_id, *columns in rows.values_list('artwork_id', *EVENT_ACTOR_COLUMNS).iterator(chunk_size=5000):
+        actor = event_actor(*columns)
+        if actor:
+            artworks.append(artwork_id)
+            keys.append(actor[1] * _TYPES + ACTOR_TYPES.index(actor[0]))
+    return np.array(artworks, dtype=np.int64), np.array(keys, dtype=np.int64)
+
+
+def transfer_graph(artworks, keys):
+    """
+    The transfer network of events given as aligned (artwork id, node key)
+    arrays in chain order: (node keys, n x n CSR matrix of transfer counts).
+    """
+    nodes, index = np.unique(keys, return_inverse=True)
+    same_chain = artworks[1:] == artworks[:-1]
+    src, dst = index[:-1][same_chain], index[1:][same_chain]
+    moved = src != dst
+    graph = sparse.csr_matrix(
+        (np.ones(int(moved.sum())), (src[moved], dst[moved])), shape=(len(nodes), len(nodes)),
+    )
+    graph.sum_duplicates()
+    return nodes, graph
+
+
+def pagerank(graph, damping=PAGERANK_DAMPING):
+    """PageRank of a weighted CSR graph; dangling actors link to everyone."""
+    n = graph.shape[0]
+    if not n:
+        return np.zeros(0)
+    out = np.asarray(graph.sum(axis=1)).ravel()
+    dangling = out == 0
+    transition = sparse.diags(np.where(dangling, 0, 1 / np.where(dangling, 1, out))) @ graph
+    transition_t = transition.T.tocsr()
+    rank = np.full(n, 1 / n)
+    for _ in range(PAGERANK_MAX_ITERATIONS):
+        previous = rank
+        rank = damping * (transition_t @ rank) + (damping * rank[dangling].sum() + 1 - damping) / n
+        if np.abs(rank - previous).sum() < PAGERANK_TOLERANCE:
+            break
+    return rank
+
+
+def betweenness(graph, samples=BETWEENNESS_SAMPLES, seed=0, progress=None):
+    """
+    Normalized betweenness of the actors of a CSR graph, counting hops
+    (transfer counts do not shorten paths). Exact up to `samples` actors,
+    estimated from `samples` random sources beyond.
+    """
+    n = graph.shape[0]
+    result = np.zeros(n)
+    if n < 3:
+        return result
+    adjacency = (graph > 0).astype(np.float64).tocsr()
+    adjacency_t = adjacency.T.tocsr()
+    if n <= samples:
+        sources = np.arange(n)
+    else:
+        sources = np.sort(np.random.default_rng(seed).choice(n, samples, replace=False))
+    batch = max(1, min(len(sources), BETWEENNESS_BATCH_CELLS // n))
+
+    for first in range(0, len(sources), batch):
+        chunk = sources[first:first + batch]
+        k = len(chunk)
+        rows = np.arange(k)
+        # sigma: shortest paths from each source; levels: (rows, cols) of the
+        # actors first reached at each depth.
+        sigma = np.zeros((k, n))
+        sigma[rows, chunk] = 1
+        visited = sigma > 0
+        levels = [(rows, chunk)]
+        frontier = sparse.csr_matrix((np.ones(k), (rows, chunk)), shape=(k, n))
+        while True:
+            reached = (frontier @ adjacency).tocoo()
+            new = ~visited[reached.row, reached.col]
+            r, c, paths = reached.row[new], reached.col[new], reached.data[new]
+            if not len(r):
+                break
+            sigma[r, c] = paths
+            visited[r, c] = True
+            levels.append((r, c))
+            frontier = sparse.csr_matrix((paths, (r, c)), shape=(k, n))
+
+        # Dependencies, accumulated from the deepest level back to the sources.
+        delta = np.zeros((k, n))
+        for depth in range(len(levels) - 1, 0, -1):
+            r, c = levels[depth]
+            weights = sparse.csr_matrix(((1 + delta[r, c]) / sigma[r, c], (r, c)), shape=(k, n))
+            pr, pc = levels[depth - 1]
+            parents = sparse.csr_matrix((np.ones(len(pr)), (pr, pc)), shape=(k, n))
+            back = (weights @ adjacency_t).multiply(parents).tocoo()
+            delta[back.row, back.col] += sigma[back.row, back.col] * back.data
+        delta[rows, chunk] = 0
+        result += delta.sum(axis=0)
+        if progress:
+            progress(first + k, len(sources))
+
+    return result * (n / len(sources)) / ((n - 1) * (n - 2))
+
+
+def centrality(artworks, keys, progress=None):
+    """Node keys and {metric: array} for events given as in `transfer_graph()`."""
+    nodes, graph = transfer_graph(artworks, keys)
+    in_degree = np.asarray(graph.sum(axis=0)).ravel().astype(np.int64)
+    out_degree = np.asarray(graph.sum(axis=1)).ravel().astype(np.int64)
+    return nodes, {
+        'in_degree': in_degree,
+        'out_degree': out_degree,
+        'degree': in_degree + out_degree,
+        'pagerank': pagerank(graph),
+        'betweenness': betweenness(graph, progress=progress),
+    }
+
+
+def compute_centrality(progress=None):
+    """
+    Recomputes and stores the centrality of every actor. Returns
+    {'actors', 'transfers', 'data_version'}.
+    """
+    from .models import ActorCentrality
+
+    version = network_version()
+    artworks, keys = _event_actors()
+    nodes, metrics = centrality(artworks, keys, progress=progress)
+    with transaction.atomic():
+        ActorCentrality.objects.all().delete()
+        for first in range(0, len(nodes), STORE_BATCH_SIZE):
+            ActorCentrality.objects.bulk_create(
+                ActorCentrality(
+                    actor_type=ACTOR_TYPES[key % _TYPES], actor_id=key // _TYPES, data_version=version,
+                    **{metric: values[n].item() for metric, values in metrics.items()},
+                )
+                for n, key in enumerate(nodes[first:first + STORE_BATCH_SIZE].tolist(), start=first)
+            )
+    return {'actors': len(nodes), 'transfers': int(metrics['in_degree'].sum()), 'data_version': version}
+
+
+def actor_names(actors):
+    """{(actor type, id): name} for `actors`; one query per actor type present."""
+    from .models import Auction, Exhibition, Institution, Person
+    from .serializers import person_name
+
+    ids = {}
+    for actor_type, actor_id in actors:
+        ids.setdefault(actor_type, set()).add(actor_id)
+    names = {}
+    if 'person' in ids:
+        for pk, family_name, first_name in Person.objects.filter(pk__in=ids['person']).values_list(
+            'pk', 'family_name', 'first_name',
+        ):
+            names[('person', pk)] = person_name(family_name, first_name)
+    for actor_type, model in (('institution', Institution), ('auction', Auction), ('exhibition', Exhibition)):
+        if actor_type in ids:
+            for pk, name in model.objects.filter(pk__in=ids[actor_type]).values_list('pk', 'name'):
+                names[(actor_type, pk)] = name
+    return names
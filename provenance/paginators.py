@@ -0,0 +1,45 @@
+import json
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Below this many (estimated) rows an exact COUNT(*) is cheap enough.
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def estimated_count(queryset):
+    """
+    Returns the planner's row estimate for `queryset` on PostgreSQL, or None
+    on other backends. This is read from EXPLAIN and costs no table scan.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids `COUNT(*)` on large result sets. When the planner
+    estimates more than EXACT_COUNT_THRESHOLD rows the estimate is used as the
+    count; smaller results (and non-PostgreSQL databases) are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        object_list = self.object_list
+        if hasattr(object_list, 'query'):
+            estimate = estimated_count(object_list.order_by())
+            if estimate is not None and estimate > EXACT_COUNT_THRESHOLD:
+                return estimate
+        return super().count
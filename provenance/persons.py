@@ -0,0 +1,391 @@
+"""
+Person matching and deduplication.
+
+Names are compared through two keys that `Person.save()` stores:
+`name_key` (family and first name normalized: case folded, umlauts spelled
+out, accents and punctuation dropped) and `phonetic_key` (the Kölner
+Phonetik code of the family name, which maps spelling variants such as
+"Meyer"/"Meier" or "Schmitt"/"Schmidt" to the same digits).
+
+Duplicate detection never compares all pairs: persons are grouped into
+blocks that share a phonetic key or the same set of name tokens, and only
+pairs within a block are scored on name similarity, life dates and shared
+artworks. Confirmed duplicates are merged with a few set-wise UPDATEs.
+"""
+import unicodedata
+from collections import namedtuple
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from .dates import parse_year
+from .versions import bump_data_version
+
+# Pairs scoring at least this much are reported as duplicates.
+MATCH_THRESHOLD = 0.85
+
+# Duplicates repointed per UPDATE statement.
+MERGE_BATCH_SIZE = 500
+
+_SPELLED_OUT = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+Candidate = namedtuple('Candidate', ['person_id', 'other_id', 'score'])
+
+# Normalized family and first name, birth and death year (or None).
+Profile = namedtuple('Profile', ['family', 'first', 'birth', 'death'])
+
+
+def normalize_name(text):
+    """'Müller-Lüdenscheidt ' -> 'mueller luedenscheidt'"""
+    text = str(text or '').casefold().translate(_SPELLED_OUT)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c if c.isalpha() else ' ' for c in text if not unicodedata.combining(c))
+    return ' '.join(text.split())
+
+
+def cologne_phonetic(text):
+    """The Kölner Phonetik code of `text`, e.g. 'Müller-Lüdenscheidt' -> '65752682'."""
+    word = ''.join(c for c in normalize_name(text).upper() if 'A' <= c <= 'Z')
+    codes = []
+    for i, char in enumerate(word):
+        prev = word[i - 1] if i else '#'
+        next_ = word[i + 1] if i + 1 < len(word) else '#'
+        if char in 'AEIJOUY':
+            code = '0'
+        elif char == 'H':
+            continue
+        elif char == 'B':
+            code = '1'
+        elif char == 'P':
+            code = '3' if next_ == 'H' else '1'
+        elif char in 'DT':
+            code = '8' if next_ in 'CSZ' else '2'
+        elif char in 'FVW':
+            code = '3'
+        elif char in 'GKQ':
+            code = '4'
+        elif char == 'C':
+            if i == 0:
+                code = '4' if next_ in 'AHKLOQRUX' else '8'
+            else:
+                code = '4' if next_ in 'AHKOQUX' and prev not in 'SZ' else '8'
+        elif char == 'X':
+            code = '8' if prev in 'CKQ' else '48'
+        elif char == 'L':
+            code = '5'
+        elif char in 'MN':
+            code = '6'
+        elif char == 'R':
+            code = '7'
+        else:  # S, Z
+            code = '8'
+        codes.append(code)
+
+    collapsed = []
+    for code in ''.join(codes):
+        if not collapsed or collapsed[-1] != code:
+            collapsed.append(code)
+    return ''.join(code for i, code in enumerate(collapsed) if code != '0' or i == 0)
+
+
+def name_key(family_name, first_name):
+    return f"{normalize_name(family_name)}|{normalize_name(first_name)}"[:255]
+
+
+def phonetic_key(family_name):
+    return cologne_phonetic(family_name)[:64]
+
+
+def split_name(text):
+    """'Cassirer, Paul' -> ('Cassirer', 'Paul'); 'Cassirer' -> ('Cassirer', '')"""
+    family_name, _, first_name = str(text).partition(',')
+    return family_name.strip(), first_name.strip()
+
+
+@lru_cache(maxsize=100000)
+def _ratio(a, b):
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _first_name_similarity(a, b):
+    if not a or not b:
+        return 0.7  # unknown, neither for nor against
+    if len(a) == 1 or len(b) == 1:
+        return 0.9 if a[0] == b[0] else 0.0
+    return _ratio(a, b)
+
+
+def _swapped(a, b):
+    """Family and first name swapped on entry ("Paul, Cassirer")."""
+    return bool(a.first and b.first) and (a.family == b.first or a.first == b.family)
+
+
+def _name_similarity(a, b):
+    similarity = 0.6 * _ratio(a.family, b.family) + 0.4 * _first_name_similarity(a.first, b.first)
+    if _swapped(a, b):
+        similarity = max(similarity, 0.6 * _ratio(a.family, b.first) + 0.4 * _ratio(a.first, b.family))
+    return similarity
+
+
+def _may_reach(a, b, floor):
+    """
+    Cheap upper bound check of score_pair(a, b) >= floor: the family name
+    ratio can be no higher than what the two lengths allow.
+    """
+    if _swapped(a, b):
+        return True
+    length = len(a.family) + len(b.family)
+    family_bound = 2 * min(len(a.family), len(b.family)) / length if length else 1.0
+    return 0.6 * family_bound + 0.4 * _first_name_similarity(a.first, b.first) + _date_adjustment(a, b) >= floor
+
+
+def _date_adjustment(a, b):
+    adjustment = 0.0
+    for year_a, year_b in ((a.birth, b.birth), (a.death, b.death)):
+        if year_a is not None and year_b is not None:
+            adjustment += 0.1 if abs(year_a - year_b) <= 1 else -0.3
+    return adjustment
+
+
+def score_pair(a, b, shared_artworks=0):
+    """
+    Scores two persons given as Profiles. Names carry the score; matching
+    life dates and shared artworks add to it, conflicting dates subtract.
+    """
+    score = _name_similarity(a, b) + _date_adjustment(a, b)
+    if shared_artworks:
+        score += 0.1
+    return round(max(0.0, min(score, 1.0)), 3)
+
+
+def _profile(family_name, first_name, birth_date=None, death_date=None):
+    return Profile(normalize_name(family_name), normalize_name(first_name), parse_year(birth_date), parse_year(death_date))
+
+
+def _blocks(profiles):
+    """
+    Yields lists of person ids that may be duplicates of each other:
+    persons whose family names share a phonetic code and whose first names
+    start with the same phonetic class ("Carl"/"Karl", "P."/"Paul"; persons
+    without first name join every class), and persons with the same set of
+    name tokens (family and first name swapped).
+    """
+    phonetic, tokens = {}, {}
+    for pk, profile in profiles.items():
+        first_class = cologne_phonetic(profile.first)[:1]
+        phonetic.setdefault(cologne_phonetic(profile.family), {}).setdefault(first_class, []).append(pk)
+        tokens.setdefault(tuple(sorted(f"{profile.family} {profile.first}".split())), []).append(pk)
+
+    for by_first in phonetic.values():
+        unknown = by_first.pop('', [])
+        if not by_first:
+            yield unknown
+        for pks in by_first.values():
+            yield pks + unknown
+    yield from tokens.values()
+
+
+def _artworks_by_person(person_ids):
+    from .models import ProvenanceEvent
+
+    artworks = {}
+    person_ids = list(person_ids)
+    for start in range(0, len(person_ids), MERGE_BATCH_SIZE):
+        rows = (
+            ProvenanceEvent.objects.filter(person_id__in=person_ids[start:start + MERGE_BATCH_SIZE])
+            .values_list('person_id', 'artwork_id').distinct().order_by()
+        )
+        for person_id, artwork_id in rows:
+            artworks.setdefault(person_id, set()).add(artwork_id)
+    return artworks
+
+
+def find_duplicate_persons(queryset=None, threshold=MATCH_THRESHOLD):
+    """
+    Candidate duplicate pairs among `queryset` (all persons by default),
+    best first. Persons with identical names and life dates are scored once
+    and reported as pairs with the lowest id among them. Costs one query
+    for the persons plus one per MERGE_BATCH_SIZE candidates for their
+    artworks.
+    """
+    from .models import Person
+
+    queryset = Person.objects.all() if queryset is None else queryset
+    members = {}
+    for pk, *names in queryset.values_list('pk', 'family_name', 'first_name', 'birth_date', 'death_date').iterator():
+        members.setdefault(_profile(*names), []).append(pk)
+    groups = {min(pks): pks for pks in members.values()}
+    profiles = {pk: profile for profile, pks in members.items() for pk in pks if pk in groups}
+
+    scored = {}
+    for profile, pks in members.items():
+        first = min(pks)
+        for pk in pks:
+            if pk != first:
+                scored[first, pk] = score_pair(profile, profile)
+
+    # Shared artworks can add at most 0.1, so only pairs close to the
+    # threshold on names and dates need their events. Pairs that cannot get
+    # there (different name lengths, first names, conflicting life dates)
+    # are skipped before comparing the family names.
+    floor = threshold - 0.1
+    near = {}
+    for block in _blocks(profiles):
+        block = sorted(block)
+        for i, pk in enumerate(block):
+            for other in block[i + 1:]:
+                if (pk, other) not in near and _may_reach(profiles[pk], profiles[other], floor):
+                    score = score_pair(profiles[pk], profiles[other])
+                    if score >= floor:
+                        near[pk, other] = score
+
+    artworks = _artworks_by_person({member for pair in near for pk in pair for member in groups[pk]})
+
+    def group_artworks(pk):
+        return set().union(*(artworks.get(member, ()) for member in groups[pk]))
+
+    for (pk, other), score in near.items():
+        if score < threshold and group_artworks(pk) & group_artworks(other):
+            score = score_pair(profiles[pk], profiles[other], shared_artworks=1)
+        scored[pk, other] = score
+    candidates = [Candidate(pk, other, score) for (pk, other), score in scored.items() if score >= threshold]
+    return sorted(candidates, key=lambda c: (-c.score, c.person_id, c.other_id))
+
+
+def match_persons(names, create=False, threshold=MATCH_THRESHOLD):
+    """
+    Resolves "Family, First" strings (as found in the import sheets) to
+    persons: exact normalized names first, then the best scoring person with
+    the same phonetic key. Ambiguous names (several equally good matches)
+    stay unresolved. With `create`, unresolved names become new persons.
+    Returns {name: Person or None} in a fixed number of queries.
+    """
+    from .models import Person
+
+    wanted = {text: split_name(text) for text in names if text is not None and str(text).strip()}
+    keys = {text: name_key(*parts) for text, parts in wanted.items()}
+
+    by_key = {}
+    for person in Person.objects.filter(name_key__in=set(keys.values())).order_by('pk'):
+        by_key.setdefault(person.name_key, person)
+    result = {text: by_key.get(key) for text, key in keys.items()}
+
+    unresolved = [text for text, person in result.items() if person is None]
+    phonetic = {}
+    if unresolved:
+        codes = {phonetic_key(wanted[text][0]) for text in unresolved}
+        for person in Person.objects.filter(phonetic_key__in=codes).order_by('pk'):
+            phonetic.setdefault(person.phonetic_key, []).append(person)
+    for text in unresolved:
+        profile = _profile(*wanted[text])
+        scores = sorted(
+            ((score_pair(profile, _profile(p.family_name, p.first_name)), p)
+             for p in phonetic.get(phonetic_key(wanted[text][0]), [])),
+            key=lambda item: -item[0],
+        )
+        if scores and scores[0][0] >= threshold and (len(scores) == 1 or scores[1][0] < scores[0][0]):
+            result[text] = scores[0][1]
+
+    if create:
+        new = {}
+        for text, person in result.items():
+            if person is None:
+                family_name, first_name = wanted[text]
+                new.setdefault(keys[text], Person(
+                    family_name=family_name, first_name=first_name,
+                    name_key=keys[text], phonetic_key=phonetic_key(family_name),
+                ))
+        Person.objects.bulk_create(new.values())
+        if new:
+            bump_data_version(Person)
+        for text, person in result.items():
+            if person is None:
+                result[text] = new[keys[text]]
+    return result
+
+
+def _survivors(pairs):
+    """Maps every merged person id to the lowest id of its duplicate group."""
+    parent = {}
+
+    def find(pk):
+        parent.setdefault(pk, pk)
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    return {pk: find(pk) for pk in list(parent) if find(pk) != pk}
+
+
+def _repoint(queryset, column, survivor_of):
+    """UPDATE ... SET column = CASE column WHEN <duplicate> THEN <survivor> ... in batches."""
+    duplicates = list(survivor_of)
+    for start in range(0, len(duplicates), MERGE_BATCH_SIZE):
+        batch = duplicates[start:start + MERGE_BATCH_SIZE]
+        queryset.filter(**{f'{column}__in': batch}).update(**{
+            column: Case(*(When(**{column: pk}, then=Value(survivor_of[pk])) for pk in batch)),
+        })
+
+
+def merge_persons(pairs):
+    """
+    Merges confirmed duplicate pairs `(person_id, other_id)`. Each group of
+    linked persons collapses into its lowest id: provenance events, holding
+    intervals, auction roles and images are repointed set-wise, blank fields
+    of the survivor are filled from the duplicates, and the duplicates are
+    deleted.
+    Returns the number of persons merged away.
+    """
+    from .models import AuctionPerson, HoldingInterval, Image, Person, ProvenanceEvent
+
+    survivor_of = _survivors(pairs)
+    if not survivor_of:
+        return 0
+    with transaction.atomic():
+        _repoint(ProvenanceEvent.objects.all(), 'person_id', survivor_of)
+        _repoint(HoldingInterval.objects.all(), 'person_id', survivor_of)
+
+        # A survivor holding the same role at the same auction keeps just one row.
+        roles = set(
+            AuctionPerson.objects.filter(person_id__in=set(survivor_of.values()))
+            .values_list('auction_id', 'person_id', 'role')
+        )
+        dropped = []
+        for pk, auction_id, person_id, role in (
+            AuctionPerson.objects.filter(person_id__in=list(survivor_of)).order_by('pk')
+            .values_list('pk', 'auction_id', 'person_id', 'role')
+        ):
+            key = (auction_id, survivor_of[person_id], role)
+            if key in roles:
+                dropped.append(pk)
+            roles.add(key)
+        AuctionPerson.objects.filter(pk__in=dropped).delete()
+        _repoint(AuctionPerson.objects.all(), 'person_id', survivor_of)
+
+        _repoint(Image.objects.filter(content_type=ContentType.objects.get_for_model(Person)), 'object_id', survivor_of)
+
+        persons = Person.objects.in_bulk({*survivor_of, *survivor_of.values()})
+        changed = {}
+        for pk in sorted(survivor_of):
+            survivor, duplicate = persons[survivor_of[pk]], persons[pk]
+            for field in ('first_name', 'birth_date', 'death_date', 'biography'):
+                if not getattr(survivor, field) and getattr(duplicate, field):
+                    setattr(survivor, field, getattr(duplicate, field))
+                    changed[survivor.pk] = survivor
+        for survivor in changed.values():
+            survivor.name_key = name_key(survivor.family_name, survivor.first_name)
+        Person.objects.bulk_update(
+            changed.values(), ['first_name', 'birth_date', 'death_date', 'biography', 'name_key'],
+            batch_size=MERGE_BATCH_SIZE,
+        )
+        Person.objects.filter(pk__in=list(survivor_of)).delete()
+        bump_data_version(Person, ProvenanceEvent)
+    return len(survivor_of)
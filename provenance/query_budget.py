@@ -0,0 +1,116 @@
+"""
+Query budgets: the most database queries an API endpoint or a management
+command may run. A budget is a constant; list views must not issue more
+queries as the data grows, so N+1 patterns exceed it as soon as the fixture
+is large enough.
+
+The budgets are enforced by `QueryBudgetTest`, which runs every endpoint and
+command over fixtures of several sizes. In production `QueryBudgetMiddleware`
+can log a warning for requests over budget (set QUERY_BUDGET_WARNINGS=True).
+"""
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# URL name -> maximum queries per request. Django's content type cache adds
+# one query to the first request that serializes images; it is included.
+ENDPOINT_BUDGETS = {
+    'artwork-list': 3,
+    'artwork-detail': 4,
+    'artwork-batch': 4,
+    'artwork-browse': 10,
+    'artwork-similar': 3,
+    'find-possible-matches': 3,  # session, user, queued job
+    'artwork-suggestions': 7,
+    'artwork-similar-histories': 4,
+    'align-histories': 3,  # session, user, queued job
+    'person-list': 3,
+    'person-detail': 3,
+    'person-batch': 4,
+    'event-type-list': 1,
+    'art-type-list': 1,
+    'medium-list': 1,
+    'institution-list': 5,
+    'auction-list': 3,
+    'exhibition-list': 3,
+    'source-list': 3,
+    'event-report': 10,
+    'export-event-report': 3,  # session, user, queued job
+    'holding-list': 1,
+    'holding-gaps': 2,
+    'export-holding-gaps': 2,
+    # Cold cache: the version check plus loading every table; 1 once warm.
+    'analytics': 11,
+    'network-export': 8,  # one streamed query per node type and edge kind
+    # Includes reading the latest refresh job when the metrics are stale.
+    'centrality-list': 5,
+    'centrality-detail': 7,
+    'centrality-refresh': 8,  # session, user, locked versions, network version, latest job, queued job
+}
+
+# Management command -> maximum queries per run.
+COMMAND_BUDGETS = {
+    'clear_provenance_data': 29,
+    'normalize_dates': 16,  # a read and one UPDATE batch per date field
+    'dedupe_persons': 3,
+    'rebuild_holdings': 5,
+    'find_possible_matches': 5,
+    'backfill_dimensions': 1,
+    'suggest_artwork_matches': 15,  # rebuckets and scores the changed artworks in id batches
+}
+
+
+class QueryCounter:
+    """`connection.execute_wrapper` that counts the statements it sees."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries(using='default'):
+    """
+    Counts the queries run inside the block. Unlike CaptureQueriesContext
+    this works with DEBUG off.
+    """
+    counter = QueryCounter()
+    with connections[using].execute_wrapper(counter):
+        yield counter
+
+
+def endpoint_budget(request):
+    """The budget of the URL pattern that served `request`, or None."""
+    match = getattr(request, 'resolver_match', None)
+    return ENDPOINT_BUDGETS.get(match.url_name) if match else None
+
+
+class QueryBudgetMiddleware:
+    """
+    Logs a warning when a request runs more queries than its endpoint's
+    budget. Does nothing unless QUERY_BUDGET_WARNINGS is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_BUDGET_WARNINGS', False)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        with count_queries() as counter:
+            response = self.get_response(request)
+        budget = endpoint_budget(request)
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                "%s %s ran %d queries, budget is %d",
+                request.method, request.path, counter.count, budget,
+            )
+        return response
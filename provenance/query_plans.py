@@ -0,0 +1,42 @@
+"""
+Query plan inspection used by the index regression tests.
+
+`full_scans()` runs EXPLAIN on a captured SQL statement and returns the
+tables from `tables` that the planner reads sequentially. Both SQLite
+(`EXPLAIN QUERY PLAN`) and PostgreSQL (`EXPLAIN`) plans are understood.
+"""
+import re
+
+
+def explain(connection, sql):
+    """The plan lines of `sql`, which must already have its parameters inlined."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN {sql}')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _scanned_table(connection, line):
+    if connection.vendor == 'sqlite':
+        # "SCAN provenance_artwork" is a full scan; "SCAN t USING INDEX i"
+        # walks an index in order and "SEARCH ..." is a keyed lookup.
+        match = re.search(r'\bSCAN (\w+)(?: AS \w+)?(.*)$', line)
+        if match and 'USING' not in match.group(2):
+            return match.group(1)
+        return None
+    match = re.search(r'Seq Scan on (\w+)', line)
+    return match.group(1) if match else None
+
+
+def _aliases(sql):
+    # Subqueries name their tables `"provenance_artwork" U0`; plans show the alias.
+    return {alias: table for table, alias in re.findall(r'"(\w+)" (?:AS )?([A-Z]\d+)\b', sql)}
+
+
+def full_scans(connection, sql, tables):
+    """The tables of `tables` that `sql` reads with a sequential scan."""
+    aliases = _aliases(sql)
+    scanned = (_scanned_table(connection, line) for line in explain(connection, sql))
+    return sorted({aliases.get(name, name) for name in scanned if name} & set(tables))
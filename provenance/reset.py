@@ -0,0 +1,88 @@
+"""
+Set-based wipe of the provenance schema.
+
+Used by the `clear_provenance_data` command and the overwrite mode of the
+admin database sync. Instead of `Model.objects.all().delete()` (which makes
+Django collect every related row in memory to emulate cascades) the tables
+are emptied with plain SQL: a single TRUNCATE ... RESTART IDENTITY CASCADE on
+PostgreSQL and one unqualified DELETE per table on SQLite (which SQLite runs
+as a truncate, without visiting the rows).
+"""
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .versions import bump_data_version
+
+# Provenance app models that are bookkeeping rather than research data and
+# must survive a reset.
+KEEP_MODELS = {'job', 'upload', 'dataversion'}
+
+
+def reset_models():
+    """
+    Returns every model of the provenance app (including auto-created M2M
+    tables) that is wiped on reset, ordered so that referencing tables come
+    before the tables they point to.
+    """
+    app_models = [
+        model for model in apps.get_app_config('provenance').get_models(include_auto_created=True)
+        if model._meta.model_name not in KEEP_MODELS
+    ]
+    remaining = set(app_models)
+
+    def dependents(model):
+        # Models in the reset set that still hold a foreign key to `model`.
+        return [
+            other for other in remaining
+            if other is not model and any(
+                field.remote_field.model is model
+                for field in other._meta.concrete_fields
+                if field.is_relation and field.remote_field
+            )
+        ]
+
+    ordered = []
+    while remaining:
+        leaves = [model for model in app_models if model in remaining and not dependents(model)]
+        if not leaves:
+            # Reference cycle, order no longer matters since FK checks are deferred.
+            leaves = [model for model in app_models if model in remaining]
+        for model in leaves:
+            ordered.append(model)
+            remaining.discard(model)
+    return ordered
+
+
+def reset_provenance_data(using=DEFAULT_DB_ALIAS):
+    """
+    Empties all provenance tables and resets their id sequences.
+    Returns the list of cleared table names.
+    """
+    connection = connections[using]
+    tables = [model._meta.db_table for model in reset_models()]
+
+    with transaction.atomic(using=using):
+        if connection.vendor == 'sqlite':
+            _sqlite_delete(connection, tables)
+        else:
+            statements = connection.ops.sql_flush(
+                no_style(), tables, reset_sequences=True, allow_cascade=True
+            )
+            connection.ops.execute_sql_flush(statements)
+        bump_data_version()
+    return tables
+
+
+def _sqlite_delete(connection, tables):
+    # Everything runs in one transaction, so deleting in batches would not
+    # keep the rollback journal any smaller.
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(table)}')
+
+        # Equivalent of RESTART IDENTITY for AUTOINCREMENT tables.
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'")
+        if cursor.fetchone():
+            placeholders = ', '.join(['%s'] * len(tables))
+            cursor.execute(f'DELETE FROM sqlite_sequence WHERE name IN ({placeholders})', tables)
@@ -0,0 +1,84 @@
+"""
+Text search shared by the public API (`?q=`) and the admin changelists.
+
+Every search term must match at least one of the searchable columns
+(case-insensitive substring match, like the admin's `icontains` search).
+Instead of one big OR across joined tables, each related table is searched on
+its own and the matches are combined as `<fk>_id IN (subquery)`. On
+PostgreSQL every searched column has a trigram GIN index on `UPPER(col::text)`
+(migration 0027), which is exactly the expression Django generates for
+`icontains`, so each subquery is an index scan and the outer query combines
+them through the foreign key indexes.
+"""
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
+
+from .models import Artwork, Auction, Exhibition, Institution, Person
+
+# (foreign key on the searched model, related model, searched columns)
+# A foreign key of None means columns on the searched model itself.
+EVENT_SEARCH = [
+    ('artwork', Artwork, ('name',)),
+    ('person', Person, ('family_name', 'first_name')),
+    ('institution', Institution, ('name',)),
+    ('auction', Auction, ('name',)),
+    ('exhibition', Exhibition, ('name',)),
+    (None, None, ('notes',)),
+]
+
+ARTWORK_SEARCH = [
+    (None, None, ('name',)),
+]
+
+PERSON_SEARCH = [
+    (None, None, ('family_name', 'first_name')),
+]
+
+
+def search_terms(search_term):
+    """
+    Splits the search box input like the admin does: on whitespace, keeping
+    "quoted phrases" together.
+    """
+    terms = []
+    for bit in smart_split(search_term or ''):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if bit:
+            terms.append(bit)
+    return terms
+
+
+def _columns_q(columns, term):
+    q = Q()
+    for column in columns:
+        q |= Q(**{f'{column}__icontains': term})
+    return q
+
+
+def apply_search(queryset, search_term, spec):
+    """
+    Filters `queryset` so every term of `search_term` matches somewhere in `spec`.
+    """
+    for term in search_terms(search_term):
+        term_q = Q()
+        for fk, related_model, columns in spec:
+            if fk is None:
+                term_q |= _columns_q(columns, term)
+            else:
+                matches = related_model._default_manager.filter(_columns_q(columns, term)).values('pk')
+                term_q |= Q(**{f'{fk}_id__in': matches})
+        queryset = queryset.filter(term_q)
+    return queryset
+
+
+def search_events(queryset, search_term):
+    return apply_search(queryset, search_term, EVENT_SEARCH)
+
+
+def search_artworks(queryset, search_term):
+    return apply_search(queryset, search_term, ARTWORK_SEARCH)
+
+
+def search_persons(queryset, search_term):
+    return apply_search(queryset, search_term, PERSON_SEARCH)
@@ -0,0 +1,483 @@
+"""
+Serializers for the JSON API.
+
+Each output field declares the relations it reads. `Serializer.plan()`
+combines those declarations into a single `select_related`/`Prefetch` plan
+for a queryset, so serializing a chain of any length costs a fixed number
+of queries: one per select_related query plus one per prefetched relation.
+
+Nested serializers (e.g. the provenance chain of an artwork) become a
+`Prefetch` whose queryset is planned by the nested serializer.
+
+Large list payloads (`event_report`, `artwork_list`) skip model instances
+altogether: the rows are read with `values_list` over joined columns and
+encoded by `json_response`, which uses orjson when it is installed.
+"""
+import json
+from itertools import groupby
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Prefetch, Q
+from django.http import HttpResponse
+
+from .models import Artwork, Image, ProvenanceEvent, ProvenanceEventSource
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+class Field:
+    """
+    One output key. `get` is an attribute name or a callable taking the
+    instance; `select_related` and `prefetch` list the relations it reads.
+    `columns` lists the model (and select_related) columns it reads, which
+    lets a restricted serializer load them with `only()`; it defaults to the
+    attribute name for attribute fields.
+    """
+
+    def __init__(self, get, columns=None, select_related=(), prefetch=()):
+        self.get = get
+        if columns is None and not callable(get):
+            columns = (get,)
+        self.columns = tuple(columns or ())
+        self.select_related = tuple(select_related)
+        self.prefetch = tuple(prefetch)
+
+    def value(self, obj):
+        if callable(self.get):
+            return self.get(obj)
+        return getattr(obj, self.get)
+
+
+class Nested(Field):
+    """
+    A to-many relation serialized with another serializer. The related rows
+    are loaded with one prefetch query planned by that serializer.
+    """
+
+    def __init__(self, serializer, relation, queryset):
+        self.serializer = serializer
+        self.relation = relation
+        super().__init__(
+            self._serialize_related,
+            prefetch=[Prefetch(relation, queryset=serializer.plan(queryset))],
+        )
+
+    def _serialize_related(self, obj):
+        return [self.serializer.to_dict(related) for related in getattr(obj, self.relation).all()]
+
+
+class Serializer:
+    def __init__(self, fields, includes=None):
+        self.fields = fields
+        # Optional fields that are only output when asked for (`?include=`).
+        self.includes = includes or {}
+
+    def select(self, fields=None, include=()):
+        """
+        Returns a serializer limited to `fields` (all base fields when None)
+        plus the requested includes. Unknown names raise ValueError.
+        """
+        unknown = set(fields or ()) - set(self.fields)
+        unknown |= set(include) - set(self.includes)
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+        selected = {
+            name: field for name, field in self.fields.items()
+            if fields is None or name in fields
+        }
+        selected.update((name, self.includes[name]) for name in self.includes if name in include)
+        return Serializer(selected)
+
+    def plan(self, queryset, restrict_columns=False):
+        """
+        Applies the select_related/prefetch_related calls needed by all fields.
+        With `restrict_columns` only the columns read by the fields are loaded.
+        """
+        select_related = []
+        prefetches = {}
+        columns = []
+        for field in self.fields.values():
+            select_related.extend(field.select_related)
+            columns.extend(field.columns)
+            for lookup in field.prefetch:
+                if not isinstance(lookup, Prefetch):
+                    lookup = Prefetch(lookup)
+                # Two fields reading the same relation share one prefetch.
+                prefetches.setdefault(lookup.prefetch_to, lookup)
+        if select_related:
+            queryset = queryset.select_related(*dict.fromkeys(select_related))
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches.values())
+        if restrict_columns:
+            queryset = queryset.only('pk', *dict.fromkeys(columns))
+        return queryset
+
+    def to_dict(self, obj):
+        return {name: field.value(obj) for name, field in self.fields.items()}
+
+
+def _str_or_empty(relation):
+    def get(obj):
+        related = getattr(obj, relation)
+        return str(related) if related else ''
+    return get
+
+
+def _first_image_url(obj):
+    images = obj.images.all()
+    return images[0].image.url if images else None
+
+
+def image_field():
+    """The URL of the first image of an object with an `images` relation."""
+    return Field(_first_image_url, prefetch=[Prefetch('images', queryset=Image.objects.order_by('pk'))])
+
+
+def _actor(event):
+    person_name = str(event.person) if event.person else ""
+    institution_name = str(event.institution) if event.institution else ""
+    if person_name:
+        if institution_name:
+            return f"{person_name} ({institution_name})"
+        return person_name
+    if institution_name:
+        return institution_name
+    if event.auction:
+        return str(event.auction)
+    if event.exhibition:
+        return str(event.exhibition)
+    return "Unknown"
+
+
+def _event_sources(event):
+    return [{'source': str(ps.source), 'notes': ps.notes} for ps in event.provenanceeventsource_set.all()]
+
+
+def _images(obj):
+    return [
+        {'id': image.id, 'url': image.image.url, 'caption': image.caption}
+        for image in obj.images.all()
+    ]
+
+
+def images_field():
+    """All images of an object with an `images` relation."""
+    return Field(_images, prefetch=[Prefetch('images', queryset=Image.objects.order_by('pk'))])
+
+
+PERSON_COLUMNS = ['person__family_name', 'person__first_name']
+
+PROVENANCE_EVENT = Serializer({
+    'id': Field('id'),
+    'artwork_id': Field('artwork_id'),
+    'artwork_name': Field(lambda e: e.artwork.name, columns=['artwork__name'], select_related=['artwork']),
+    'sequence': Field('sequence_number'),
+    'type': Field(
+        lambda e: e.event_type.name if e.event_type else '',
+        columns=['event_type__name'], select_related=['event_type'],
+    ),
+    'date': Field('date'),
+    'person': Field(_str_or_empty('person'), columns=PERSON_COLUMNS, select_related=['person']),
+    'institution': Field(_str_or_empty('institution'), columns=['institution__name'], select_related=['institution']),
+    'actor': Field(
+        _actor,
+        columns=PERSON_COLUMNS + ['institution__name', 'auction__name', 'exhibition__name'],
+        select_related=['person', 'institution', 'auction', 'exhibition'],
+    ),
+    'auction': Field(_str_or_empty('auction'), columns=['auction__name'], select_related=['auction']),
+    'auction_id': Field('auction_id'),
+    'auction_institution': Field(
+        lambda e: str(e.auction.institution) if e.auction and e.auction.institution else '',
+        columns=['auction__institution__name'], select_related=['auction__institution'],
+    ),
+    'exhibition': Field(_str_or_empty('exhibition'), columns=['exhibition__name'], select_related=['exhibition']),
+    'exhibition_id': Field('exhibition_id'),
+    'exhibition_institution': Field(
+        lambda e: str(e.exhibition.institution) if e.exhibition and e.exhibition.institution else '',
+        columns=['exhibition__institution__name'], select_related=['exhibition__institution'],
+    ),
+    'certainty': Field(lambda e: e.get_certainty_display() if e.certainty else '', columns=['certainty']),
+    'sources': Field(_event_sources, prefetch=[
+        Prefetch(
+            'provenanceeventsource_set',
+            queryset=ProvenanceEventSource.objects.select_related('source').order_by('pk'),
+        ),
+    ]),
+    'notes': Field('notes'),
+})
+
+ARTWORK_PROVENANCE = Nested(
+    PROVENANCE_EVENT, 'provenance_events',
+    ProvenanceEvent.objects.order_by('sequence_number'),
+)
+
+ARTWORK_DETAIL = Serializer({
+    'id': Field('id'),
+    'name': Field('name'),
+    'medium': Field(lambda a: a.medium.name if a.medium else '', columns=['medium__name'], select_related=['medium']),
+    'dimension': Field('dimension'),
+    'height': Field('height'),
+    'width': Field('width'),
+    'depth': Field('depth'),
+    'dimension_unit': Field('dimension_unit'),
+    'creation_date': Field(lambda a: ''),
+    'notes': Field('notes'),
+    'image': image_field(),
+    'provenance': ARTWORK_PROVENANCE,
+}, includes={
+    'images': images_field(),
+})
+
+PERSON_DETAIL = Serializer({
+    'id': Field('id'),
+    'family_name': Field('family_name'),
+    'first_name': Field('first_name'),
+    'birth_date': Field('birth_date'),
+    'death_date': Field('death_date'),
+    'biography': Field('biography'),
+    'image': image_field(),
+    'events': Nested(PROVENANCE_EVENT, 'provenance_events', ProvenanceEvent.objects.all()),
+}, includes={
+    'images': images_field(),
+})
+
+
+def json_response(data, status=200):
+    """
+    JsonResponse equivalent for large payloads. orjson encodes several times
+    faster than the standard library; without it this falls back to json.
+    """
+    if orjson is not None:
+        content = orjson.dumps(data, default=DjangoJSONEncoder().default)
+    else:
+        content = json.dumps(data, cls=DjangoJSONEncoder)
+    return HttpResponse(content, status=status, content_type='application/json')
+
+
+def person_name(family_name, first_name):
+    """Person.__str__ from column values."""
+    if family_name is None:
+        return ''
+    return f"{family_name}, {first_name}".strip(", ")
+
+
+CERTAINTY_LABELS = dict(ProvenanceEvent.CERTAINTY_CHOICES)
+
+
+def first_image_urls(model, object_ids):
+    """
+    Maps object id to the URL of its first image (by pk) in one query, for
+    any model with an `images` generic relation. `object_ids` may be a list
+    or a `values('pk')` queryset.
+    """
+    storage = Image._meta.get_field('image').storage
+    rows = Image.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        object_id__in=object_ids,
+    ).order_by('object_id', 'pk').values_list('object_id', 'image')
+    return {
+        object_id: storage.url(next(group)[1])
+        for object_id, group in groupby(rows, key=lambda row: row[0])
+    }
+
+
+EVENT_REPORT_COLUMNS = (
+    'id', 'artwork_id', 'artwork__name', 'sequence_number', 'event_type_id', 'event_type__name',
+    'date', 'person__family_name', 'person__first_name', 'institution__name', 'auction__name',
+    'exhibition__name', 'certainty', 'provenanceeventsource__id', 'provenanceeventsource__source__source',
+)
+
+
+def event_report_rows(queryset, ordering=('artwork__name', 'sequence_number', 'id')):
+    """
+    Event report rows, one per (event, source) pair or one per event without
+    sources. The join on ProvenanceEventSource produces exactly that
+    expansion, so the whole report is a single query.
+    """
+    rows = queryset.order_by(*ordering, 'provenanceeventsource__id').values_list(*EVENT_REPORT_COLUMNS)
+    data = []
+    for (event_id, artwork_id, artwork_name, sequence_number, event_type_id, event_type_name,
+         date, family_name, first_name, institution, auction, exhibition, certainty,
+         event_source_id, source) in rows:
+        data.append({
+            'artwork_id': artwork_id,
+            'artwork_name': artwork_name,
+            'sequence_number': sequence_number,
+            'event_type_id': event_type_id,
+            'event_type_name': event_type_name or '',
+            'date': date,
+            'person': person_name(family_name, first_name),
+            'institution': institution or '',
+            'auction': auction or '',
+            'exhibition': exhibition or '',
+            'certainty': CERTAINTY_LABELS.get(certainty, certainty) if certainty else '',
+            'id': f"{event_id}_{event_source_id or 0}",
+            'sources': source[:200] if source else '',
+        })
+    return data
+
+
+HOLDING_COLUMNS = (
+    'event_id', 'artwork_id', 'artwork__name', 'event__event_type__name', 'event__date', 'start', 'end',
+    'certainty', 'person_id', 'person__family_name', 'person__first_name', 'institution_id',
+    'institution__name', 'auction_id', 'auction__name', 'exhibition_id', 'exhibition__name',
+)
+
+
+def holding_rows(queryset):
+    """Holding intervals (see provenance.holdings) in one query, by start date."""
+    rows = queryset.order_by('start', 'artwork__name', 'event_id').values_list(*HOLDING_COLUMNS)
+    data = []
+    for (event_id, artwork_id, artwork_name, event_type, date, start, end, certainty, person_id,
+         family_name, first_name, institution_id, institution, auction_id, auction,
+         exhibition_id, exhibition) in rows:
+        data.append({
+            'event_id': event_id,
+            'artwork_id': artwork_id,
+            'artwork_name': artwork_name,
+            'event_type_name': event_type or '',
+            'date': date,
+            'start': start.isoformat(),
+            'end': end.isoformat() if end else None,
+            'certainty': CERTAINTY_LABELS.get(certainty, certainty) if certainty else '',
+            'person_id': person_id,
+            'person': person_name(family_name, first_name),
+            'institution_id': institution_id,
+            'institution': institution or '',
+            'auction_id': auction_id,
+            'auction': auction or '',
+            'exhibition_id': exhibition_id,
+            'exhibition': exhibition or '',
+        })
+    return data
+
+
+# Output key -> column read with values_list; None for values computed
+# separately. The order is the output order.
+ARTWORK_LIST_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'medium': 'medium__name',
+    'medium_id': 'medium_id',
+    'art_type': 'medium__type__name',
+    'art_type_id': 'medium__type_id',
+    'dimension': 'dimension',
+    'height': 'height',
+    'width': 'width',
+    'depth': 'depth',
+    'dimension_unit': 'dimension_unit',
+    'image': None,
+    'event_count': 'event_count',
+    'creation_date': None,
+}
+# Related names that are output as '' instead of null.
+ARTWORK_LIST_EMPTY_STRINGS = {'medium', 'art_type'}
+
+
+def _provenance_by_artwork(artwork_ids):
+    events = PROVENANCE_EVENT.plan(
+        ProvenanceEvent.objects.filter(artwork_id__in=artwork_ids).order_by('artwork_id', 'sequence_number')
+    )
+    grouped = {}
+    for event in events:
+        grouped.setdefault(event.artwork_id, []).append(PROVENANCE_EVENT.to_dict(event))
+    return grouped
+
+
+def _images_by_artwork(artwork_ids):
+    storage = Image._meta.get_field('image').storage
+    rows = Image.objects.filter(
+        content_type=ContentType.objects.get_for_model(Artwork),
+        object_id__in=artwork_ids,
+    ).order_by('pk').values_list('object_id', 'id', 'image', 'caption')
+    grouped = {}
+    for object_id, image_id, name, caption in rows:
+        grouped.setdefault(object_id, []).append({'id': image_id, 'url': storage.url(name), 'caption': caption})
+    return grouped
+
+
+ARTWORK_LIST_INCLUDES = {
+    'provenance': _provenance_by_artwork,
+    'images': _images_by_artwork,
+}
+
+
+def artwork_list_rows(queryset, fields=None, include=()):
+    """
+    Artwork list rows from an Artwork queryset. `fields` limits the output
+    keys (and with them the columns, joins and the `event_count` aggregate);
+    `include` embeds related data. Images and each include cost one extra
+    query for the whole list. Unknown names raise ValueError.
+    """
+    unknown = (set(fields or ()) - set(ARTWORK_LIST_FIELDS)) | (set(include) - set(ARTWORK_LIST_INCLUDES))
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    names = [name for name in ARTWORK_LIST_FIELDS if fields is None or name in fields]
+    artwork_ids = queryset.values('pk')
+
+    if 'event_count' in names:
+        queryset = queryset.annotate(event_count=Count('provenance_events', distinct=True))
+    columns = ['id'] + [ARTWORK_LIST_FIELDS[name] for name in names if ARTWORK_LIST_FIELDS[name] not in (None, 'id')]
+    getters = [
+        (name, columns.index(ARTWORK_LIST_FIELDS[name]) if ARTWORK_LIST_FIELDS[name] else None)
+        for name in names
+    ]
+    images = first_image_urls(Artwork, artwork_ids) if 'image' in names else {}
+    included = {name: ARTWORK_LIST_INCLUDES[name](artwork_ids) for name in include}
+
+    data = []
+    for row in queryset.values_list(*columns):
+        artwork_id = row[0]
+        item = {}
+        for name, index in getters:
+            if index is not None:
+                value = row[index]
+                item[name] = '' if value is None and name in ARTWORK_LIST_EMPTY_STRINGS else value
+            elif name == 'image':
+                item[name] = images.get(artwork_id)
+            else:
+                item[name] = ''
+        for name, grouped in included.items():
+            item[name] = grouped.get(artwork_id, [])
+        data.append(item)
+    return data
+
+
+def artworks_by_actor(lookups):
+    """
+    The artworks of the institution, auction, exhibition and source lists:
+    maps actor id to `{id, name, image, event_types}` dicts in the order of
+    their first event. Each of `lookups` is a ProvenanceEvent lookup leading
+    to the actor id (e.g. 'auction_id' or 'auction__institution_id'); events
+    found through earlier lookups come first. One query per lookup plus one
+    for the images, whatever the number of actors.
+    """
+    grouped = {}
+    for lookup in lookups:
+        rows = (
+            ProvenanceEvent.objects.filter(**{f'{lookup}__isnull': False})
+            .order_by('sequence_number', 'id')
+            .values_list(lookup, 'artwork_id', 'artwork__name', 'event_type__name')
+        )
+        for actor_id, artwork_id, artwork_name, event_type in rows:
+            artworks = grouped.setdefault(actor_id, {})
+            if artwork_id not in artworks:
+                artworks[artwork_id] = {'id': artwork_id, 'name': artwork_name, 'image': None, 'event_types': set()}
+            if event_type:
+                artworks[artwork_id]['event_types'].add(event_type)
+
+    linked = Q()
+    for lookup in lookups:
+        linked |= Q(**{f'{lookup}__isnull': False})
+    images = first_image_urls(Artwork, ProvenanceEvent.objects.filter(linked).values('artwork_id'))
+    result = {}
+    for actor_id, artworks in grouped.items():
+        for artwork in artworks.values():
+            artwork['image'] = images.get(artwork['id'])
+            artwork['event_types'] = sorted(artwork['event_types'])
+        result[actor_id] = list(artworks.values())
+    return result
@@ -0,0 +1,18 @@
+(function () {
+    'use strict';
+
+    // Navigates the changelist when a value is picked in an AutocompleteFilter
+    // (see provenance/admin_filters.py). select2 fires jQuery events only.
+    window.addEventListener('load', function () {
+        django.jQuery(document).on('change', 'select.autocomplete-filter', function () {
+            const box = this.closest('.autocomplete-filter-box');
+            const base = box.dataset.baseQuery || '?';
+            if (!this.value) {
+                window.location.search = base;
+                return;
+            }
+            const separator = base.length > 1 ? '&' : '';
+            window.location.search = base + separator + this.dataset.param + '=' + encodeURIComponent(this.value);
+        });
+    });
+})();
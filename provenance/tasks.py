@@ -0,0 +1,173 @@
+"""
+Background job handlers, see provenance/jobs.py.
+"""
+import os
+import tempfile
+import zipfile
+
+from django.core.management import call_command
+from django.db import transaction
+
+from . import chain_alignment
+from .artwork_matching import record_possible_matches
+from .dimensions import backfill_dimensions
+from .exports import write_event_report_workbook
+from .holdings import rebuild_holdings
+from .image_hashes import MATCH_DISTANCE, find_similar_images, hash_images, propose_possible_matches
+from .image_import import import_artwork_images
+from .jobs import task
+from .models import Upload, job_file_storage
+from .network import compute_centrality
+from .reset import reset_provenance_data
+from .sources import deduplicate_sources
+from .uploads import assemble_upload, delete_upload_files
+from .versions import bump_data_version
+
+IMAGE_MAPPING_FILENAME = 'artwork_image_mapping.xlsx'
+
+# Same exclusions as the old synchronous dump view, plus derived tables that
+# sync_database rebuilds.
+DUMP_EXCLUDE = [
+    'sessions', 'admin', 'contenttypes', 'auth.Permission', 'auth.Group', 'provenance.Job', 'provenance.Upload',
+    'provenance.HoldingInterval', 'provenance.DataVersion', 'provenance.ActorCentrality', 'provenance.ImageHash',
+    'provenance.ArtworkSignature', 'provenance.ArtworkBucket',
+]
+
+
+def _result_path(job, filename):
+    """
+    Reserves `results/<job id>/<filename>` in job storage and points the job's
+    result file at it. Returns the absolute path to write to.
+    """
+    storage = job_file_storage()
+    name = f"results/{job.pk}/{filename}"
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    job.result_file.name = name
+    return path
+
+
+@task('export_event_report')
+def export_event_report(job):
+    path = _result_path(job, 'event_report.xlsx')
+    job.set_progress(0, message="Writing event report")
+    rows = write_event_report_workbook(path, progress=job.set_progress)
+    return {'events': rows}
+
+
+@task('dump_database')
+def dump_database(job):
+    path = _result_path(job, 'database_dump.json')
+    job.set_progress(0, message="Dumping database")
+    call_command('dumpdata', indent=2, output=path, exclude=DUMP_EXCLUDE, verbosity=0)
+    return {'size': os.path.getsize(path)}
+
+
+@task('sync_database')
+def sync_database(job, mode='merge', path=None, upload_id=None):
+    """
+    Loads an uploaded dump, either a plain file (`path`, relative to job
+    storage) or a chunked `Upload`. In overwrite mode all provenance tables
+    are wiped first, in the same transaction.
+    """
+    storage = job_file_storage()
+    upload = None
+    if upload_id:
+        upload = Upload.objects.get(pk=upload_id)
+        job.set_progress(0, message="Assembling upload")
+        path = assemble_upload(upload)
+    file_path = storage.path(path)
+    try:
+        job.set_progress(0, message=f"Synchronizing database ({mode})")
+        with transaction.atomic():
+            if mode == 'overwrite':
+                reset_provenance_data()
+            call_command('loaddata', file_path, verbosity=0)
+            # Fixtures bypass Source.save(); fingerprint their citations and
+            # fold them into existing sources.
+            merged_sources = deduplicate_sources()
+            # Fixtures bypass ProvenanceEvent.save() and Artwork.save() as well.
+            rebuild_holdings()
+            backfill_dimensions()
+            bump_data_version()
+    finally:
+        if upload:
+            delete_upload_files(upload)
+            upload.delete()
+        else:
+            storage.delete(path)
+    return {'mode': mode, 'merged_sources': merged_sources}
+
+
+@task('compute_centrality')
+def compute_actor_centrality(job, data_version=None):
+    # `data_version` is the version the job was queued for (see
+    # api._centrality_state); the stored metrics carry the one actually read.
+    job.set_progress(0, message="Computing actor centrality")
+    return compute_centrality(progress=job.set_progress)
+
+
+@task('find_possible_matches')
+def find_possible_matches(job, max_distance=MATCH_DISTANCE):
+    job.set_progress(0, message="Hashing images")
+    hashed, unreadable = hash_images(progress=job.set_progress)
+    job.set_progress(100, message="Comparing images")
+    matches = find_similar_images(max_distance)
+    return {
+        'hashed': hashed, 'unreadable': unreadable, 'matches': len(matches),
+        'proposed': propose_possible_matches(matches),
+    }
+
+
+@task('align_provenance_chains')
+def align_provenance_chains(job, min_score=chain_alignment.MIN_SCORE):
+    """
+    Aligns the provenance chains of artworks sharing rare actors and records
+    the matches as `possible_match` relationships.
+    """
+    job.set_progress(0, message="Aligning provenance chains")
+    matches, candidates = chain_alignment.align_all(min_score, progress=job.set_progress)
+    groups = [group for group in chain_alignment.clusters(matches) if len(group) > 1]
+    proposed = record_possible_matches(
+        (match.artwork_id, match.other_id, chain_alignment.describe(match)) for match in matches
+    )
+    return {
+        'candidates': candidates, 'matches': len(matches), 'proposed': proposed, 'clusters': len(groups),
+        'largest_clusters': groups[:20],
+    }
+
+
+@task('import_images')
+def import_images(job, mapping_file, images_dir):
+    messages = []
+
+    def log(level, message):
+        if level != 'success':
+            messages.append(message)
+
+    imported = import_artwork_images(mapping_file, images_dir, log=log, progress=job.set_progress)
+    return {'imported': imported, 'problems': messages[:200]}
+
+
+@task('import_image_archive')
+def import_image_archive(job, upload_id):
+    """
+    Imports a zip archive uploaded in chunks. The archive must contain
+    `artwork_image_mapping.xlsx`; image filenames in the mapping are resolved
+    relative to the folder holding it.
+    """
+    upload = Upload.objects.get(pk=upload_id)
+    try:
+        job.set_progress(0, message="Assembling upload")
+        archive_path = job_file_storage().path(assemble_upload(upload))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with zipfile.ZipFile(archive_path) as archive:
+                mapping = [n for n in archive.namelist() if os.path.basename(n) == IMAGE_MAPPING_FILENAME]
+                if not mapping:
+                    raise ValueError(f"{IMAGE_MAPPING_FILENAME} not found in archive.")
+                archive.extractall(tmpdir)
+            mapping_file = os.path.join(tmpdir, mapping[0])
+            return import_images(job, mapping_file, os.path.dirname(mapping_file))
+    finally:
+        delete_upload_files(upload)
+        upload.delete()
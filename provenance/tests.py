@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.core.exceptions import ValidationError
 from .models import Source, Artwork, ProvenanceEvent, Institution, Auction, Exhibition, EventType, ArtType, Medium
 
@@ -117,3 +117,1887 @@ class EventSourceNotesTest(TestCase):
         
         pes2 = ProvenanceEventSource.objects.get(event=self.event, source=self.source2)
         self.assertEqual(pes2.notes, notes2)
+
+
+class ResetProvenanceDataTest(TestCase):
+    def setUp(self):
+        from .models import Person, AuctionPerson, ArtworkGroup, ArtworkRelationship
+        art_type = ArtType.objects.create(name="Painting")
+        medium = Medium.objects.create(name="Oil on Canvas", type=art_type)
+        artwork = Artwork.objects.create(name="Test Artwork", medium=medium)
+        other = Artwork.objects.create(name="Other Artwork", medium=medium)
+        artwork.groups.add(ArtworkGroup.objects.create(name="Group"))
+        ArtworkRelationship.objects.create(source_artwork=artwork, target_artwork=other)
+        person = Person.objects.create(family_name="Doe", first_name="Jane")
+        institution = Institution.objects.create(name="Test Museum")
+        auction = Auction.objects.create(name="Test Auction", institution=institution)
+        AuctionPerson.objects.create(auction=auction, person=person, role='buyer')
+        exhibition = Exhibition.objects.create(name="Test Exhibition", institution=institution)
+        source = Source.objects.create(source="Source 1")
+        auction.sources.add(source)
+        exhibition.sources.add(source)
+        event = ProvenanceEvent.objects.create(
+            artwork=artwork, event_type=EventType.objects.create(name="Sale"),
+            sequence_number=1, person=person, auction=auction
+        )
+        ProvenanceEventSource.objects.create(event=event, source=source)
+
+    def test_reset_empties_every_provenance_table(self):
+        from django.apps import apps
+        from django.contrib.contenttypes.models import ContentType
+        from .reset import reset_provenance_data, reset_models, KEEP_MODELS
+
+        content_types = ContentType.objects.count()
+        reset_provenance_data()
+
+        for model in reset_models():
+            self.assertFalse(model.objects.exists(), model._meta.label)
+        self.assertEqual(
+            len(reset_models()),
+            len(list(apps.get_app_config('provenance').get_models(include_auto_created=True))) - len(KEEP_MODELS)
+        )
+        self.assertEqual(ContentType.objects.count(), content_types)
+
+    def test_reset_orders_referencing_tables_first(self):
+        from .reset import reset_models
+
+        order = reset_models()
+        self.assertLess(order.index(ProvenanceEventSource), order.index(ProvenanceEvent))
+        self.assertLess(order.index(ProvenanceEvent), order.index(Artwork))
+        self.assertLess(order.index(Artwork), order.index(Medium))
+        self.assertLess(order.index(Medium), order.index(ArtType))
+
+    def test_clear_provenance_data_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command('clear_provenance_data', stdout=StringIO())
+        self.assertFalse(Artwork.objects.exists())
+        self.assertFalse(Auction.objects.exists())
+        self.assertFalse(EventType.objects.exists())
+
+
+class BackgroundJobTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        settings_override = override_settings(JOB_FILES_ROOT=self.tmpdir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        artwork = Artwork.objects.create(name="Test Artwork")
+        event = ProvenanceEvent.objects.create(
+            artwork=artwork, event_type=EventType.objects.create(name="Sale"), sequence_number=1
+        )
+        ProvenanceEventSource.objects.create(event=event, source=Source.objects.create(source="Source 1"))
+
+    def test_export_endpoint_queues_job_and_worker_produces_file(self):
+        import openpyxl
+        from django.contrib.auth.models import User
+        from .jobs import run_pending
+        from .models import Job
+
+        self.assertEqual(self.client.post('/api/events/report/export/').status_code, 403)
+        self.assertFalse(Job.objects.exists())
+        user = User.objects.create_user('researcher', password='pw')
+        self.client.force_login(user)
+        response = self.client.post('/api/events/report/export/')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        self.assertEqual(response.json()['status'], 'queued')
+
+        self.assertEqual(run_pending(), 1)
+        job = Job.objects.get(pk=job_id)
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(job.result, {'events': 1})
+
+        status = self.client.get(f'/api/jobs/{job_id}/').json()
+        self.assertEqual(status['progress'], 100)
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        wb = openpyxl.load_workbook(job.result_file.path)
+        rows = list(wb.active.iter_rows(values_only=True))
+        self.assertEqual(rows[1][1], "Test Artwork")
+        self.assertEqual(rows[1][-1], "Source 1")
+
+    def test_failing_job_is_recorded(self):
+        from .jobs import submit, run_pending
+        from .models import Job
+
+        job = submit('import_images', {'mapping_file': '/does/not/exist.xlsx', 'images_dir': '/tmp'})
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertTrue(job.error)
+
+    def test_worker_fails_jobs_whose_heartbeat_expired(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .jobs import submit
+        from .models import Job
+
+        long_ago = timezone.now() - timedelta(hours=3)
+        dead = submit('dump_database')
+        alive = submit('dump_database')
+        Job.objects.filter(pk__in=[dead.pk, alive.pk]).update(
+            status=Job.STATUS_RUNNING, started_at=long_ago, heartbeat_at=long_ago,
+        )
+        alive.set_progress(50)
+
+        with override_settings(JOB_LEASE=3600):
+            call_command('run_jobs', '--once', stdout=StringIO(), stderr=StringIO())
+        dead.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((dead.status, dead.error), (Job.STATUS_FAILED, "The worker running this job stopped responding."))
+        self.assertIsNotNone(dead.finished_at)
+        self.assertEqual(alive.status, Job.STATUS_RUNNING)
+
+    def test_private_job_hidden_from_other_users(self):
+        from django.contrib.auth.models import User
+        from .jobs import submit
+
+        owner = User.objects.create_user('owner', password='pw')
+        job = submit('dump_database', user=owner)
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').status_code, 404)
+        self.client.force_login(owner)
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').status_code, 200)
+
+
+class ChunkedUploadTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        settings_override = override_settings(JOB_FILES_ROOT=self.tmpdir.name, UPLOAD_CHUNK_SIZE=64)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+
+    def _start(self, payload, purpose='db_sync', filename='dump.json'):
+        import hashlib
+        response = self.client.post('/api/uploads/', {
+            'filename': filename, 'size': len(payload), 'purpose': purpose,
+            'sha256': hashlib.sha256(payload).hexdigest(),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def _put_chunk(self, upload, index, payload, **headers):
+        size = upload['chunk_size']
+        return self.client.put(
+            f"/api/uploads/{upload['id']}/chunks/{index}/", payload[index * size:(index + 1) * size],
+            content_type='application/octet-stream', headers=headers
+        )
+
+    def test_resumable_upload_feeds_database_sync(self):
+        import json
+        from .jobs import run_pending
+        from .models import Job
+
+        payload = json.dumps([
+            {'model': 'provenance.arttype', 'pk': 1, 'fields': {'name': f'Type {"x" * 100}'}},
+            {'model': 'provenance.eventtype', 'pk': 1, 'fields': {'name': 'Sale'}},
+        ]).encode()
+        upload = self._start(payload)
+        self.assertGreater(upload['total_chunks'], 2)
+
+        # First attempt is interrupted after one chunk.
+        self.assertEqual(self._put_chunk(upload, 0, payload).status_code, 200)
+        status = self.client.get(f"/api/uploads/{upload['id']}/").json()
+        self.assertEqual(status['received'], [0])
+        incomplete = self.client.post(f"/api/uploads/{upload['id']}/complete/")
+        self.assertEqual(incomplete.status_code, 400)
+
+        # Resume with the missing chunks only.
+        for index in range(upload['total_chunks']):
+            if index not in status['received']:
+                self.assertEqual(self._put_chunk(upload, index, payload).status_code, 200)
+
+        response = self.client.post(
+            f"/api/uploads/{upload['id']}/complete/", {'mode': 'overwrite'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        run_pending()
+        job = Job.objects.get(pk=response.json()['id'])
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED, job.error)
+        self.assertTrue(EventType.objects.filter(name='Sale').exists())
+
+    def test_chunk_checksum_mismatch_is_rejected(self):
+        payload = b'{}' * 10
+        upload = self._start(payload)
+        response = self._put_chunk(upload, 0, payload, X_CHUNK_SHA256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f"/api/uploads/{upload['id']}/").json()['received'], [])
+
+    def test_filename_never_collides_with_a_chunk(self):
+        from .models import Upload, job_file_storage
+        from .uploads import assemble_upload, received_chunks
+        payload = bytes(range(200))
+        # The API only takes .json/.zip names; the stored name is what counts.
+        for filename in ('chunk-a.json', 'chunk-000000'):
+            with self.subTest(filename=filename):
+                upload = self._start(payload)
+                for index in range(upload['total_chunks']):
+                    self.assertEqual(self._put_chunk(upload, index, payload).status_code, 200)
+                Upload.objects.filter(pk=upload['id']).update(filename=filename)
+                upload = Upload.objects.get(pk=upload['id'])
+                name = assemble_upload(upload)
+                self.assertEqual(received_chunks(upload), [])
+                with job_file_storage().open(name) as f:
+                    self.assertEqual(f.read(), payload)
+                self.assertEqual(self.client.get(f"/api/uploads/{upload.pk}/").status_code, 200)
+
+    def test_uploads_require_staff(self):
+        self.client.logout()
+        response = self.client.post('/api/uploads/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_image_archive_upload_imports_images(self):
+        import io
+        import zipfile
+        import openpyxl
+        from PIL import Image as PILImage
+        from django.test import override_settings
+        from .jobs import run_pending
+        from .models import Image, Job
+
+        artwork = Artwork.objects.create(name="Test Artwork")
+        mapping = io.BytesIO()
+        wb = openpyxl.Workbook()
+        wb.active.append(['Artwork', 'Image'])
+        wb.active.append(['Test Artwork', 'test.png'])
+        wb.save(mapping)
+        picture = io.BytesIO()
+        PILImage.new('RGB', (4, 4)).save(picture, 'PNG')
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('batch/artwork_image_mapping.xlsx', mapping.getvalue())
+            zf.writestr('batch/test.png', picture.getvalue())
+        payload = archive.getvalue()
+
+        upload = self._start(payload, purpose='images', filename='images.zip')
+        for index in range(upload['total_chunks']):
+            self._put_chunk(upload, index, payload)
+        response = self.client.post(f"/api/uploads/{upload['id']}/complete/")
+        self.assertEqual(response.status_code, 202)
+        with override_settings(MEDIA_ROOT=self.tmpdir.name):
+            run_pending()
+        job = Job.objects.get(pk=response.json()['id'])
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED, job.error)
+        self.assertEqual(job.result['imported'], 1)
+        self.assertEqual(Image.objects.get().object_id, artwork.id)
+
+
+ADMIN_TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=ADMIN_TEST_STORAGES)
+class ArtworkAdminInlineTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import Person
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        self.event_type = EventType.objects.create(name="Sale")
+        self.persons = [Person.objects.create(family_name=f"Person {i}") for i in range(5)]
+        self.sources = [Source.objects.create(source=f"Source {i}") for i in range(5)]
+
+    def _artwork_with_events(self, count):
+        artwork = Artwork.objects.create(name=f"Artwork {count}")
+        for i in range(count):
+            event = ProvenanceEvent.objects.create(
+                artwork=artwork, event_type=self.event_type, sequence_number=i,
+                person=self.persons[i % 5], institution=Institution.objects.create(name=f"Inst {count}-{i}")
+            )
+            ProvenanceEventSource.objects.create(event=event, source=self.sources[i % 5], notes=f"p. {i}")
+        return artwork
+
+    def _change_view_queries(self, artwork, page=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = f'/admin/provenance/artwork/{artwork.pk}/change/'
+        if page:
+            url += f'?events_page={page}'
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_change_view_query_count_does_not_grow_with_events(self):
+        small_artwork = self._artwork_with_events(3)
+        self._change_view_queries(small_artwork)  # warm content type cache
+        _, small = self._change_view_queries(small_artwork)
+        _, large = self._change_view_queries(self._artwork_with_events(40))
+        self.assertEqual(small, large)
+
+    def test_inline_events_are_paginated_and_selected_labels_rendered(self):
+        artwork = self._artwork_with_events(60)
+        response, _ = self._change_view_queries(artwork, page=2)
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(formset.page_obj.number, 2)
+        self.assertEqual(len(formset.initial_forms), 10)
+        self.assertEqual(formset.initial_forms[0].initial['source_notes'], "p. 50")
+        self.assertContains(response, 'Inst 60-59')
+        self.assertNotContains(response, 'Inst 60-49<')
+        self.assertContains(response, '<option value="%d" selected>Source 4</option>' % self.sources[4].pk)
+
+    def test_saving_the_inline_events_rebuilds_holdings_once(self):
+        from unittest import mock
+        artwork = self._artwork_with_events(5)
+        response, _ = self._change_view_queries(artwork)
+        data = {}
+        forms = [response.context['adminform'].form]
+        for inline in response.context['inline_admin_formsets']:
+            forms += [inline.formset.management_form, *inline.formset.forms]
+        for form in forms:
+            for field in form:
+                value = field.value()
+                if value is not None and value is not False:
+                    data[field.html_name] = [str(v) for v in value] if isinstance(value, list) else str(value)
+        for i in range(5):
+            data[f'provenance_events-{i}-date'] = str(1900 + i)
+
+        with mock.patch('provenance.holdings.rebuild_holdings') as rebuild:
+            response = self.client.post(f'/admin/provenance/artwork/{artwork.pk}/change/', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(ProvenanceEvent.objects.filter(artwork=artwork).order_by('sequence_number')
+                              .values_list('date', flat=True)), ["1900", "1901", "1902", "1903", "1904"])
+        rebuild.assert_called_once_with({artwork.pk})
+
+
+class EventSearchTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import Person
+        self.user = User.objects.create_superuser('admin', password='pw')
+        sale = EventType.objects.create(name="Sale")
+        self.auction = Auction.objects.create(name="Lempertz 1938")
+        monet = Artwork.objects.create(name="Seerosen")
+        other = Artwork.objects.create(name="Stillleben")
+        self.match = ProvenanceEvent.objects.create(
+            artwork=monet, event_type=sale, sequence_number=1,
+            person=Person.objects.create(family_name="Cassirer", first_name="Paul"),
+            notes="acquired from the artist",
+        )
+        self.other = ProvenanceEvent.objects.create(
+            artwork=other, event_type=sale, sequence_number=1, auction=self.auction,
+            notes="Cassirer mentioned in catalogue",
+        )
+
+    def test_every_term_must_match_some_column(self):
+        from .search import search_events
+        events = ProvenanceEvent.objects.all()
+        self.assertEqual(set(search_events(events, "cassirer")), {self.match, self.other})
+        self.assertEqual(list(search_events(events, "cassirer seerosen")), [self.match])
+        self.assertEqual(list(search_events(events, '"from the artist"')), [self.match])
+        self.assertEqual(list(search_events(events, "lempertz")), [self.other])
+        self.assertEqual(list(search_events(events, "seerosen lempertz")), [])
+
+    def test_api_and_admin_search(self):
+        response = self.client.get('/api/artworks/', {'q': 'seer'})
+        self.assertEqual([a['name'] for a in response.json()['results']], ["Seerosen"])
+
+        self.client.force_login(self.user)
+        with override_settings(STORAGES=ADMIN_TEST_STORAGES):
+            response = self.client.get('/admin/provenance/provenanceevent/', {'q': 'paul seerosen'})
+            self.assertEqual(list(response.context['cl'].result_list), [self.match])
+            response = self.client.get('/admin/provenance/provenanceevent/', {'auction__id__exact': self.auction.pk})
+        self.assertEqual(list(response.context['cl'].result_list), [self.other])
+        self.assertContains(response, 'data-param="auction__id__exact"')
+        self.assertContains(response, '<option value="%d" selected>Lempertz 1938</option>' % self.auction.pk)
+
+    def test_paginator_counts_exactly_without_planner_estimate(self):
+        from .paginators import EstimatedCountPaginator
+        paginator = EstimatedCountPaginator(ProvenanceEvent.objects.order_by('pk'), 1)
+        self.assertEqual(paginator.count, 2)
+
+
+class DetailSerializerTest(TestCase):
+    def setUp(self):
+        from .models import Person
+        self.person = Person.objects.create(family_name="Cassirer", first_name="Paul")
+        self.event_type = EventType.objects.create(name="Sale")
+        self.source = Source.objects.create(source="Catalogue")
+
+    def _artwork_with_events(self, count):
+        artwork = Artwork.objects.create(name=f"Artwork {count}")
+        for i in range(count):
+            house = Institution.objects.create(name=f"House {count}-{i}")
+            event = ProvenanceEvent.objects.create(
+                artwork=artwork, event_type=self.event_type, sequence_number=count - i,
+                person=self.person, auction=Auction.objects.create(name=f"Sale {i}", institution=house),
+                exhibition=Exhibition.objects.create(name=f"Show {i}", institution=house),
+            )
+            ProvenanceEventSource.objects.create(event=event, source=self.source, notes=f"lot {i}")
+        return artwork
+
+    def _queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_artwork_detail_query_count_is_constant(self):
+        small = self._artwork_with_events(1)
+        self._queries(f'/api/artworks/{small.pk}/')  # warm content type cache
+        _, small_count = self._queries(f'/api/artworks/{small.pk}/')
+        data, large_count = self._queries(f'/api/artworks/{self._artwork_with_events(12).pk}/')
+        self.assertEqual(small_count, large_count)
+        self.assertEqual([e['sequence'] for e in data['provenance']], list(range(1, 13)))
+        first = data['provenance'][0]
+        self.assertEqual(first['actor'], "Cassirer, Paul")
+        self.assertEqual(first['auction_institution'], "House 12-11")
+        self.assertEqual(first['sources'], [{'source': "Catalogue", 'notes': "lot 11"}])
+
+    def test_person_detail_query_count_is_constant(self):
+        self._artwork_with_events(1)
+        self._queries(f'/api/persons/{self.person.pk}/')
+        _, small_count = self._queries(f'/api/persons/{self.person.pk}/')
+        self._artwork_with_events(10)
+        data, large_count = self._queries(f'/api/persons/{self.person.pk}/')
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(data['events']), 11)
+        self.assertEqual(data['image'], None)
+
+
+class ValuesSerializationTest(TestCase):
+    def setUp(self):
+        from .models import Person
+        sale = EventType.objects.create(name="Sale")
+        person = Person.objects.create(family_name="Cassirer", first_name="Paul")
+        sources = [Source.objects.create(source=f"Source {i}") for i in range(2)]
+        for n in range(3):
+            artwork = Artwork.objects.create(name=f"Artwork {n}")
+            ProvenanceEvent.objects.create(artwork=artwork, sequence_number=1, certainty='likely', person=person)
+            event = ProvenanceEvent.objects.create(
+                artwork=artwork, event_type=sale, sequence_number=2,
+                exhibition=Exhibition.objects.create(name=f"Show {n}"),
+            )
+            for source in sources:
+                ProvenanceEventSource.objects.create(event=event, source=source)
+
+    def test_list_payloads_match_instance_path(self):
+        from .management.commands.benchmark_serialization import instance_artwork_list, instance_event_report
+        from .serializers import artwork_list_rows, event_report_rows
+        import json
+
+        expected = json.loads(instance_event_report().content)['results']
+        with self.assertNumQueries(1):
+            rows = event_report_rows(ProvenanceEvent.objects.all())
+        self.assertEqual(rows, expected)
+        self.assertEqual(len(rows), 9)
+
+        expected = json.loads(instance_artwork_list().content)['results']
+        rows = artwork_list_rows(Artwork.objects.all())
+        self.assertEqual(sorted(rows, key=lambda r: r['id']), sorted(expected, key=lambda r: r['id']))
+
+    def test_benchmark_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out, err = StringIO(), StringIO()
+        call_command('benchmark_serialization', repeat=1, stdout=out, stderr=err)
+        self.assertIn('event_report: 9 rows', out.getvalue())
+        self.assertIn('artwork_list: 3 rows', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+
+
+class SparseFieldsTest(TestCase):
+    def setUp(self):
+        art_type = ArtType.objects.create(name="Painting")
+        self.medium = Medium.objects.create(name="Oil", type=art_type)
+        self.source = Source.objects.create(source="Catalogue")
+        for n in range(3):
+            artwork = Artwork.objects.create(name=f"Artwork {n}", medium=self.medium, dimension="10 x 20 cm")
+            for i in range(n + 1):
+                event = ProvenanceEvent.objects.create(artwork=artwork, sequence_number=i)
+                ProvenanceEventSource.objects.create(event=event, source=self.source)
+
+    def _get(self, url, params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_artwork_list_fields_skip_columns_and_aggregate(self):
+        self._get('/api/artworks/', {})  # warm content type cache
+        response, queries = self._get('/api/artworks/', {'fields': 'id,name,image,medium'})
+        row = response.json()['results'][0]
+        self.assertEqual(list(row), ['id', 'name', 'medium', 'image'])
+        self.assertEqual(row['medium'], "Oil")
+        self.assertNotIn('COUNT(', queries[0])
+        self.assertNotIn('provenance_arttype', queries[0])
+        self.assertNotIn('dimension', queries[0])
+
+    def test_artwork_list_include_is_constant_query(self):
+        self._get('/api/artworks/', {})
+        response, queries = self._get('/api/artworks/', {'fields': 'id', 'include': 'provenance,images'})
+        rows = {row['id']: row for row in response.json()['results']}
+        self.assertEqual(sorted(len(row['provenance']) for row in rows.values()), [1, 2, 3])
+        self.assertEqual(rows[Artwork.objects.get(name="Artwork 0").pk]['provenance'][0]['sources'][0]['source'], "Catalogue")
+        self.assertEqual(len(queries), 4)  # artworks, events, event sources, images
+
+    def test_detail_fields_and_include(self):
+        artwork = Artwork.objects.get(name="Artwork 2")
+        response, queries = self._get(f'/api/artworks/{artwork.pk}/', {'fields': 'name,medium', 'include': 'images'})
+        self.assertEqual(response.json(), {'name': "Artwork 2", 'medium': "Oil", 'images': []})
+        self.assertNotIn('dimension', queries[0])
+
+        response = self.client.get(f'/api/artworks/{artwork.pk}/', {'fields': 'name,colour'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/artworks/', {'include': 'owners'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchDetailTest(TestCase):
+    def setUp(self):
+        from .models import Person
+        self.person = Person.objects.create(family_name="Cassirer")
+        self.artworks = []
+        for n in range(12):
+            artwork = Artwork.objects.create(name=f"Artwork {n}")
+            for i in range(n % 3 + 1):
+                event = ProvenanceEvent.objects.create(artwork=artwork, sequence_number=i, person=self.person)
+                ProvenanceEventSource.objects.create(event=event, source=Source.objects.create(source=f"S {n}-{i}"))
+            self.artworks.append(artwork)
+
+    def _batch(self, url, ids, **params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'ids': ','.join(str(pk) for pk in ids), **params})
+        return response, len(ctx.captured_queries)
+
+    def test_artwork_batch_matches_detail_with_constant_queries(self):
+        ids = [artwork.pk for artwork in self.artworks]
+        self._batch('/api/artworks/batch/', ids[:1])  # warm content type cache
+        _, small = self._batch('/api/artworks/batch/', ids[:2])
+        response, large = self._batch('/api/artworks/batch/', list(reversed(ids)) + [999999])
+        self.assertEqual(small, large)
+        data = response.json()
+        self.assertEqual([row['id'] for row in data['results']], list(reversed(ids)))
+        self.assertEqual(data['missing'], [999999])
+        self.assertEqual(data['results'][-1], self.client.get(f'/api/artworks/{ids[0]}/').json())
+
+    def test_person_batch_and_limits(self):
+        response, _ = self._batch('/api/persons/batch/', [self.person.pk], fields='family_name')
+        self.assertEqual(response.json()['results'], [{'family_name': "Cassirer"}])
+        response, _ = self._batch('/api/persons/batch/', range(1, 502))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/persons/batch/', {'ids': '1,x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EventReportFilterTest(TestCase):
+    def setUp(self):
+        from .models import ArtworkGroup, Person
+        self.sale = EventType.objects.create(name="Sale")
+        self.gift = EventType.objects.create(name="Gift")
+        self.person = Person.objects.create(family_name="Cassirer", first_name="Paul")
+        self.source = Source.objects.create(source="Catalogue")
+        self.group = ArtworkGroup.objects.create(name="Bequest")
+        grouped = Artwork.objects.create(name="B Artwork")
+        grouped.groups.add(self.group)
+        other = Artwork.objects.create(name="A Artwork")
+        self.e1 = ProvenanceEvent.objects.create(artwork=grouped, event_type=self.sale, sequence_number=1,
+                                                 date="12.03.1938", certainty='proven', person=self.person)
+        self.e2 = ProvenanceEvent.objects.create(artwork=grouped, event_type=self.gift, sequence_number=2,
+                                                 date="ca. 1950", certainty='likely')
+        self.e3 = ProvenanceEvent.objects.create(artwork=other, event_type=self.sale, sequence_number=1,
+                                                 date="1942-1945", person=self.person)
+        for event in (self.e1, self.e3):
+            ProvenanceEventSource.objects.create(event=event, source=self.source)
+        ProvenanceEventSource.objects.create(event=self.e1, source=Source.objects.create(source="Letter"))
+
+    def _report(self, **params):
+        response = self.client.get('/api/events/report/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_year_is_parsed_on_save(self):
+        self.assertEqual([self.e1.year, self.e2.year, self.e3.year], [1938, 1950, 1942])
+        self.e2.date = ""
+        self.e2.save(update_fields=['date'])
+        self.e2.refresh_from_db()
+        self.assertIsNone(self.e2.year)
+
+    def test_filters_and_sort(self):
+        def event_ids(data):
+            return [row['id'].split('_')[0] for row in data['results']]
+
+        data = self._report(event_type=self.sale.pk, year_from=1940, facets=0)
+        self.assertEqual(set(event_ids(data)), {str(self.e3.pk)})
+        self.assertNotIn('facets', data)
+        data = self._report(source=self.source.pk, group=self.group.pk, facets=0)
+        self.assertEqual(event_ids(data), [str(self.e1.pk), str(self.e1.pk)])  # one row per source
+        data = self._report(sort='-date', facets=0)
+        self.assertEqual(list(dict.fromkeys(event_ids(data))), [str(self.e2.pk), str(self.e3.pk), str(self.e1.pk)])
+        data = self._report(certainty='proven,likely', person=self.person.pk, facets=0)
+        self.assertEqual(set(event_ids(data)), {str(self.e1.pk)})
+
+        for params in ({'sort': 'colour'}, {'certainty': 'maybe'}, {'person': 'x'}, {'year_to': 'soon'}):
+            self.assertEqual(self.client.get('/api/events/report/', params).status_code, 400)
+
+    def test_facets_ignore_their_own_filter(self):
+        data = self._report(event_type=self.sale.pk)
+        facets = data['facets']
+        self.assertEqual({f['name']: f['count'] for f in facets['event_type']}, {"Sale": 2, "Gift": 1})
+        self.assertEqual(facets['person'], [{'id': self.person.pk, 'name': "Cassirer, Paul", 'count': 2}])
+        self.assertEqual({f['name']: f['count'] for f in facets['source']}, {"Catalogue": 2, "Letter": 1})
+        self.assertEqual({f['name']: f['count'] for f in facets['decade']}, {"1930s": 1, "1940s": 1})
+        self.assertEqual(facets['group'], [{'id': self.group.pk, 'name': "Bequest", 'count': 1}])
+        self.assertEqual(facets['certainty'], [{'id': 'proven', 'name': "Proven", 'count': 1}])
+
+
+class ArtworkBrowseTest(TestCase):
+    def setUp(self):
+        from .models import ArtworkGroup, Person
+        painting = ArtType.objects.create(name="Painting")
+        self.oil = Medium.objects.create(name="Oil", type=painting)
+        self.ink = Medium.objects.create(name="Ink", type=ArtType.objects.create(name="Drawing"))
+        self.sale = EventType.objects.create(name="Sale")
+        self.gift = EventType.objects.create(name="Gift")
+        self.person = Person.objects.create(family_name="Cassirer")
+        self.group = ArtworkGroup.objects.create(name="Bequest")
+        for n in range(6):
+            artwork = Artwork.objects.create(name=f"Artwork {n}", medium=self.oil if n % 2 else self.ink)
+            if n < 2:
+                artwork.groups.add(self.group)
+            # Even artworks: proven sale by Cassirer in 1938; odd: likely gift in 1950.
+            ProvenanceEvent.objects.create(
+                artwork=artwork, sequence_number=1, event_type=self.sale if n % 2 == 0 else self.gift,
+                certainty='proven' if n % 2 == 0 else 'likely', date="1938" if n % 2 == 0 else "1950",
+                person=self.person if n % 2 == 0 else None,
+            )
+
+    def _browse(self, **params):
+        response = self.client.get('/api/artworks/browse/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_filters_combine_and_paginate(self):
+        data = self._browse(page_size=2, page=2, facets=0)
+        self.assertEqual((data['count'], data['num_pages'], data['page']), (6, 3, 2))
+        self.assertEqual([row['name'] for row in data['results']], ["Artwork 2", "Artwork 3"])
+
+        data = self._browse(event_type=self.sale.pk, certainty='proven', person=self.person.pk, year_from=1930, year_to=1939)
+        self.assertEqual([row['name'] for row in data['results']], ["Artwork 0", "Artwork 2", "Artwork 4"])
+        # Event filters must match on the same event.
+        self.assertEqual(self._browse(event_type=self.sale.pk, certainty='likely')['count'], 0)
+        data = self._browse(art_type=self.oil.type_id, group=self.group.pk, fields='name')
+        self.assertEqual(data['results'], [{'name': "Artwork 1"}])
+
+    def test_every_page_is_reachable_whatever_the_planner_estimates(self):
+        from unittest import mock
+        with mock.patch('provenance.paginators.EXACT_COUNT_THRESHOLD', 0), \
+                mock.patch('provenance.paginators.estimated_count', return_value=2):
+            pages = [self._browse(page_size=2, page=page, facets=0) for page in (1, 2, 3)]
+        self.assertEqual([(data['count'], data['num_pages'], data['page']) for data in pages],
+                         [(6, 3, 1), (6, 3, 2), (6, 3, 3)])
+        self.assertEqual([row['name'] for data in pages for row in data['results']],
+                         [f"Artwork {n}" for n in range(6)])
+
+    def test_facet_counts(self):
+        facets = self._browse(medium=self.oil.pk)['facets']
+        self.assertEqual({f['name']: f['count'] for f in facets['medium']}, {"Oil": 3, "Ink": 3})
+        self.assertEqual(facets['art_type'], [{'id': self.oil.type_id, 'name': "Painting", 'count': 3}])
+        self.assertEqual(facets['event_type'], [{'id': self.gift.pk, 'name': "Gift", 'count': 3}])
+        self.assertEqual(facets['certainty'], [{'id': 'likely', 'name': "Likely", 'count': 3}])
+        self.assertEqual(facets['decade'], [{'id': 1950, 'name': "1950s", 'count': 3}])
+        self.assertEqual(facets['group'], [{'id': self.group.pk, 'name': "Bequest", 'count': 1}])
+
+    def test_query_count_does_not_depend_on_result_size(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self._browse()  # warm content type cache
+        with CaptureQueriesContext(connection) as small:
+            self._browse(page_size=1)
+        with CaptureQueriesContext(connection) as large:
+            self._browse(page_size=200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class QueryPlanTest(TestCase):
+    """
+    Runs the API endpoints on a scale fixture and EXPLAINs every query they
+    issue; a sequential scan on one of the large tables fails the test.
+    """
+    LARGE_TABLES = (
+        'provenance_artwork', 'provenance_provenanceevent', 'provenance_provenanceeventsource',
+        'provenance_person', 'provenance_source', 'provenance_image', 'provenance_holdinginterval',
+        'provenance_actorcentrality',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.db import connection
+        from .holdings import rebuild_holdings
+        from .models import Person
+        from .network import compute_centrality
+        cls.medium = Medium.objects.create(name="Oil")
+        Medium.objects.bulk_create(Medium(name=f"Medium {n}") for n in range(20))
+        cls.sale = EventType.objects.create(name="Sale")
+        Person.objects.bulk_create(Person(family_name=f"Family {n}", first_name=f"First {n}") for n in range(1000))
+        Source.objects.bulk_create(Source(source=f"Source {n}") for n in range(1000))
+        from .dimensions import dimension_fields
+        Artwork.objects.bulk_create(
+            Artwork(name=f"Artwork {n:05d}", medium=cls.medium if n % 50 == 0 else None,
+                    dimension=f"{20 + n % 500} x 50 cm", **dimension_fields(f"{20 + n % 500} x 50 cm"))
+            for n in range(2000)
+        )
+        artwork_ids = list(Artwork.objects.values_list('pk', flat=True))
+        person_ids = list(Person.objects.values_list('pk', flat=True))
+        source_ids = list(Source.objects.values_list('pk', flat=True))
+        ProvenanceEvent.objects.bulk_create(
+            ProvenanceEvent(artwork_id=artwork_id, sequence_number=seq, event_type=cls.sale,
+                            person_id=person_ids[(i * 3 + seq) % len(person_ids)],
+                            date=str(1900 + i % 100 + seq * 10), year=1900 + i % 100 + seq * 10)
+            for i, artwork_id in enumerate(artwork_ids) for seq in range(3)
+        )
+        rebuild_holdings()
+        compute_centrality()
+        event_ids = list(ProvenanceEvent.objects.values_list('pk', flat=True))
+        ProvenanceEventSource.objects.bulk_create(
+            ProvenanceEventSource(event_id=event_id, source_id=source_ids[i % len(source_ids)])
+            for i, event_id in enumerate(event_ids)
+        )
+        cls.artwork_id, cls.person_id, cls.source_id = artwork_ids[100], person_ids[10], source_ids[10]
+        cls.artwork_ids, cls.person_ids = artwork_ids[:50], person_ids[:50]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertNoFullScans(self, url, params=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .query_plans import full_scans
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        for query in ctx.captured_queries:
+            with self.subTest(url=url, sql=query['sql']):
+                self.assertEqual(full_scans(connection, query['sql'], self.LARGE_TABLES), [])
+
+    def test_size_range_filters(self):
+        self.assertNoFullScans('/api/artworks/', {'height_min': 50, 'height_max': 52})
+        self.assertNoFullScans('/api/artworks/browse/', {'height_min': 50, 'height_max': 52, 'facets': 0})
+
+    def test_detail_endpoints(self):
+        self.assertNoFullScans(f'/api/artworks/{self.artwork_id}/', {'include': 'images'})
+        self.assertNoFullScans(f'/api/persons/{self.person_id}/')
+
+    def test_batch_endpoints(self):
+        self.assertNoFullScans('/api/artworks/batch/', {'ids': ','.join(map(str, self.artwork_ids))})
+        self.assertNoFullScans('/api/persons/batch/', {'ids': ','.join(map(str, self.person_ids))})
+
+    def test_filtered_lists(self):
+        self.assertNoFullScans('/api/artworks/browse/', {'medium': self.medium.pk, 'facets': 0})
+        self.assertNoFullScans('/api/events/report/', {'person': self.person_id, 'facets': 0})
+        self.assertNoFullScans('/api/events/report/', {'source': self.source_id, 'facets': 0})
+
+    def test_holding_queries(self):
+        self.assertNoFullScans('/api/holdings/', {'artwork': self.artwork_id, 'date': '1938'})
+        self.assertNoFullScans('/api/holdings/', {'person': self.person_id, 'from': '1933', 'to': '1945'})
+
+    def test_centrality_queries(self):
+        self.assertNoFullScans('/api/network/centrality/', {'metric': 'pagerank', 'type': 'person'})
+        self.assertNoFullScans(f'/api/network/centrality/person/{self.person_id}/')
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Runs every budgeted endpoint and command over fixtures of growing size.
+    Each must stay within its budget in provenance/query_budget.py, and its
+    query count must not grow with the fixture.
+    """
+    SIZES = (1, 5, 20)
+    # Endpoints that only answer logged-in users or staff; they are called as
+    # staff and their counts include loading the session and user.
+    LOGIN_ENDPOINTS = {'find-possible-matches', 'align-histories', 'centrality-refresh', 'export-event-report'}
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import ArtworkGroup, Person
+        self.created = 0
+        self.sale = EventType.objects.create(name="Sale")
+        self.medium = Medium.objects.create(name="Oil", type=ArtType.objects.create(name="Painting"))
+        self.group = ArtworkGroup.objects.create(name="Bequest")
+        self.person = Person.objects.create(family_name="Cassirer", birth_date="1871-02-21")
+        Person.objects.create(family_name="Cassirer", birth_date="1871")  # a duplicate for dedupe_persons
+        self.staff, _ = User.objects.get_or_create(username='staff', defaults={'is_staff': True})
+        # A look-alike for the image and metadata matching, and a copy sharing its history.
+        self.reference = Artwork.objects.create(name="Artwork", dimension="50 x 60 cm", medium=self.medium)
+        self._add_image(self.reference, 0)
+        collector, dealer = Person.objects.create(family_name="Collector"), Institution.objects.create(name="Dealer")
+        for artwork in (self.reference, Artwork.objects.create(name="Copy")):
+            for seq, actor in enumerate([{'person': collector}, {'institution': dealer}]):
+                ProvenanceEvent.objects.create(artwork=artwork, sequence_number=seq, event_type=self.sale,
+                                               date="1920", **actor)
+
+    def _add_image(self, artwork, n):
+        from django.contrib.contenttypes.models import ContentType
+        from .image_hashes import hash_fields
+        from .models import Image, ImageHash
+        image = Image.objects.create(image=f"images/{artwork.pk}.jpg",
+                                     content_type=ContentType.objects.get_for_model(artwork), object_id=artwork.pk)
+        # Every artwork looks alike, so similarity results grow with the fixture.
+        ImageHash.objects.create(image=image, artwork=artwork, file=image.image.name,
+                                 **hash_fields(n, n, 0x0123456789ABCDEF ^ n))
+
+    def _grow(self, size):
+        """Adds artworks, each with a full set of related rows, up to `size`."""
+        from django.contrib.contenttypes.models import ContentType
+        from .models import Image, Person
+        from .network import compute_centrality
+        for n in range(self.created, size):
+            institution = Institution.objects.create(name=f"Museum {n}")
+            auction = Auction.objects.create(name=f"Auction {n}", institution=institution)
+            exhibition = Exhibition.objects.create(name=f"Exhibition {n}", institution=institution)
+            person = Person.objects.create(family_name=f"Family {n}", birth_date="1900-01-01")
+            artwork = Artwork.objects.create(name=f"Artwork {n}", dimension="50 x 60 cm", medium=self.medium)
+            artwork.groups.add(self.group)
+            source = Source.objects.create(source=f"Source {n}")
+            self._add_image(artwork, n)
+            Image.objects.create(image=f"images/{person.pk}.jpg", content_type=ContentType.objects.get_for_model(person),
+                                 object_id=person.pk)
+            for seq, actor in enumerate([{'person': person}, {'institution': institution},
+                                         {'auction': auction}, {'exhibition': exhibition}]):
+                event = ProvenanceEvent.objects.create(artwork=artwork, sequence_number=seq, event_type=self.sale,
+                                                       date="1938", certainty='proven', **actor)
+                ProvenanceEventSource.objects.create(event=event, source=source)
+        self.created = size
+        compute_centrality()
+
+    def _requests(self):
+        """(url name, method, url, params) of every budgeted endpoint."""
+        from django.urls import reverse
+        from .models import Person
+        artwork_ids = ','.join(str(pk) for pk in Artwork.objects.values_list('pk', flat=True))
+        person_ids = ','.join(str(pk) for pk in Person.objects.values_list('pk', flat=True))
+        artwork = Artwork.objects.order_by('pk').last()
+        collector = Person.objects.get(family_name="Family 0")
+        return [
+            ('artwork-list', 'get', reverse('artwork-list'), {'height_max': 100}),
+            ('artwork-detail', 'get', reverse('artwork-detail', args=[artwork.pk]), {'include': 'images'}),
+            ('artwork-batch', 'get', reverse('artwork-batch'), {'ids': artwork_ids, 'include': 'images'}),
+            ('artwork-browse', 'get', reverse('artwork-browse'), {'medium': self.medium.pk, 'height_min': 40,
+                                                                          'page_size': 200}),
+            ('artwork-similar', 'get', reverse('artwork-similar', args=[artwork.pk]), {}),
+            ('find-possible-matches', 'post', reverse('find-possible-matches'), {}),
+            ('artwork-suggestions', 'get', reverse('artwork-suggestions', args=[self.reference.pk]), {}),
+            ('artwork-similar-histories', 'get', reverse('artwork-similar-histories', args=[self.reference.pk]), {}),
+            ('align-histories', 'post', reverse('align-histories'), {}),
+            ('person-list', 'get', reverse('person-list'), {}),
+            ('person-detail', 'get', reverse('person-detail', args=[self.person.pk]), {'include': 'images'}),
+            ('person-batch', 'get', reverse('person-batch'), {'ids': person_ids, 'include': 'images'}),
+            ('event-type-list', 'get', reverse('event-type-list'), {}),
+            ('art-type-list', 'get', reverse('art-type-list'), {}),
+            ('medium-list', 'get', reverse('medium-list'), {}),
+            ('institution-list', 'get', reverse('institution-list'), {}),
+            ('auction-list', 'get', reverse('auction-list'), {}),
+            ('exhibition-list', 'get', reverse('exhibition-list'), {}),
+            ('source-list', 'get', reverse('source-list'), {}),
+            ('event-report', 'get', reverse('event-report'), {'event_type': self.sale.pk}),
+            ('export-event-report', 'post', reverse('export-event-report'), {}),
+            ('holding-list', 'get', reverse('holding-list'), {'artwork': artwork_ids, 'date': '1938'}),
+            ('holding-gaps', 'get', reverse('holding-gaps'), {'medium': self.medium.pk}),
+            ('export-holding-gaps', 'get', reverse('export-holding-gaps'), {}),
+            ('analytics', 'get', reverse('analytics'), {'group_by': 'decade,event_type', 'measure': 'artworks'}),
+            ('network-export', 'get', reverse('network-export'), {'format': 'gexf', 'group': self.group.pk}),
+            ('centrality-list', 'get', reverse('centrality-list'), {'metric': 'betweenness'}),
+            ('centrality-detail', 'get', reverse('centrality-detail', args=['person', collector.pk]), {}),
+            ('centrality-refresh', 'post', reverse('centrality-refresh'), {}),
+        ]
+
+    def test_every_api_endpoint_has_a_budget(self):
+        from django.urls import get_resolver
+        from . import api
+        from .query_budget import ENDPOINT_BUDGETS
+        self._grow(1)
+        names = {
+            pattern.name for pattern in get_resolver().url_patterns
+            if getattr(pattern, 'callback', None) and pattern.callback.__module__ == api.__name__
+        }
+        self.assertEqual(names - set(ENDPOINT_BUDGETS), set())
+        self.assertEqual({name for name, *_ in self._requests()}, set(ENDPOINT_BUDGETS))
+
+    def test_endpoints_stay_within_budget(self):
+        from django.contrib.contenttypes.models import ContentType
+        from . import analytics
+        from .artwork_matching import update_signatures
+        from .query_budget import ENDPOINT_BUDGETS, count_queries
+        counts = {}
+        for size in self.SIZES:
+            self._grow(size)
+            update_signatures()
+            ContentType.objects.clear_cache()
+            analytics.clear_cache()
+            for name, method, url, params in self._requests():
+                if name in self.LOGIN_ENDPOINTS:
+                    self.client.force_login(self.staff)
+                else:
+                    self.client.logout()
+                with count_queries() as counter:
+                    response = getattr(self.client, method)(url, params)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 300, name)
+                counts.setdefault(name, []).append(counter.count)
+        for name, by_size in counts.items():
+            with self.subTest(endpoint=name, queries=by_size):
+                self.assertLessEqual(max(by_size), ENDPOINT_BUDGETS[name])
+                self.assertEqual(len(set(by_size)), 1, "query count grows with the data")
+
+    def test_commands_stay_within_budget(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .query_budget import COMMAND_BUDGETS, count_queries
+        counts = {}
+        for size in self.SIZES:
+            for name in COMMAND_BUDGETS:
+                # Start every run from exactly `size` artworks.
+                call_command('clear_provenance_data', stdout=StringIO())
+                self.setUp()
+                self._grow(size)
+                with count_queries() as counter:
+                    call_command(name, stdout=StringIO())
+                counts.setdefault(name, []).append(counter.count)
+        for name, by_size in counts.items():
+            with self.subTest(command=name, queries=by_size):
+                self.assertLessEqual(max(by_size), COMMAND_BUDGETS[name])
+                self.assertEqual(len(set(by_size)), 1, "query count grows with the data")
+
+    @override_settings(QUERY_BUDGET_WARNINGS=True)
+    def test_middleware_warns_over_budget(self):
+        from unittest import mock
+        self._grow(1)
+        with mock.patch.dict('provenance.query_budget.ENDPOINT_BUDGETS', {'medium-list': 0}), \
+                self.assertLogs('provenance.query_budget', level='WARNING') as logs:
+            self.client.get('/api/mediums/')
+        self.assertIn("/api/mediums/ ran 1 queries, budget is 0", logs.output[0])
+
+
+class SourceFingerprintTest(TestCase):
+    def test_fingerprint_is_maintained_on_save(self):
+        from .sources import citation_fingerprint
+        source = Source.objects.create(source="Archiv X,  Bl. 3")
+        self.assertEqual(source.fingerprint, citation_fingerprint("archiv x, bl. 3"))
+        source.source = "Archiv Y"
+        source.save(update_fields=['source'])
+        source.refresh_from_db()
+        self.assertEqual(source.fingerprint, citation_fingerprint(" ARCHIV   y "))
+        with self.assertRaises(ValidationError):
+            Source(source="archiv y").full_clean()
+
+    def test_resolve_sources_in_bulk(self):
+        from .query_budget import count_queries
+        from .sources import resolve_sources
+        existing = Source.objects.create(source="Catalogue 1938")
+        citations = ["catalogue  1938", None, "", "Letter", "LETTER"] + [f"Note {n}" for n in range(20)]
+        with count_queries() as counter:
+            sources = resolve_sources(citations, defaults={"Letter": {'type': "letter"}})
+        self.assertEqual(counter.count, 3)
+        self.assertEqual(sources["catalogue  1938"], existing)
+        self.assertEqual(sources["Letter"], sources["LETTER"])
+        self.assertEqual(sources["Letter"].type, "letter")
+        self.assertNotIn("", sources)
+        self.assertEqual(Source.objects.count(), 22)
+        self.assertEqual(resolve_sources(["note 3"])["note 3"], sources["Note 3"])
+
+    def test_deduplicate_sources_merges_references(self):
+        from .sources import deduplicate_sources
+        survivor = Source.objects.create(source="Catalogue 1938")
+        # Rows loaded from fixtures carry no fingerprint.
+        Source.objects.bulk_create([Source(source="catalogue   1938"), Source(source="Unrelated")])
+        duplicate = Source.objects.get(source="catalogue   1938")
+        artwork = Artwork.objects.create(name="Artwork")
+        event = ProvenanceEvent.objects.create(artwork=artwork, sequence_number=1)
+        ProvenanceEventSource.objects.create(event=event, source=survivor)
+        ProvenanceEventSource.objects.create(event=event, source=duplicate)
+        ProvenanceEventSource.objects.create(event=event, source=duplicate, notes="p. 4")
+        auction = Auction.objects.create(name="Auction")
+        auction.sources.add(survivor, duplicate)
+
+        self.assertEqual(deduplicate_sources(), 1)
+        self.assertFalse(Source.objects.filter(pk=duplicate.pk).exists())
+        self.assertFalse(Source.objects.filter(fingerprint__isnull=True).exists())
+        self.assertEqual(
+            sorted(ProvenanceEventSource.objects.values_list('source_id', 'notes')),
+            [(survivor.pk, ""), (survivor.pk, "p. 4")],
+        )
+        self.assertEqual(list(auction.sources.all()), [survivor])
+
+
+class PersonDedupTest(TestCase):
+    def _person(self, family_name, first_name='', **fields):
+        from .models import Person
+        return Person.objects.create(family_name=family_name, first_name=first_name, **fields)
+
+    def test_keys(self):
+        from .persons import cologne_phonetic, normalize_name
+        self.assertEqual(cologne_phonetic("Müller-Lüdenscheidt"), "65752682")
+        self.assertEqual(cologne_phonetic("Wikipedia"), "3412")
+        self.assertEqual(cologne_phonetic("Meyer"), cologne_phonetic("Meier"))
+        self.assertEqual(normalize_name(" Müller-Lüdenscheidt "), "mueller luedenscheidt")
+        person = self._person("Schmidt", "Jörg")
+        self.assertEqual((person.name_key, person.phonetic_key), ("schmidt|joerg", cologne_phonetic("Schmitt")))
+
+    def test_find_duplicates_scores_names_dates_and_artworks(self):
+        from .persons import find_duplicate_persons
+        paul = self._person("Cassirer", "Paul", birth_date="21.02.1871")
+        variant = self._person("Casirer", "P.", birth_date="1871")
+        swapped = self._person("Paul", "Cassirer")
+        other = self._person("Cassirer", "Bruno", birth_date="1872")
+        different_life = self._person("Cassirer", "Paul", birth_date="1920")
+        pairs = {(c.person_id, c.other_id): c.score for c in find_duplicate_persons()}
+        self.assertIn((paul.pk, variant.pk), pairs)
+        self.assertIn((paul.pk, swapped.pk), pairs)
+        self.assertNotIn((paul.pk, other.pk), pairs)
+        self.assertNotIn((paul.pk, different_life.pk), pairs)
+
+        # A shared artwork lifts a borderline pair over the threshold.
+        borderline = self._person("Kasierer", "Paula")
+        self.assertNotIn((paul.pk, borderline.pk), {(c.person_id, c.other_id) for c in find_duplicate_persons()})
+        artwork = Artwork.objects.create(name="Artwork")
+        for seq, person in enumerate((paul, borderline)):
+            ProvenanceEvent.objects.create(artwork=artwork, sequence_number=seq, person=person)
+        self.assertIn((paul.pk, borderline.pk), {(c.person_id, c.other_id) for c in find_duplicate_persons()})
+
+    def test_match_persons(self):
+        from .models import Person
+        from .query_budget import count_queries
+        from .persons import match_persons
+        meyer = self._person("Meyer", "Hans")
+        self._person("Cassirer", "Paul")
+        self._person("Cassirer", "Bruno")
+        with count_queries() as counter:
+            persons = match_persons(["Meyer, Hans", "Meier, Hans", "Cassirer", "Neumann, J.B.", " "], create=True)
+        # The lookup and insert queries, plus bumping the Person data version.
+        self.assertEqual(counter.count, 4)
+        self.assertEqual(persons["Meyer, Hans"], meyer)
+        self.assertEqual(persons["Meier, Hans"], meyer)
+        # Two Cassirers fit equally well: a new person rather than a wrong link.
+        self.assertEqual((persons["Cassirer"].family_name, persons["Cassirer"].first_name), ("Cassirer", ""))
+        self.assertEqual(Person.objects.filter(family_name="Neumann").count(), 1)
+        self.assertNotIn(" ", persons)
+
+    def test_merge_repoints_references(self):
+        from django.contrib.contenttypes.models import ContentType
+        from .models import AuctionPerson, Image, Person
+        from .persons import merge_persons
+        a = self._person("Cassirer", "Paul")
+        b = self._person("Casirer", "Paul", birth_date="1871")
+        c = self._person("Cassirer", "P.")
+        artwork = Artwork.objects.create(name="Artwork")
+        event = ProvenanceEvent.objects.create(artwork=artwork, sequence_number=1, person=c)
+        auction = Auction.objects.create(name="Auction")
+        AuctionPerson.objects.create(auction=auction, person=a, role='expert')
+        AuctionPerson.objects.create(auction=auction, person=b, role='expert')
+        AuctionPerson.objects.create(auction=auction, person=b, role='auctioneer')
+        image = Image.objects.create(image="images/p.jpg", content_type=ContentType.objects.get_for_model(Person),
+                                     object_id=c.pk)
+
+        self.assertEqual(merge_persons([(a.pk, b.pk), (b.pk, c.pk)]), 2)
+        self.assertEqual(list(Person.objects.values_list('pk', flat=True)), [a.pk])
+        a.refresh_from_db()
+        self.assertEqual(a.birth_date, "1871")
+        event.refresh_from_db()
+        image.refresh_from_db()
+        self.assertEqual((event.person_id, image.object_id), (a.pk, a.pk))
+        self.assertEqual(
+            sorted(AuctionPerson.objects.values_list('person_id', 'role')), [(a.pk, 'auctioneer'), (a.pk, 'expert')],
+        )
+
+    def test_dedupe_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Person
+        keep = self._person("Cassirer", "Paul", birth_date="1871")
+        self._person("Cassirer", "Paul", birth_date="21.02.1871")
+        out = StringIO()
+        call_command('dedupe_persons', stdout=out)
+        self.assertIn("1 candidate pairs", out.getvalue())
+        self.assertEqual(Person.objects.count(), 2)
+        call_command('dedupe_persons', '--merge', stdout=StringIO())
+        self.assertEqual(list(Person.objects.values_list('pk', flat=True)), [keep.pk])
+
+
+class DateNormalizationTest(TestCase):
+    def test_normalize_date_spellings(self):
+        from .dates import normalize_date
+        self.assertEqual(normalize_date("1938-03-12"), "12.03.1938")
+        self.assertEqual(normalize_date("1938-03-12 00:00:00"), "12.03.1938")
+        self.assertEqual(normalize_date("1938-3-2T00:00"), "02.03.1938")
+        self.assertEqual(normalize_date(" 2.3.1938 "), "02.03.1938")
+        self.assertEqual(normalize_date("12.03.1938"), "12.03.1938")
+        for value in ("1938", "ca. 1920", "1938-1945", "1938-02-30", "", None):
+            self.assertEqual(normalize_date(value), value)
+
+    def test_command_normalizes_every_date_field(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import Person
+        person = Person.objects.create(family_name="Cassirer", birth_date="1871-02-21 00:00:00", death_date="1926")
+        other = Person.objects.create(family_name="Flechtheim", birth_date="1871-02-21 00:00:00")
+        institution = Institution.objects.create(name="Galerie", start_date="1.4.1898")
+        auction = Auction.objects.create(name="Lepke", date="1938-03-12")
+        exhibition = Exhibition.objects.create(name="Show", date_start="1910-05-01", date_end="1910-06-30")
+        artwork = Artwork.objects.create(name="Still Life")
+        event_type = EventType.objects.create(name="Sale")
+        event = ProvenanceEvent.objects.create(artwork=artwork, event_type=event_type, date="1938-03-12",
+                                               sequence_number=1, person=person)
+
+        out = StringIO()
+        call_command('normalize_dates', '--dry-run', stdout=out)
+        self.assertIn("Person.birth_date: 1 values, 2 rows", out.getvalue())
+        self.assertIn("'1938-03-12' -> '12.03.1938' (1)", out.getvalue())
+        person.refresh_from_db()
+        self.assertEqual(person.birth_date, "1871-02-21 00:00:00")
+
+        call_command('normalize_dates', '--field', 'Person.birth_date', stdout=StringIO())
+        auction.refresh_from_db()
+        self.assertEqual(auction.date, "1938-03-12")
+
+        call_command('normalize_dates', stdout=StringIO())
+        for obj, field, expected in [
+            (person, 'birth_date', "21.02.1871"), (person, 'death_date', "1926"),
+            (other, 'birth_date', "21.02.1871"), (institution, 'start_date', "01.04.1898"),
+            (auction, 'date', "12.03.1938"), (exhibition, 'date_start', "01.05.1910"),
+            (exhibition, 'date_end', "30.06.1910"), (event, 'date', "12.03.1938"),
+        ]:
+            obj.refresh_from_db()
+            self.assertEqual(getattr(obj, field), expected)
+        self.assertEqual(event.year, 1938)
+
+        out = StringIO()
+        call_command('normalize_dates', stdout=out)
+        self.assertIn("Normalized 0 dates.", out.getvalue())
+
+
+class HoldingIntervalTest(TestCase):
+    def setUp(self):
+        from .models import Person
+        self.sale = EventType.objects.create(name="Sale")
+        self.artwork = Artwork.objects.create(name="Still Life")
+        self.cassirer = Person.objects.create(family_name="Cassirer", first_name="Paul")
+        self.museum = Institution.objects.create(name="Nationalgalerie")
+        self.events = [
+            self._event(1, "1910", person=self.cassirer),
+            self._event(2, "", person=self.cassirer),  # undated: no interval of its own
+            self._event(3, "12.03.1938", institution=self.museum),
+            self._event(4, "1950", certainty='false'),  # disproven
+        ]
+
+    def _event(self, seq, date, certainty='proven', **actor):
+        return ProvenanceEvent.objects.create(artwork=self.artwork, event_type=self.sale, sequence_number=seq,
+                                              date=date, certainty=certainty, **actor)
+
+    def _holdings(self, **params):
+        response = self.client.get('/api/holdings/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(row['event_id'], row['start'], row['end']) for row in response.json()['results']]
+
+    def test_intervals_follow_dated_events(self):
+        from .models import HoldingInterval
+        intervals = HoldingInterval.objects.order_by('start').values_list('event_id', 'start', 'end', 'person_id')
+        self.assertEqual([(e, str(s), str(end), p) for e, s, end, p in intervals], [
+            (self.events[0].pk, "1910-01-01", "1938-03-12", self.cassirer.pk),
+            (self.events[2].pk, "1938-03-12", "None", None),
+        ])
+
+    def test_point_and_range_queries(self):
+        first, museum = self.events[0].pk, self.events[2].pk
+        self.assertEqual(self._holdings(artwork=self.artwork.pk, date="1920"), [(first, "1910-01-01", "1938-03-12")])
+        self.assertEqual(self._holdings(artwork=self.artwork.pk, date="11.03.1938"),
+                         [(first, "1910-01-01", "1938-03-12")])
+        self.assertEqual(self._holdings(artwork=self.artwork.pk, date="1938-03-12"), [(museum, "1938-03-12", None)])
+        self.assertEqual([row[0] for row in self._holdings(artwork=self.artwork.pk, date="1938")], [first, museum])
+        self.assertEqual(self._holdings(artwork=self.artwork.pk, date="1900"), [])
+
+        self.assertEqual([row[0] for row in self._holdings(person=self.cassirer.pk, **{'from': "1933", 'to': "1945"})],
+                         [first])
+        self.assertEqual(self._holdings(person=self.cassirer.pk, **{'from': "1939"}), [])
+        self.assertEqual([row[0] for row in self._holdings(institution=self.museum.pk, date="2020")], [museum])
+        self.assertEqual(self._holdings(institution=self.museum.pk, certainty="likely"), [])
+
+        for params in [{}, {'artwork': self.artwork.pk, 'date': "soon"},
+                       {'artwork': self.artwork.pk, 'date': "1938", 'to': "1940"}]:
+            self.assertEqual(self.client.get('/api/holdings/', params).status_code, 400)
+
+    def test_event_changes_rebuild_intervals(self):
+        from .holdings import deferred_rebuild
+        from .models import HoldingInterval
+        self.events[1].date = "1925"
+        self.events[1].save()
+        self.assertEqual(self._holdings(artwork=self.artwork.pk, date="1930"),
+                         [(self.events[1].pk, "1925-01-01", "1938-03-12")])
+
+        self.events[2].delete()
+        self.assertEqual(self._holdings(artwork=self.artwork.pk, date="2000"), [(self.events[1].pk, "1925-01-01", None)])
+
+        other = Artwork.objects.create(name="Landscape")
+        with deferred_rebuild():
+            self.events[1].artwork = other
+            self.events[1].save()
+            self.assertEqual(HoldingInterval.objects.filter(artwork=other).count(), 0)
+        self.assertEqual(HoldingInterval.objects.get(artwork=other).event_id, self.events[1].pk)
+        self.assertEqual(self._holdings(artwork=self.artwork.pk, date="2000"), [(self.events[0].pk, "1910-01-01", None)])
+
+
+class GapReportTest(TestCase):
+    def setUp(self):
+        from .models import Person
+        self.sale = EventType.objects.create(name="Sale")
+        self.medium = Medium.objects.create(name="Oil")
+        self.collector = Person.objects.create(family_name="Cassirer")
+        self.dealer = Person.objects.create(family_name="Flechtheim")
+        self.museum = Institution.objects.create(name="Nationalgalerie")
+        self.uncertain = self._artwork("Uncertain", [
+            ("1936", 'proven', {'person': self.collector}),
+            ("12.03.1938", 'possible', {'institution': self.museum}),
+            ("1950", 'proven', {'person': self.dealer}),
+        ], medium=self.medium)
+        self.contested = self._artwork("Contested", [
+            ("1920", 'proven', {'person': self.collector}),
+            ("1938", 'proven', {'person': self.dealer}),
+            ("1938", 'proven', {'institution': self.museum}),
+        ])
+        self._artwork("Later", [("1950", 'proven', {'person': self.collector})])
+        self._artwork("Documented", [("1900", 'proven', {'person': self.collector})])
+
+    def _artwork(self, name, events, **fields):
+        artwork = Artwork.objects.create(name=name, **fields)
+        for seq, (date, certainty, actor) in enumerate(events):
+            ProvenanceEvent.objects.create(artwork=artwork, event_type=self.sale, sequence_number=seq, date=date,
+                                           certainty=certainty, **actor)
+        return artwork
+
+    def _gaps(self, **params):
+        response = self.client.get('/api/holdings/gaps/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_spans_and_scores(self):
+        from datetime import date
+        data = self._gaps()
+        self.assertEqual((data['from'], data['to'], data['count']), ("1933-01-01", "1946-01-01", 2))
+        uncertain, contested = data['results']
+        self.assertEqual(uncertain['artwork_id'], self.uncertain.pk)
+        self.assertEqual(uncertain['spans'], [
+            {'kind': 'gap', 'start': "1933-01-01", 'end': "1936-01-01"},
+            {'kind': 'low_certainty', 'start': "1938-03-12", 'end': "1946-01-01"},
+        ])
+        window = (date(1946, 1, 1) - date(1933, 1, 1)).days
+        low = (date(1946, 1, 1) - date(1938, 3, 12)).days
+        self.assertEqual((uncertain['gap_days'], uncertain['low_certainty_days']), (1095, low))
+        self.assertAlmostEqual(uncertain['score'], (1095 + 0.5 * low) / window, places=4)
+
+        self.assertEqual(contested['artwork_id'], self.contested.pk)
+        self.assertEqual(contested['spans'], [{'kind': 'overlap', 'start': "1938-01-01", 'end': "1939-01-01"}])
+        self.assertEqual(contested['score'], 0)
+
+    def test_filters_and_pagination(self):
+        def ids(**params):
+            return [row['artwork_id'] for row in self._gaps(**params)['results']]
+        self.assertEqual(ids(kind='overlap'), [self.contested.pk])
+        self.assertEqual(ids(min_score='0.01'), [self.uncertain.pk])
+        self.assertEqual(ids(medium=self.medium.pk), [self.uncertain.pk])
+        self.assertEqual(ids(**{'from': '1940', 'to': '1945'}), [self.uncertain.pk])
+        self.assertEqual(ids(**{'from': '1800', 'to': '1850'}), [])
+        data = self._gaps(page_size=1, page=2)
+        self.assertEqual((data['num_pages'], [row['artwork_id'] for row in data['results']]), (2, [self.contested.pk]))
+        for params in [{'kind': 'missing'}, {'min_score': 'high'}, {'from': '1945', 'to': '1933'}]:
+            self.assertEqual(self.client.get('/api/holdings/gaps/', params).status_code, 400)
+
+    def test_export_streams_one_line_per_span(self):
+        response = self.client.get('/api/holdings/gaps/export/')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "artwork_id,artwork_name,score,kind,start,end,days")
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith(f"{self.uncertain.pk},Uncertain,"))
+        self.assertTrue(lines[1].endswith(",gap,1933-01-01,1936-01-01,1095"))
+
+
+class AnalyticsTest(TestCase):
+    def setUp(self):
+        from . import analytics
+        from .models import InstitutionType, Person
+        analytics.clear_cache()
+        self.addCleanup(analytics.clear_cache)
+        self.sale = EventType.objects.create(name="Sale")
+        self.loan = EventType.objects.create(name="Loan")
+        self.painting = ArtType.objects.create(name="Painting")
+        self.print = ArtType.objects.create(name="Print")
+        oil = Medium.objects.create(name="Oil", type=self.painting)
+        etching = Medium.objects.create(name="Etching", type=self.print)
+        self.museum_type = InstitutionType.objects.create(name="Museum")
+        self.museum = Institution.objects.create(name="Nationalgalerie", type=self.museum_type)
+        self.auction = Auction.objects.create(name="Lepke", institution=Institution.objects.create(name="Lepke"))
+        self.person = Person.objects.create(family_name="Cassirer")
+        self.paintings = [Artwork.objects.create(name=f"Painting {n}", medium=oil) for n in range(3)]
+        self.etching = Artwork.objects.create(name="Etching", medium=etching)
+        for artwork in self.paintings:
+            self._event(artwork, self.sale, "1925", 'proven', auction=self.auction)
+            self._event(artwork, self.loan, "1937", 'possible', institution=self.museum)
+        self._event(self.etching, self.sale, "1938", 'proven', person=self.person)
+        self._event(self.etching, self.sale, "1939", 'likely', person=self.person)
+
+    def _event(self, artwork, event_type, date, certainty, **actor):
+        seq = ProvenanceEvent.objects.filter(artwork=artwork).count()
+        return ProvenanceEvent.objects.create(artwork=artwork, event_type=event_type, sequence_number=seq,
+                                              date=date, certainty=certainty, **actor)
+
+    def _query(self, **params):
+        response = self.client.get('/api/analytics/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_group_by_decade_and_event_type(self):
+        data = self._query(group_by='decade,event_type')
+        self.assertEqual(data['total'], 8)
+        self.assertEqual(
+            [(row['decade']['name'], row['event_type']['name'], row['count']) for row in data['results']],
+            [("1920s", "Sale", 3), ("1930s", "Loan", 3), ("1930s", "Sale", 2)],
+        )
+
+    def test_auction_share_per_art_type(self):
+        data = self._query(group_by='art_type,actor_type', event_type=self.sale.pk)
+        rows = {(row['art_type']['name'], row['actor_type']['id']): row for row in data['results']}
+        self.assertEqual(rows[("Painting", 'auction')]['share'], 1.0)
+        self.assertEqual(rows[("Print", 'person')]['count'], 2)
+
+        # Auctions count for the auction house's institution.
+        data = self._query(group_by='institution', measure='artworks', actor_type='auction')
+        self.assertEqual([(row['institution']['name'], row['count']) for row in data['results']], [("Lepke", 3)])
+
+    def test_filters_and_measures(self):
+        data = self._query(group_by='certainty', institution_type=self.museum_type.pk)
+        self.assertEqual([(row['certainty']['id'], row['count']) for row in data['results']], [('possible', 3)])
+        data = self._query(measure='artworks', year_from=1938, year_to=1939)
+        self.assertEqual((data['total'], data['results'][0]['count']), (1, 1))
+        for params in [{'group_by': 'colour'}, {'measure': 'sum'}, {'certainty': 'sure'}, {'person': 'x'}]:
+            self.assertEqual(self.client.get('/api/analytics/', params).status_code, 400)
+
+    def test_reloads_only_changed_tables(self):
+        from . import analytics
+        from .query_budget import count_queries
+        from .versions import data_versions
+        corpus = analytics.get_corpus()
+        with count_queries() as counter:
+            self._query(group_by='event_type')
+        self.assertEqual(counter.count, 1)
+
+        self._event(self.etching, self.loan, "1950", 'proven', institution=self.museum)
+        self.assertEqual(corpus.refresh(data_versions()), ['events'])
+        self.assertEqual(self._query(group_by='event_type')['total'], 9)
+
+        self.museum.name = "Neue Nationalgalerie"
+        self.museum.save()
+        self.assertEqual(corpus.refresh(data_versions()), ['institutions'])
+
+    def test_deleting_an_actor_refreshes_its_events(self):
+        def actor_types():
+            return {row['actor_type']['id']: row['count'] for row in self._query(group_by='actor_type')['results']}
+
+        self.assertEqual(actor_types()['person'], 2)
+        # The events' person is set to null by an UPDATE that sends no signal.
+        self.person.delete()
+        self.assertNotIn('person', actor_types())
+        self.auction.institution.delete()
+        data = self._query(group_by='institution', actor_type='auction')
+        self.assertEqual([row['institution']['id'] for row in data['results']], [None])
+
+
+class CentralityTest(TestCase):
+    def setUp(self):
+        from .models import Person
+        self.a, self.b, self.c, self.d = (Person.objects.create(family_name=name) for name in "ABCD")
+        self.house = Institution.objects.create(name="Lepke")
+        auction = Auction.objects.create(name="Lepke 1935", institution=self.house)
+        # A -> B -> D and A -> C -> D; the auction house sells to A.
+        for holders in ([{'person': self.a}, {'person': self.b}, {'person': self.d}],
+                        [{'person': self.a}, {'person': self.c}, {'person': self.d}],
+                        [{'auction': auction}, {'person': self.a}, {'person': self.a}]):
+            artwork = Artwork.objects.create(name="Artwork")
+            for seq, actor in enumerate(holders):
+                ProvenanceEvent.objects.create(artwork=artwork, sequence_number=seq, **actor)
+        # Disproven events are not transfers.
+        ProvenanceEvent.objects.create(artwork=artwork, sequence_number=3, person=self.d, certainty='false')
+
+    def _metrics(self):
+        from .models import ActorCentrality
+        return {(row.actor_type, row.actor_id): row for row in ActorCentrality.objects.all()}
+
+    def test_metrics(self):
+        from .network import compute_centrality
+        self.assertEqual(compute_centrality()['actors'], 5)
+        metrics = self._metrics()
+        a, b, d = (metrics[('person', p.pk)] for p in (self.a, self.b, self.d))
+        self.assertEqual((a.in_degree, a.out_degree, a.degree), (1, 2, 3))
+        self.assertEqual((d.in_degree, d.out_degree), (2, 0))
+        self.assertEqual(metrics[('institution', self.house.pk)].out_degree, 1)
+        # Paths from the house run through A; A -> D splits over B and C.
+        self.assertAlmostEqual(a.betweenness, 3 / 12)
+        self.assertAlmostEqual(b.betweenness, 1 / 12)
+        self.assertEqual(d.betweenness, 0)
+        self.assertAlmostEqual(sum(row.pagerank for row in metrics.values()), 1)
+        self.assertEqual(max(metrics.values(), key=lambda row: row.pagerank), d)
+
+    def test_batched_and_sampled_betweenness(self):
+        from unittest import mock
+        import numpy as np
+        from scipy import sparse
+        from .network import betweenness
+        # A ring with chords looks the same from every actor.
+        n = 60
+        src = np.r_[np.arange(n), np.arange(n)]
+        dst = np.r_[(np.arange(n) + 1) % n, (np.arange(n) + 7) % n]
+        graph = sparse.csr_matrix((np.ones(2 * n), (src, dst)), shape=(n, n))
+        exact = betweenness(graph)
+        self.assertTrue(np.allclose(exact, exact[0]))
+        with mock.patch('provenance.network.BETWEENNESS_BATCH_CELLS', 7 * n):
+            self.assertTrue(np.allclose(betweenness(graph), exact))
+        # Every source contributes the same total, so the estimate's sum is exact.
+        self.assertAlmostEqual(betweenness(graph, samples=20).sum(), exact.sum())
+
+    def test_deleting_an_actor_makes_the_metrics_stale(self):
+        from .network import compute_centrality, network_version
+        compute_centrality()
+        for actor in (self.b, self.house):
+            version = network_version()
+            actor.delete()
+            self.assertGreater(network_version(), version)
+            self.assertTrue(self.client.get('/api/network/centrality/').json()['stale'])
+            compute_centrality()
+
+    def test_api_reports_stale_and_staff_refreshes(self):
+        from django.contrib.auth.models import User
+        from .jobs import run_pending
+        from .models import Job
+        data = self.client.get('/api/network/centrality/').json()
+        self.assertEqual((data['stale'], data['results'], data['job']), (True, [], None))
+        self.assertFalse(Job.objects.exists())
+
+        self.assertEqual(self.client.post('/api/network/centrality/refresh/').status_code, 403)
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+        response = self.client.post('/api/network/centrality/refresh/')
+        self.assertEqual(response.status_code, 202)
+        # A refresh of the same data reuses the queued job.
+        again = self.client.post('/api/network/centrality/refresh/')
+        self.assertEqual((again.status_code, again.json()['id']), (200, response.json()['id']))
+        self.assertEqual(self.client.get('/api/network/centrality/').json()['job']['id'], response.json()['id'])
+        run_pending()
+
+        data = self.client.get('/api/network/centrality/', {'metric': 'betweenness', 'type': 'person'}).json()
+        self.assertFalse(data['stale'])
+        self.assertEqual([(row['name'], row['actor_type']) for row in data['results'][:2]],
+                         [("A", 'person'), ("B", 'person')])
+        data = self.client.get(f'/api/network/centrality/person/{self.a.pk}/').json()
+        self.assertEqual((data['degree'], data['rank']['degree'], data['rank']['betweenness']), (3, 1, 1))
+
+        ProvenanceEvent.objects.filter(person=self.b).first().delete()
+        self.assertTrue(self.client.get('/api/network/centrality/').json()['stale'])
+        self.assertEqual(Job.objects.filter(kind='compute_centrality').count(), 1)
+        self.assertEqual(self.client.post('/api/network/centrality/refresh/').status_code, 202)
+
+        self.assertEqual(self.client.get('/api/network/centrality/', {'metric': 'fame'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/network/centrality/', {'type': 'dealer'}).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/network/centrality/dealer/{self.a.pk}/').status_code, 404)
+
+
+class NetworkExportTest(TestCase):
+    def setUp(self):
+        from .models import ArtworkGroup, ArtworkRelationship, AuctionPerson, Person
+        self.dealer = Person.objects.create(family_name="Cassirer", first_name="Paul")
+        self.buyer = Person.objects.create(family_name="Meyer & Söhne")
+        self.auction = Auction.objects.create(name="Lepke", institution=Institution.objects.create(name="Lepke"))
+        AuctionPerson.objects.create(auction=self.auction, person=self.buyer, role='buyer')
+        self.group = ArtworkGroup.objects.create(name="Bequest")
+        self.painting = Artwork.objects.create(name="Landscape <1>")
+        self.painting.groups.add(self.group)
+        self.copy = Artwork.objects.create(name="Landscape (copy)")
+        ArtworkRelationship.objects.create(source_artwork=self.copy, target_artwork=self.painting, type='copy_of')
+        for seq, (date, actor) in enumerate([("1925", {'person': self.dealer}), ("1937", {'auction': self.auction}),
+                                             ("1937", {'person': self.buyer})]):
+            ProvenanceEvent.objects.create(artwork=self.painting, sequence_number=seq, date=date,
+                                           year=int(date), certainty='proven', **actor)
+        ProvenanceEvent.objects.create(artwork=self.copy, sequence_number=0, date="1950", year=1950,
+                                       person=self.dealer)
+
+    def _export(self, **params):
+        response = self.client.get('/api/network/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_graphml(self):
+        import xml.etree.ElementTree as ET
+        ns = {'g': 'http://graphml.graphdrawing.org/xmlns'}
+        root = ET.fromstring(self._export())
+        node_ids = {node.get('id') for node in root.iterfind('.//g:node', ns)}
+        self.assertIn(f'artwork:{self.painting.pk}', node_ids)
+        self.assertIn(f'institution:{self.auction.institution_id}', node_ids)
+        edges = [
+            (edge.get('source'), edge.get('target'),
+             {data.get('key'): data.text for data in edge.iterfind('g:data', ns)})
+            for edge in root.iterfind('.//g:edge', ns)
+        ]
+        self.assertTrue({source for source, *_ in edges} | {target for _, target, _ in edges} <= node_ids)
+        transfers = [(source, target) for source, target, data in edges if data['e_kind'] == 'transfer']
+        # The auction's event is attributed to the auction house.
+        self.assertEqual(transfers, [
+            (f'person:{self.dealer.pk}', f'institution:{self.auction.institution_id}'),
+            (f'institution:{self.auction.institution_id}', f'person:{self.buyer.pk}'),
+        ])
+        kinds = sorted(data['e_kind'] for *_, data in edges)
+        self.assertEqual(kinds, ['auction_person', 'event', 'event', 'event', 'event', 'relationship',
+                                 'transfer', 'transfer'])
+
+    def test_gexf_and_csv_with_filters(self):
+        import csv
+        import io
+        import xml.etree.ElementTree as ET
+        ns = {'x': 'http://gexf.net/1.3'}
+        root = ET.fromstring(self._export(format='gexf', group=self.group.pk, year_to=1930))
+        labels = {node.get('id'): node.get('label') for node in root.iterfind('.//x:node', ns)}
+        self.assertEqual(labels, {f'person:{self.dealer.pk}': "Cassirer, Paul",
+                                  f'artwork:{self.painting.pk}': "Landscape <1>"})
+        self.assertEqual(len(root.findall('.//x:edge', ns)), 1)
+
+        rows = list(csv.DictReader(io.StringIO(self._export(format='csv', year_from=1937))))
+        self.assertEqual(sorted(row['kind'] for row in rows),
+                         ['auction_person', 'event', 'event', 'event', 'relationship', 'transfer'])
+        self.assertEqual(self.client.get('/api/network/export/', {'format': 'dot'}).status_code, 400)
+
+
+class ImageHashTest(TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _picture(self, seed, size=(120, 90), brightness=0):
+        import numpy as np
+        from PIL import Image as PILImage
+        rng = np.random.default_rng(seed)
+        # Smooth blobs, upscaled from a coarse random grid.
+        coarse = PILImage.fromarray(rng.integers(0, 256, (6, 8), dtype=np.uint8)).resize(size, PILImage.BICUBIC)
+        return PILImage.fromarray(np.clip(np.asarray(coarse, dtype=np.int64) + brightness, 0, 255).astype(np.uint8))
+
+    def _artwork(self, name, picture, fmt='PNG'):
+        import io
+        from django.contrib.contenttypes.models import ContentType
+        from django.core.files.base import ContentFile
+        from .models import Image
+        artwork = Artwork.objects.create(name=name)
+        data = io.BytesIO()
+        picture.convert('RGB').save(data, fmt)
+        image = Image(content_type=ContentType.objects.get_for_model(Artwork), object_id=artwork.pk)
+        image.image.save(f"{name}.{fmt.lower()}", ContentFile(data.getvalue()), save=True)
+        return artwork
+
+    def test_finds_and_proposes_visual_duplicates(self):
+        from io import StringIO
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from django.core.management import CommandError, call_command
+        from .image_hashes import find_similar_images, hash_images, propose_possible_matches
+        from .models import ArtworkRelationship
+        original = self._artwork("Original", self._picture(1))
+        scan = self._artwork("Scan", self._picture(1, size=(400, 300), brightness=12), fmt='JPEG')
+        other = self._artwork("Other", self._picture(2))
+        self.assertEqual(hash_images(), (3, 0))
+        self.assertEqual(hash_images(), (0, 0))
+
+        matches = find_similar_images()
+        self.assertEqual([(m.artwork_id, m.other_id) for m in matches], [(original.pk, scan.pk)])
+        self.assertLessEqual(matches[0].distance, 4)
+
+        response = self.client.get(f'/api/artworks/{scan.pk}/similar/')
+        self.assertEqual([row['artwork_name'] for row in response.json()['results']], ["Original"])
+        self.assertEqual(self.client.get(f'/api/artworks/{other.pk}/similar/').json()['results'], [])
+        self.assertEqual(self.client.get(f'/api/artworks/{other.pk}/similar/', {'distance': 99}).status_code, 400)
+        self.assertEqual(self.client.get('/api/artworks/999999/similar/').status_code, 404)
+
+        self.assertEqual(self.client.post('/api/artworks/possible-matches/').status_code, 403)
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+        self.assertEqual(self.client.post('/api/artworks/possible-matches/').status_code, 202)
+        with self.assertRaisesMessage(CommandError, "distance must be between"), \
+                mock.patch('provenance.management.commands.find_possible_matches.hash_images') as hash_images:
+            call_command('find_possible_matches', '--distance', '99', stdout=StringIO())
+        hash_images.assert_not_called()
+
+        self.assertEqual(propose_possible_matches(matches), 1)
+        self.assertEqual(propose_possible_matches(matches), 0)
+        relationship = ArtworkRelationship.objects.get()
+        self.assertEqual((relationship.source_artwork, relationship.type), (original, 'possible_match'))
+
+    def test_rehashes_replaced_and_skips_unreadable_files(self):
+        from django.contrib.contenttypes.models import ContentType
+        from django.core.files.base import ContentFile
+        from .image_hashes import hash_images
+        from .models import Image, ImageHash
+        artwork = self._artwork("Original", self._picture(1))
+        Image.objects.create(image="images/missing.png", content_type=ContentType.objects.get_for_model(Artwork),
+                             object_id=artwork.pk)
+        self.assertEqual(hash_images(), (1, 1))
+        before = ImageHash.objects.get().phash
+
+        image = Image.objects.get(image__endswith="Original.png")
+        import io
+        data = io.BytesIO()
+        self._picture(2).save(data, 'PNG')
+        image.image.save("replaced.png", ContentFile(data.getvalue()), save=True)
+        self.assertEqual(hash_images(), (1, 1))
+        self.assertNotEqual(ImageHash.objects.get().phash, before)
+
+    def test_band_index_finds_every_pair_within_distance(self):
+        import random
+        from django.contrib.contenttypes.models import ContentType
+        from .image_hashes import find_similar_images, hamming, hash_fields, similar_artworks
+        from .models import Image, ImageHash
+        rng = random.Random(0)
+        base = rng.getrandbits(64)
+        hashes = [base ^ sum(1 << bit for bit in rng.sample(range(64), rng.randint(0, 14))) for _ in range(40)]
+        artworks = Artwork.objects.bulk_create(Artwork(name=f"Artwork {n}") for n in range(len(hashes)))
+        content_type = ContentType.objects.get_for_model(Artwork)
+        for artwork, value in zip(artworks, hashes):
+            image = Image.objects.create(image=f"images/{artwork.pk}.png", content_type=content_type,
+                                         object_id=artwork.pk)
+            ImageHash.objects.create(image=image, artwork=artwork, file=image.image.name,
+                                     **hash_fields(value, value, value))
+        for distance in (3, 8, 11):
+            expected = {
+                (a.pk, b.pk) for (a, x) in zip(artworks, hashes) for (b, y) in zip(artworks, hashes)
+                if a.pk < b.pk and hamming(x, y) <= distance
+            }
+            with self.subTest(distance=distance):
+                self.assertEqual({(m.artwork_id, m.other_id) for m in find_similar_images(distance)}, expected)
+                found = {tuple(sorted((artworks[0].pk, pk))) for pk in similar_artworks(artworks[0].pk, distance)}
+                self.assertEqual(found, {pair for pair in expected if artworks[0].pk in pair})
+
+
+class ArtworkMatchingTest(TestCase):
+    def setUp(self):
+        self.oil = Medium.objects.create(name="Oil", type=ArtType.objects.create(name="Painting"))
+        self.paper = Medium.objects.create(name="Paper", type=ArtType.objects.create(name="Drawing"))
+        self.sale = EventType.objects.create(name="Sale")
+        self.dealer = Institution.objects.create(name="Galerie Thannhauser")
+
+    def _artwork(self, name, dimension='', medium=None, holder=None):
+        artwork = Artwork.objects.create(name=name, dimension=dimension, medium=medium)
+        if holder:
+            ProvenanceEvent.objects.create(artwork=artwork, sequence_number=1, event_type=self.sale,
+                                           institution=holder)
+        return artwork
+
+    def test_parse_dimension(self):
+        from .dimensions import Dimensions, parse_dimension
+        cases = {
+            "65 x 81 cm": Dimensions(65, 81, None, 'cm'),
+            "65,5 × 81 × 3 cm": Dimensions(65.5, 81, 3, 'cm'),
+            "24 x 30 in": Dimensions(60.96, 76.2, None, 'in'),
+            "120 x 90 mm (Blatt)": Dimensions(12, 9, None, 'mm'),
+            "H. 12,5 cm": Dimensions(12.5, None, None, 'cm'),
+            "h 30, b 20 cm": Dimensions(30, 20, None, 'cm'),
+            "Höhe: 40 cm; Breite 30 cm": Dimensions(40, 30, None, 'cm'),
+            "Ø 30 cm": Dimensions(30, 30, None, 'cm'),
+            "Durchm. 40 cm": Dimensions(40, 40, None, 'cm'),
+            "65 x 81 cm (25 x 32 in)": Dimensions(65, 81, None, 'cm'),
+            "65 x 81 cm; 25 x 32 in": Dimensions(65, 81, None, 'cm'),
+            "unbekannt": None,
+            "": None,
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_dimension(text), expected)
+
+    def test_suggests_similar_artworks_incrementally(self):
+        from .artwork_matching import suggest_matches, update_signatures
+        original = self._artwork("Kühe am Fluss", "65 x 81 cm", self.oil, self.dealer)
+        variant = self._artwork("Kuehe am Fluß (Nr. 2)", "81 x 65 cm", self.oil, self.dealer)
+        self._artwork("Kühe am Fluss", "12 x 9 cm", self.paper)
+        self._artwork("Bildnis einer Dame", "65 x 81 cm", self.oil, self.dealer)
+        self.assertEqual(len(update_signatures()), 4)
+        self.assertEqual(update_signatures(), [])
+
+        suggestions = suggest_matches()
+        self.assertEqual([(s.artwork_id, s.other_id) for s in suggestions], [(original.pk, variant.pk)])
+        self.assertEqual(suggestions[0].components['dimension'], 1.0)
+
+        late = self._artwork("Kühe am Fluss", "65 x 80 cm", self.oil)
+        self.assertEqual(update_signatures(), [late.pk])
+        self.assertEqual({(s.artwork_id, s.other_id) for s in suggest_matches([late.pk])},
+                         {(original.pk, late.pk), (variant.pk, late.pk)})
+
+    def test_api_and_command_record_possible_matches(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import ArtworkRelationship
+        original = self._artwork("Landschaft mit Mühle", "50 x 60 cm", self.oil, self.dealer)
+        copy = self._artwork("Landschaft mit Muehle", "50,5 x 60 cm", self.oil, self.dealer)
+        # Suggestions for an artwork that has no stored buckets yet are computed live.
+        call_command('suggest_artwork_matches', stdout=StringIO())
+        fresh = self._artwork("Landschaft mit der Mühle", "50 x 60 cm", self.oil)
+        response = self.client.get(f'/api/artworks/{fresh.pk}/suggestions/')
+        self.assertEqual({row['artwork_id'] for row in response.json()['results']}, {original.pk, copy.pk})
+        self.assertEqual(self.client.get(f'/api/artworks/{fresh.pk}/suggestions/', {'threshold': 2}).status_code,
+                         400)
+        self.assertEqual(self.client.get('/api/artworks/999999/suggestions/').status_code, 404)
+
+        out = StringIO()
+        call_command('suggest_artwork_matches', '--all', '--propose', stdout=out)
+        self.assertIn("Recorded 3 possible matches.", out.getvalue())
+        self.assertEqual(ArtworkRelationship.objects.filter(type='possible_match').count(), 3)
+        # Related pairs are not suggested again.
+        self.assertEqual(self.client.get(f'/api/artworks/{fresh.pk}/suggestions/').json()['results'], [])
+
+    def test_lsh_finds_close_pairs_without_comparing_all(self):
+        import random
+        from .artwork_matching import score_pair, suggest_matches, load_features, update_signatures
+        rng = random.Random(0)
+        words = ["Stillleben", "Landschaft", "Bildnis", "Garten", "Hafen", "Brücke", "Abend", "Winter", "Mädchen",
+                 "Blumen", "Kirche", "Dorf", "Meer", "Wald", "Akt", "Strasse"]
+        for n in range(60):
+            title = ' '.join(rng.sample(words, 3))
+            self._artwork(title, f"{rng.randint(20, 120)} x {rng.randint(20, 120)} cm", rng.choice([self.oil, None]))
+            if n % 3 == 0:
+                self._artwork(title, "", rng.choice([self.oil, self.paper]))
+        update_signatures()
+        features = load_features()
+        ids = sorted(features)
+        expected = {
+            (a, b) for n, a in enumerate(ids) for b in ids[n + 1:] if score_pair(features[a], features[b])[0] >= 0.9
+        }
+        found = {(s.artwork_id, s.other_id) for s in suggest_matches(threshold=0.9)}
+        self.assertGreaterEqual(len(expected), 10)
+        self.assertGreaterEqual(len(found & expected) / len(expected), 0.95)
+        self.assertEqual(found - expected, set())
+
+
+class ChainAlignmentTest(TestCase):
+    def setUp(self):
+        from .models import Person
+        self.sale = EventType.objects.create(name="Sale")
+        self.gift = EventType.objects.create(name="Gift")
+        self.persons = [Person.objects.create(family_name=f"Owner {n}") for n in range(6)]
+        self.dealer = Institution.objects.create(name="Galerie Flechtheim")
+
+    def _artwork(self, name, holders):
+        artwork = Artwork.objects.create(name=name)
+        for seq, holder in enumerate(holders):
+            actor = {'institution': holder} if isinstance(holder, Institution) else {'person': holder}
+            ProvenanceEvent.objects.create(artwork=artwork, sequence_number=seq, event_type=self.sale, **actor)
+        return artwork
+
+    def test_local_alignment_scores_shared_stretches(self):
+        from .chain_alignment import Token, align, compare
+        p = [('person', n) for n in range(6)]
+        chain = [Token(n, actor, 1) for n, actor in enumerate(p[:4])]
+        # The same stretch of owners, with an extra event before and inside it.
+        other = [Token(10, p[5], 1), Token(11, p[0], 1), Token(12, p[1], 2), Token(13, None, 1), Token(14, p[2], 1)]
+        raw, pairs = align(chain, other)
+        self.assertEqual(pairs, [(0, 1), (1, 2), (2, 4)])
+        self.assertEqual(raw, 3 + 2 - 1 + 3)
+        match = compare(1, chain, 2, other)
+        self.assertEqual((match.shared_actors, match.pairs), (3, [(0, 11), (1, 12), (2, 14)]))
+        self.assertAlmostEqual(match.score, 7 / 12, places=4)
+        self.assertEqual(compare(1, chain, 3, chain[::-1]).shared_actors, 1)
+
+    def test_inverted_index_skips_common_actors(self):
+        from .chain_alignment import candidate_pairs, inverted_index, load_chains
+        a = self._artwork("A", [self.persons[0], self.dealer, self.persons[1]])
+        b = self._artwork("B", [self.persons[0], self.dealer, self.persons[1], self.persons[2]])
+        c = self._artwork("C", [self.persons[3], self.dealer, self.persons[2]])
+        index = inverted_index(load_chains())
+        self.assertEqual(index[('institution', self.dealer.pk)], [a.pk, b.pk, c.pk])
+        self.assertEqual(candidate_pairs(index), [(a.pk, b.pk), (b.pk, c.pk)])
+        # With the dealer too common to count, B and C share a single actor.
+        self.assertEqual(candidate_pairs(index, max_actor_artworks=2), [(a.pk, b.pk)])
+
+    def test_endpoint_and_job_propose_matching_histories(self):
+        from django.contrib.auth.models import User
+        from .jobs import run_pending
+        from .models import ArtworkRelationship, Job
+        original = self._artwork("Original", [self.persons[0], self.dealer, self.persons[1], self.persons[2]])
+        record = self._artwork("Record", [self.persons[4], self.persons[0], self.dealer, self.persons[1]])
+        self._artwork("Other", [self.persons[0], self.persons[3], self.persons[5]])
+        lonely = Artwork.objects.create(name="Lonely")
+
+        results = self.client.get(f'/api/artworks/{original.pk}/similar-histories/').json()['results']
+        self.assertEqual([(row['artwork_name'], row['shared_actors'], row['score']) for row in results],
+                         [("Record", 3, 0.75)])
+        self.assertEqual(len(results[0]['aligned_events']), 3)
+        self.assertEqual(self.client.get(f'/api/artworks/{lonely.pk}/similar-histories/').json()['results'], [])
+        self.assertEqual(self.client.get('/api/artworks/999999/similar-histories/').status_code, 404)
+        self.assertEqual(
+            self.client.get(f'/api/artworks/{original.pk}/similar-histories/', {'limit': 0}).status_code, 400,
+        )
+
+        self.assertEqual(self.client.post('/api/artworks/history-matches/').status_code, 403)
+        self.client.force_login(User.objects.create_user('staff', password='pw', is_staff=True))
+        response = self.client.post('/api/artworks/history-matches/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(run_pending(), 1)
+        job = Job.objects.get(pk=response.json()['id'])
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual({key: job.result[key] for key in ('candidates', 'matches', 'proposed', 'clusters')},
+                         {'candidates': 1, 'matches': 1, 'proposed': 1, 'clusters': 1})
+        relationship = ArtworkRelationship.objects.get()
+        self.assertEqual((relationship.source_artwork, relationship.target_artwork), (original, record))
+        self.assertIn("Provenance chains align", relationship.reasoning)
+        self.assertEqual(self.client.post('/api/artworks/history-matches/', {'min_score': 'x'}).status_code, 400)
+
+
+class ArtworkDimensionTest(TestCase):
+    def test_dimensions_are_maintained_on_save(self):
+        artwork = Artwork.objects.create(name="Stillleben", dimension="24 x 30 in")
+        self.assertEqual((artwork.height, artwork.width, artwork.depth, artwork.dimension_unit),
+                         (60.96, 76.2, None, 'in'))
+        artwork.dimension = "H. 12,5 cm"
+        artwork.save(update_fields=['dimension'])
+        artwork.refresh_from_db()
+        self.assertEqual((artwork.height, artwork.width, artwork.dimension_unit), (12.5, None, 'cm'))
+        artwork.dimension = "unknown"
+        artwork.save()
+        artwork.refresh_from_db()
+        self.assertEqual((artwork.height, artwork.dimension_unit), (None, ''))
+
+    def test_backfill_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+        Artwork.objects.bulk_create(Artwork(name=f"Artwork {n}", dimension=f"{40 + n} x 50 cm") for n in range(5))
+        Artwork.objects.create(name="Saved", dimension="10 x 10 cm")
+        out = StringIO()
+        call_command('backfill_dimensions', '--dry-run', stdout=out)
+        self.assertIn("5 of 6 artworks would change", out.getvalue())
+        self.assertFalse(Artwork.objects.filter(height__isnull=False).exclude(name="Saved").exists())
+        out = StringIO()
+        call_command('backfill_dimensions', '--batch-size', '2', stdout=out)
+        self.assertIn("Updated the dimensions of 5 of 6 artworks.", out.getvalue())
+        self.assertEqual(list(Artwork.objects.order_by('height').values_list('height', flat=True)),
+                         [10, 40, 41, 42, 43, 44])
+
+    def test_size_range_filters(self):
+        small = Artwork.objects.create(name="Small", dimension="12 x 9 cm")
+        tall = Artwork.objects.create(name="Tall", dimension="65 x 81 cm")
+        Artwork.objects.create(name="Unknown")
+        rows = self.client.get('/api/artworks/', {'height_min': '50', 'height_max': '70'}).json()['results']
+        self.assertEqual([(row['id'], row['height'], row['dimension_unit']) for row in rows], [(tall.pk, 65, 'cm')])
+        rows = self.client.get('/api/artworks/browse/', {'width_max': '10,5'}).json()['results']
+        self.assertEqual([row['id'] for row in rows], [small.pk])
+        self.assertEqual(self.client.get('/api/artworks/', {'height_min': 'tall'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/artworks/browse/', {'depth_max': 'nan'}).status_code, 400)
@@ -0,0 +1,143 @@
+"""
+Resumable chunked uploads.
+
+A client creates an `Upload`, PUTs the file in numbered chunks (each one is
+streamed to disk and checksummed, never held in memory as a whole) and then
+completes it, which queues the job that consumes the file. Chunks that already
+arrived are reported by the status endpoint, so an interrupted upload resumes
+by sending only the missing ones. The chunks are concatenated by the job (see
+`assemble_upload`), not inside the request.
+"""
+import hashlib
+import os
+import re
+
+from .models import Upload, job_file_storage
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_CHUNK_RE = re.compile(r'chunk-(\d{6})')
+
+
+class UploadError(Exception):
+    pass
+
+
+def _upload_dir(upload):
+    return f"uploads/{upload.pk}"
+
+
+def _chunk_name(upload, index):
+    return f"{_upload_dir(upload)}/chunk-{index:06d}"
+
+
+def _assembled_name(upload):
+    # The prefix keeps the client's filename from ever naming a chunk.
+    return f"{_upload_dir(upload)}/upload-{os.path.basename(upload.filename)}"
+
+
+def received_chunks(upload):
+    """
+    Returns the sorted indices of the chunks stored for `upload`.
+    """
+    storage = job_file_storage()
+    directory = _upload_dir(upload)
+    if not storage.exists(directory):
+        return []
+    _, files = storage.listdir(directory)
+    return sorted(int(match.group(1)) for match in map(_CHUNK_RE.fullmatch, files) if match)
+
+
+def expected_chunk_size(upload, index):
+    if index == upload.total_chunks - 1:
+        return upload.size - index * upload.chunk_size
+    return upload.chunk_size
+
+
+def write_chunk(upload, index, stream, expected_sha256=''):
+    """
+    Streams one chunk from `stream` (a file-like object, e.g. the request) to
+    disk. The chunk only becomes visible once its size and (optional) checksum
+    were verified, so a dropped connection never leaves a partial chunk behind.
+    Returns the SHA-256 of the stored chunk.
+    """
+    if upload.status != Upload.STATUS_PENDING:
+        raise UploadError("Upload is already complete.")
+    if not 0 <= index < upload.total_chunks:
+        raise UploadError(f"Chunk index must be between 0 and {upload.total_chunks - 1}.")
+
+    storage = job_file_storage()
+    final_path = storage.path(_chunk_name(upload, index))
+    partial_path = f"{final_path}.part"
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+
+    expected_size = expected_chunk_size(upload, index)
+    digest = hashlib.sha256()
+    written = 0
+    with open(partial_path, 'wb') as f:
+        while True:
+            block = stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if written > expected_size:
+                break
+            digest.update(block)
+            f.write(block)
+
+    checksum = digest.hexdigest()
+    if written != expected_size:
+        os.remove(partial_path)
+        raise UploadError(f"Chunk {index} must be {expected_size} bytes, received {written}.")
+    if expected_sha256 and expected_sha256.lower() != checksum:
+        os.remove(partial_path)
+        raise UploadError(f"Checksum mismatch for chunk {index}.")
+    os.replace(partial_path, final_path)
+    return checksum
+
+
+def missing_chunks(upload):
+    received = set(received_chunks(upload))
+    return [i for i in range(upload.total_chunks) if i not in received]
+
+
+def assemble_upload(upload):
+    """
+    Concatenates the chunks into `uploads/<id>/upload-<filename>`, verifies the total
+    size and checksum, removes the chunks and returns the storage name of the
+    assembled file.
+    """
+    missing = missing_chunks(upload)
+    if missing:
+        raise UploadError(f"Upload is missing {len(missing)} chunk(s).")
+
+    storage = job_file_storage()
+    name = _assembled_name(upload)
+    digest = hashlib.sha256()
+    with open(storage.path(name), 'wb') as out:
+        for index in range(upload.total_chunks):
+            with open(storage.path(_chunk_name(upload, index)), 'rb') as chunk:
+                for block in iter(lambda: chunk.read(STREAM_BLOCK_SIZE), b''):
+                    digest.update(block)
+                    out.write(block)
+
+    if os.path.getsize(storage.path(name)) != upload.size:
+        storage.delete(name)
+        raise UploadError("Assembled file has the wrong size.")
+    if upload.sha256 and upload.sha256.lower() != digest.hexdigest():
+        storage.delete(name)
+        raise UploadError("Checksum mismatch for the assembled file.")
+
+    for index in range(upload.total_chunks):
+        storage.delete(_chunk_name(upload, index))
+    return name
+
+
+def delete_upload_files(upload):
+    storage = job_file_storage()
+    directory = _upload_dir(upload)
+    if storage.exists(directory):
+        _, files = storage.listdir(directory)
+        for name in files:
+            storage.delete(f"{directory}/{name}")
+        os.rmdir(storage.path(directory))
@@ -0,0 +1,133 @@
+import json
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods
+from .jobs import submit
+from .jobs_api import serialize_job
+from .models import Upload
+from .uploads import UploadError, missing_chunks, received_chunks, write_chunk
+
+# Allowed file suffixes per purpose (loaddata detects format and compression from the name).
+ALLOWED_SUFFIXES = {
+    Upload.PURPOSE_DB_SYNC: ('.json', '.json.gz', '.json.bz2'),
+    Upload.PURPOSE_IMAGES: ('.zip',),
+}
+
+def serialize_upload(upload):
+    return {
+        'id': str(upload.id),
+        'purpose': upload.purpose,
+        'filename': upload.filename,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'total_chunks': upload.total_chunks,
+        'received': received_chunks(upload),
+        'status': upload.status,
+    }
+
+def _get_upload_for_request(request, pk):
+    """
+    Uploads are restricted to staff, and to the user who started them
+    (superusers can see all). Returns None if access is not allowed.
+    """
+    if not request.user.is_staff:
+        return None
+    upload = get_object_or_404(Upload, pk=pk)
+    if upload.created_by_id not in (None, request.user.pk) and not request.user.is_superuser:
+        return None
+    return upload
+
+def _forbidden():
+    return JsonResponse({'error': 'Forbidden'}, status=403)
+
+@require_http_methods(["POST"])
+def upload_create(request):
+    """
+    Starts a chunked upload. Expects JSON with `filename`, `size`, `purpose`
+    and optionally `sha256` of the whole file. The response tells the client
+    which `chunk_size` to use.
+    """
+    if not request.user.is_staff:
+        return _forbidden()
+    try:
+        data = json.loads(request.body)
+        filename = str(data['filename'])
+        size = int(data['size'])
+        purpose = data['purpose']
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return JsonResponse({'error': 'Expected JSON with filename, size and purpose'}, status=400)
+
+    if purpose not in ALLOWED_SUFFIXES:
+        return JsonResponse({'error': f'Unknown purpose: {purpose}'}, status=400)
+    if not filename.lower().endswith(ALLOWED_SUFFIXES[purpose]):
+        return JsonResponse({'error': f'File must end with one of {", ".join(ALLOWED_SUFFIXES[purpose])}'}, status=400)
+    if size < 0:
+        return JsonResponse({'error': 'Invalid size'}, status=400)
+
+    upload = Upload.objects.create(
+        purpose=purpose,
+        filename=filename,
+        size=size,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        sha256=str(data.get('sha256') or '')[:64],
+        created_by=request.user,
+    )
+    return JsonResponse(serialize_upload(upload), status=201)
+
+@require_http_methods(["GET"])
+def upload_detail(request, pk):
+    """
+    Returns the upload including the indices of the chunks already received,
+    so an interrupted client can resume with the missing ones.
+    """
+    upload = _get_upload_for_request(request, pk)
+    if upload is None:
+        return _forbidden()
+    return JsonResponse(serialize_upload(upload))
+
+@require_http_methods(["PUT"])
+def upload_chunk(request, pk, index):
+    """
+    Receives one chunk as the raw request body. An optional `X-Chunk-SHA256`
+    header is verified against the stored data. Re-sending a chunk replaces it.
+    """
+    upload = _get_upload_for_request(request, pk)
+    if upload is None:
+        return _forbidden()
+    try:
+        checksum = write_chunk(upload, index, request, request.headers.get('X-Chunk-SHA256', ''))
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'index': index, 'sha256': checksum})
+
+@require_http_methods(["POST"])
+def upload_complete(request, pk):
+    """
+    Marks the upload complete and queues the job that consumes it
+    (database sync or image import). Optional JSON body: `{"mode": "merge"|"overwrite"}`.
+    """
+    upload = _get_upload_for_request(request, pk)
+    if upload is None:
+        return _forbidden()
+    if upload.status != Upload.STATUS_PENDING:
+        return JsonResponse({'error': 'Upload is already complete.'}, status=400)
+
+    missing = missing_chunks(upload)
+    if missing:
+        return JsonResponse({'error': 'Upload is incomplete.', 'missing': missing}, status=400)
+
+    try:
+        options = json.loads(request.body) if request.content_type == 'application/json' and request.body else {}
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    upload.status = Upload.STATUS_COMPLETE
+    upload.save(update_fields=['status'])
+
+    if upload.purpose == Upload.PURPOSE_DB_SYNC:
+        mode = 'overwrite' if options.get('mode') == 'overwrite' else 'merge'
+        job = submit('sync_database', {'mode': mode, 'upload_id': str(upload.pk)}, user=request.user)
+    else:
+        job = submit('import_image_archive', {'upload_id': str(upload.pk)}, user=request.user)
+    return JsonResponse(serialize_job(job), status=202)
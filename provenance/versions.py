@@ -0,0 +1,78 @@
+"""
+Data versions: a counter per model that changes whenever its rows do.
+
+In-process caches built from the database (see provenance.analytics) read
+all counters with one query and rebuild only what depends on a model whose
+counter moved. Model saves and deletes bump the counter through signals;
+code that writes with `QuerySet.update()`, `bulk_create()` or raw SQL calls
+`bump_data_version()` itself. A delete also bumps the tracked models whose
+foreign keys to it are `SET_NULL`: Django clears those with an UPDATE that
+sends no signal (deleting a person changes its events).
+"""
+from django.apps import apps
+from django.db.models import F, SET_DEFAULT, SET_NULL
+from django.db.models.signals import post_delete, post_save
+
+# Models whose changes are tracked, as `app_label.model_name`.
+TRACKED_MODELS = (
+    'provenance.provenanceevent',
+    'provenance.artwork',
+    'provenance.medium',
+    'provenance.arttype',
+    'provenance.eventtype',
+    'provenance.person',
+    'provenance.institution',
+    'provenance.institutiontype',
+    'provenance.auction',
+    'provenance.exhibition',
+)
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def bump_data_version(*models):
+    """Increments the counters of `models` (classes or labels); all tracked models by default."""
+    from .models import DataVersion
+
+    labels = sorted({_label(model) for model in models} if models else set(TRACKED_MODELS))
+    updated = DataVersion.objects.filter(model__in=labels).update(version=F('version') + 1)
+    if updated < len(labels):
+        DataVersion.objects.bulk_create(
+            [DataVersion(model=label, version=1) for label in labels], ignore_conflicts=True,
+        )
+
+
+def data_versions():
+    """{model label: version} of every tracked model, in one query."""
+    from .models import DataVersion
+
+    versions = dict.fromkeys(TRACKED_MODELS, 0)
+    versions.update(DataVersion.objects.filter(model__in=TRACKED_MODELS).values_list('model', 'version'))
+    return versions
+
+
+def _changed(sender, raw=False, **kwargs):
+    # Fixture loads bump everything once when they are done.
+    if not raw:
+        bump_data_version(sender)
+
+
+def _nulled_on_delete(model):
+    """Tracked models with a foreign key to `model` that a delete sets to null (or its default)."""
+    return {
+        relation.related_model._meta.label_lower for relation in model._meta.related_objects
+        if relation.on_delete in (SET_NULL, SET_DEFAULT) and relation.related_model._meta.label_lower in TRACKED_MODELS
+    }
+
+
+def _deleted(sender, **kwargs):
+    bump_data_version(sender, *_nulled_on_delete(sender))
+
+
+def connect_signals():
+    for label in TRACKED_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(_changed, sender=model, dispatch_uid=f'data_version_save_{label}')
+        post_delete.connect(_deleted, sender=model, dispatch_uid=f'data_version_delete_{label}')